@@ -0,0 +1,53 @@
+# ==========================================
+# File: compare.py
+# Description: compare two benchmark result files and flag regressions
+# ==========================================
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return report["meta"], {(r["stage"], r["scale"]): r for r in report["results"]}
+
+
+def compare(baseline_path: str, current_path: str, threshold: float = 0.10) -> int:
+    """
+    Печатает изменение пропускной способности, p99 и пикового RSS по этапам.
+    Регрессия — падение пропускной способности или рост p99 больше чем на threshold.
+    Возвращает число регрессий
+    """
+    base_meta, base = load(baseline_path)
+    cur_meta, cur = load(current_path)
+    print(f"baseline: {base_meta.get('git_commit')} {base_meta.get('created')}  "
+          f"current: {cur_meta.get('git_commit')} {cur_meta.get('created')}")
+    if base_meta.get("encoder") != cur_meta.get("encoder"):
+        print(f"ВНИМАНИЕ: разные энкодеры ({base_meta.get('encoder')} / {cur_meta.get('encoder')})")
+
+    regressions = 0
+    print(f"{'stage':>26} {'scale':>7} {'throughput':>12} {'p99':>10} {'peak RSS':>10}")
+    for key in sorted(cur, key=lambda k: (k[1], k[0])):
+        if key not in base:
+            continue
+        b, c = base[key], cur[key]
+        throughput = c["throughput_per_s"] / b["throughput_per_s"] - 1
+        p99 = c["p99_ms"] / b["p99_ms"] - 1 if b["p99_ms"] else 0.0
+        rss = c["peak_rss_mb"] - b["peak_rss_mb"]
+        flag = ""
+        if throughput < -threshold or p99 > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:>26} {key[1]:>7} {throughput:>+11.1%} {p99:>+9.1%} {rss:>+8.1f}MB{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression")
+    args = parser.parse_args()
+    sys.exit(1 if compare(args.baseline, args.current, args.threshold) else 0)
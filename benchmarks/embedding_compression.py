@@ -0,0 +1,197 @@
+# ==========================================
+# File: embedding_compression.py
+# Description: quality, memory and scoring time of Matryoshka dimensions and vector storage types
+# ==========================================
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("PARSED_CACHE_PATH", "")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESEARCH = os.path.join(ROOT, "research_v2")
+sys.path.insert(0, RESEARCH)
+sys.path.insert(0, os.path.join(ROOT, "tg_bot"))
+
+import numpy as np
+
+from synthetic import CorpusModel, generate_corpus
+
+DIMS = [768, 512, 256, 128, 64]
+STORAGES = ["float32", "float16", "int8"]
+
+
+def _features(matcher, texts, full_embeddings, dim, storage):
+    from cv_matcher import VacancyFeatures
+    from vector_store import MATRYOSHKA_LAYER_NORM, EmbeddingMatrix, matryoshka_truncate
+
+    layer_norm = matcher.model.model_name in MATRYOSHKA_LAYER_NORM
+    vectors = EmbeddingMatrix.from_vectors(matryoshka_truncate(full_embeddings, dim, layer_norm), storage)
+    term_sets = [set(matcher.extract_key_terms(text)) for text in texts]
+    return VacancyFeatures(list(range(len(texts))), vectors, term_sets, [len(t.split()) for t in texts])
+
+
+def _score_matrix(matcher, resume_texts, resume_full, features, dim):
+    from vector_store import MATRYOSHKA_LAYER_NORM, matryoshka_truncate
+
+    layer_norm = matcher.model.model_name in MATRYOSHKA_LAYER_NORM
+    queries = matryoshka_truncate(resume_full, dim, layer_norm)
+    return np.stack([matcher.score_vacancies(text, query, features)
+                     for text, query in zip(resume_texts, queries)])
+
+
+def annotated_quality(matcher, configs):
+    """
+    NDCG@5 и Spearman комбинированного скора по разметке research_v2 для каждой конфигурации
+    """
+    from src.preprocessing import load_all_resumes, load_vacancies
+    from src.evaluation import evaluate_scores
+    from src.train_and_evaluate import load_annotations
+
+    resumes = load_all_resumes(os.path.join(RESEARCH, "data", "CV"))
+    vacancies = load_vacancies(os.path.join(RESEARCH, "data", "5_vacancies.csv"))
+    annot = load_annotations(os.path.join(RESEARCH, "data", "annotations-for-the-first-30-vacancies.txt"))
+    resume_ids = sorted(resumes)
+    resume_texts = [resumes[rid] for rid in resume_ids]
+    vacancy_texts = vacancies.job_description.tolist()
+    resume_full = matcher.encode_texts(resume_texts)
+    vacancy_full = matcher.encode_texts(vacancy_texts)
+
+    results = {}
+    for dim, storage in configs:
+        features = _features(matcher, vacancy_texts, vacancy_full, dim, storage)
+        scores = _score_matrix(matcher, resume_texts, resume_full, features, dim)
+        ndcg, spearman = evaluate_scores(resume_ids, scores, annot)
+        results[(dim, storage)] = {"ndcg5": float(np.nanmean(ndcg)), "spearman": float(np.nanmean(spearman))}
+    return results
+
+
+def synthetic_agreement(matcher, configs, corpus, n_queries, top_k=5):
+    """
+    Доля совпадения топ-k вакансий с полной float32-конфигурацией на синтетическом каталоге
+    """
+    from src.preprocessing import load_all_resumes
+    import pandas as pd
+
+    vacancy_texts = pd.read_csv(corpus["vacancies_csv"]).job_description.tolist()
+    resumes = load_all_resumes(corpus["cv_folder"])
+    resume_texts = [resumes[rid] for rid in sorted(resumes)][:n_queries]
+    resume_full = matcher.encode_texts(resume_texts)
+    vacancy_full = matcher.encode_texts(vacancy_texts)
+
+    def top(scores):
+        return np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+
+    reference = top(_score_matrix(matcher, resume_texts, resume_full,
+                                  _features(matcher, vacancy_texts, vacancy_full, None, "float32"), None))
+    results = {}
+    for dim, storage in configs:
+        features = _features(matcher, vacancy_texts, vacancy_full, dim, storage)
+        found = top(_score_matrix(matcher, resume_texts, resume_full, features, dim))
+        overlap = [len(set(a) & set(b)) / top_k for a, b in zip(reference, found)]
+        results[(dim, storage)] = float(np.mean(overlap))
+    return results
+
+
+def scoring_cost(configs, n_rows, repeats, seed):
+    """
+    Байт на вакансию и время скалярных произведений запроса со всем каталогом из n_rows строк
+    """
+    from vector_store import EmbeddingMatrix
+
+    rng = np.random.default_rng(seed)
+    full = rng.standard_normal((n_rows, max(DIMS)), dtype=np.float32)
+    query = rng.standard_normal(max(DIMS), dtype=np.float32)
+    results = {}
+    for dim, storage in configs:
+        matrix = EmbeddingMatrix.from_vectors(full[:, :dim], storage)
+        q = query[:dim] / np.linalg.norm(query[:dim])
+        matrix.dot(q)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            matrix.dot(q)
+        seconds = (time.perf_counter() - start) / repeats
+        results[(dim, storage)] = {
+            "bytes_per_vacancy": matrix.nbytes / n_rows,
+            "mb_per_million": matrix.nbytes / n_rows * 1e6 / 2 ** 20,
+            "score_ms_per_million": seconds * 1000 * 1e6 / n_rows,
+        }
+        del matrix
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Matryoshka dimensions x storage types: NDCG@5, memory, scoring time")
+    parser.add_argument("--dims", type=int, nargs="+", default=DIMS)
+    parser.add_argument("--storages", nargs="+", default=STORAGES, choices=STORAGES)
+    parser.add_argument("--encoder", choices=["stub", "model"], default="model")
+    parser.add_argument("--catalog-size", type=int, default=2000, help="synthetic vacancies for top-5 agreement")
+    parser.add_argument("--queries", type=int, default=50, help="synthetic resumes for top-5 agreement")
+    parser.add_argument("--timing-rows", type=int, default=200000, help="rows of the random matrix for timing")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus-dir", default=os.path.join(ROOT, "benchmarks", "corpus"))
+    parser.add_argument("--out", help="results JSON, default: benchmarks/results/compression-<timestamp>.json")
+    args = parser.parse_args(argv)
+
+    from cv_matcher import VacancyResumeMatcher
+    matcher = VacancyResumeMatcher()
+    if args.encoder == "stub":
+        from src import embedding_cache as research_cache
+        import embedding_cache as bot_cache
+        import stub_encoder
+        stub_encoder.install(research_cache, bot_cache)
+
+    width = matcher.model.get_sentence_embedding_dimension()
+    configs = [(None if dim >= width else dim, storage) for dim in sorted(set(args.dims), reverse=True)
+               for storage in args.storages]
+
+    corpus = generate_corpus(os.path.join(args.corpus_dir, f"n{args.catalog_size}_s{args.seed}"),
+                             max(args.queries, 1), args.catalog_size, seed=args.seed, model=CorpusModel())
+    quality = annotated_quality(matcher, configs)
+    agreement = synthetic_agreement(matcher, configs, corpus, args.queries)
+    cost = scoring_cost([(dim or width, storage) for dim, storage in configs], args.timing_rows,
+                        args.repeats, args.seed)
+
+    baseline = cost[(width, "float32")] if (width, "float32") in cost else None
+    rows = []
+    print(f"\n{'dim':>5} {'тип':<8} {'NDCG@5':>7} {'Spearman':>9} {'топ-5 как у 768/f32':>20} "
+          f"{'МБ/1М':>8} {'мс/1М':>8} {'память':>7} {'скоринг':>8}")
+    for dim, storage in configs:
+        c = cost[(dim or width, storage)]
+        row = {"dim": dim or width, "storage": storage, **quality[(dim, storage)],
+               "top5_agreement": agreement[(dim, storage)], **c}
+        if baseline is not None:
+            row["memory_reduction"] = baseline["bytes_per_vacancy"] / c["bytes_per_vacancy"]
+            row["scoring_speedup"] = baseline["score_ms_per_million"] / c["score_ms_per_million"]
+        rows.append(row)
+        print(f"{row['dim']:>5} {storage:<8} {row['ndcg5']:>7.4f} {row['spearman']:>9.4f} "
+              f"{row['top5_agreement']:>20.3f} {c['mb_per_million']:>8.0f} {c['score_ms_per_million']:>8.1f} "
+              f"{row.get('memory_reduction', float('nan')):>6.1f}x {row.get('scoring_speedup', float('nan')):>7.1f}x")
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "encoder": args.encoder,
+            "model_dim": width,
+            "catalog_size": args.catalog_size,
+            "queries": args.queries,
+            "timing_rows": args.timing_rows,
+        },
+        "results": rows,
+    }
+    out_path = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                        datetime.datetime.now().strftime("compression-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
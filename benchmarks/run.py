@@ -0,0 +1,384 @@
+# ==========================================
+# File: run.py
+# Description: per-stage throughput, latency and memory benchmark of the matching pipeline
+# ==========================================
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# кэши на диске между запусками исказили бы замеры
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("PARSED_CACHE_PATH", "")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "research_v2"))
+sys.path.insert(0, os.path.join(ROOT, "tg_bot"))
+
+import numpy as np
+
+from synthetic import CorpusModel, generate_corpus
+
+STAGES = [
+    "read_docx",
+    "load_all_resumes",
+    "extract_skills",
+    "extract_skills_batch",
+    "encode_texts",
+    "encode_texts_batch",
+    "rank_resumes_for_vacancy",
+    "skill_index_mean",
+    "skill_index_max",
+    "skill_index_lexical",
+    "rank_vacancies_for_resume",
+    "rank_vacancies",
+    "rank_vacancies_lexical",
+    "compute_metrics",
+    "calculate_ndcg",
+    "load_vacancies_csv",
+    "load_vacancies_columns",
+]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт килобайты, macOS — байты
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """
+    Пиковый RSS процесса за время этапа: фоновый поток опрашивает /proc/self/statm
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def measure(stage: str, scale: int, items: List, fn: Callable, units_per_item: int = 1,
+            time_budget: Optional[float] = None) -> Dict:
+    """
+    Вызывает fn для каждого элемента items, пока не кончатся элементы или бюджет времени
+    (но не меньше трёх вызовов). units_per_item — сколько документов обрабатывает один вызов
+    """
+    latencies = []
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        for item in items:
+            t0 = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - t0)
+            if time_budget is not None and len(latencies) >= 3 and time.perf_counter() - started > time_budget:
+                break
+        total = time.perf_counter() - started
+
+    lat_ms = np.array(latencies) * 1000
+    units = len(latencies) * units_per_item
+    result = {
+        "stage": stage,
+        "scale": scale,
+        "calls": len(latencies),
+        "units": units,
+        "total_s": round(total, 4),
+        "throughput_per_s": round(units / total, 2) if total > 0 else None,
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(lat_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+        "max_ms": round(float(lat_ms.max()), 3),
+        "rss_start_mb": round(rss.start / 2 ** 20, 1),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+    print(f"{stage:>26} n={scale:<7} {result['throughput_per_s']:>10} /s  "
+          f"p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  peak RSS {result['peak_rss_mb']} MB")
+    return result
+
+
+class Pipeline:
+    """
+    Модули бота и research_v2 с общими данными корпуса. Всё, что этап берёт как готовый
+    вход (навыки, эмбеддинги вакансий), считается заранее и в замер не попадает
+    """
+
+    def __init__(self, encoder: str):
+        from src import embedding_cache as research_cache
+        from src.preprocessing import read_docx, load_all_resumes
+        from src.extract_skills import extract_skills, extract_skills_batch
+        from src.ranking import rank_resumes_for_vacancy, rank_resumes_shortlist, SkillCentroidIndex
+        from src.lexical_index import LexicalIndex, phrase_tokens
+        from src.metrics import compute_metrics
+        import embedding_cache as bot_cache
+        from cv_matcher import VacancyResumeMatcher
+        from vacancy_columns import open_columns, read_csv_batches
+
+        self.read_docx = read_docx
+        self.load_all_resumes = load_all_resumes
+        self.extract_skills = extract_skills
+        self.extract_skills_batch = extract_skills_batch
+        self.rank_resumes_for_vacancy = rank_resumes_for_vacancy
+        self.rank_resumes_shortlist = rank_resumes_shortlist
+        self.SkillCentroidIndex = SkillCentroidIndex
+        self.LexicalIndex = LexicalIndex
+        self.phrase_tokens = phrase_tokens
+        self.compute_metrics = compute_metrics
+        self.matcher = VacancyResumeMatcher()
+        self.open_columns = open_columns
+        self.read_csv_batches = read_csv_batches
+
+        if encoder == "stub":
+            import stub_encoder
+            stub_encoder.install(research_cache, bot_cache)
+
+
+class Context:
+    """
+    Данные одного масштаба; тяжёлые входы этапов считаются лениво и один раз
+    """
+
+    def __init__(self, pipeline: Pipeline, corpus: Dict[str, str], scale: int, samples: int, seed: int):
+        self.p = pipeline
+        self.corpus = corpus
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.samples = samples
+        self._cache = {}
+
+    def _lazy(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    def sample(self, items: List) -> List:
+        return items if len(items) <= self.samples else self.rng.sample(items, self.samples)
+
+    @property
+    def cv_paths(self) -> List[str]:
+        folder = self.corpus["cv_folder"]
+        return self._lazy("cv_paths", lambda: [os.path.join(folder, f) for f in sorted(os.listdir(folder))])
+
+    @property
+    def resumes(self) -> Dict[int, str]:
+        return self._lazy("resumes", lambda: self.p.load_all_resumes(self.corpus["cv_folder"]))
+
+    @property
+    def vacancies(self) -> Dict[int, Dict]:
+        return self._lazy("vacancies", lambda: self.p.matcher.load_vacancies(self.corpus["vacancies_csv"]))
+
+    @property
+    def resume_skills(self) -> Dict[int, List[str]]:
+        def build():
+            ids = list(self.resumes.keys())
+            skills = []
+            # кандидаты документа не зависят от остального корпуса, так что кусками — то же самое
+            for start in range(0, len(ids), 1000):
+                skills.extend(self.p.extract_skills_batch([self.resumes[i] for i in ids[start:start + 1000]]))
+            return dict(zip(ids, skills))
+        return self._lazy("resume_skills", build)
+
+    @property
+    def vacancy_skills(self) -> List[List[str]]:
+        def build():
+            ids = self.sample(list(self.vacancies.keys()))
+            return self.p.extract_skills_batch([self.vacancies[i]['description'] for i in ids])
+        return self._lazy("vacancy_skills", build)
+
+    @property
+    def resume_skill_index(self):
+        return self._lazy("resume_skill_index", lambda: self.p.SkillCentroidIndex.build(self.resume_skills))
+
+    @property
+    def resume_lexical_index(self):
+        return self._lazy("resume_lexical_index", lambda: self.p.LexicalIndex.from_documents(
+            {rid: self.p.phrase_tokens(skills) for rid, skills in self.resume_skills.items()}))
+
+    @property
+    def vacancy_embeddings(self) -> Dict[int, np.ndarray]:
+        def build():
+            ids = list(self.vacancies.keys())
+            embeddings = self.p.matcher.encode_texts([self.vacancies[i]['description'] for i in ids])
+            return dict(zip(ids, embeddings))
+        return self._lazy("vacancy_embeddings", build)
+
+    @property
+    def features(self):
+        def build():
+            features = self.p.matcher.precompute_vacancy_features(self.vacancies, self.vacancy_embeddings)
+            self.p.matcher.build_vector_index(features)
+            return features
+        return self._lazy("features", build)
+
+    @property
+    def resume_queries(self) -> List:
+        def build():
+            ids = self.sample(list(self.resumes.keys()))
+            texts = [self.resumes[i] for i in ids]
+            return list(zip(texts, self.p.matcher.encode_texts(texts)))
+        return self._lazy("resume_queries", build)
+
+
+def run_stage(stage: str, ctx: Context, time_budget: float) -> Dict:
+    p, n = ctx.p, ctx.scale
+    if stage == "read_docx":
+        return measure(stage, n, ctx.sample(ctx.cv_paths), p.read_docx, time_budget=time_budget)
+    if stage == "load_all_resumes":
+        return measure(stage, n, [ctx.corpus["cv_folder"]], p.load_all_resumes,
+                       units_per_item=len(ctx.cv_paths))
+    if stage == "extract_skills":
+        texts = ctx.sample(list(ctx.resumes.values()))
+        return measure(stage, n, texts, p.extract_skills, time_budget=time_budget)
+    if stage == "extract_skills_batch":
+        texts = ctx.sample(list(ctx.resumes.values()))
+        return measure(stage, n, [texts], p.extract_skills_batch, units_per_item=len(texts))
+    if stage == "encode_texts":
+        # как в боте: по одному резюме на вызов; тексты с другим seed, чтобы не попасть в кэш
+        texts = [f"{t} #{ctx.rng.random()}" for t in ctx.sample(list(ctx.resumes.values()))]
+        return measure(stage, n, texts, lambda t: p.matcher.encode_texts([t]), time_budget=time_budget)
+    if stage == "encode_texts_batch":
+        texts = [f"{t} #{ctx.rng.random()}" for t in ctx.sample(list(ctx.resumes.values()))]
+        return measure(stage, n, [texts], p.matcher.encode_texts, units_per_item=len(texts))
+    if stage == "rank_resumes_for_vacancy":
+        resume_skills = ctx.resume_skills
+        return measure(stage, n, ctx.vacancy_skills,
+                       lambda skills: p.rank_resumes_for_vacancy(resume_skills, skills),
+                       time_budget=time_budget)
+    if stage in ("skill_index_mean", "skill_index_max"):
+        # пул резюме проиндексирован заранее, кодируются только навыки вакансии
+        index, aggregation = ctx.resume_skill_index, stage.rsplit("_", 1)[1]
+        return measure(stage, n, ctx.vacancy_skills, lambda skills: index.rank(skills, aggregation),
+                       time_budget=time_budget)
+    if stage == "skill_index_lexical":
+        # BM25-шортлист из 500 резюме, сходство навыков только для него
+        index, lexical = ctx.resume_skill_index, ctx.resume_lexical_index
+        return measure(stage, n, ctx.vacancy_skills,
+                       lambda skills: p.rank_resumes_shortlist(index, lexical, skills, 500),
+                       time_budget=time_budget)
+    if stage == "rank_vacancies_for_resume":
+        vacancies, embeddings = ctx.vacancies, ctx.vacancy_embeddings
+        return measure(stage, n, ctx.resume_queries,
+                       lambda q: p.matcher.rank_vacancies_for_resume(q[0], vacancies, embeddings, q[1]),
+                       time_budget=time_budget)
+    if stage == "rank_vacancies":
+        features = ctx.features
+        return measure(stage, n, ctx.resume_queries,
+                       lambda q: p.matcher.rank_vacancies(q[0], q[1], features, top_k=5),
+                       time_budget=time_budget)
+    if stage == "rank_vacancies_lexical":
+        features = ctx.features
+        return measure(stage, n, ctx.resume_queries,
+                       lambda q: p.matcher.rank_vacancies(q[0], q[1], features, top_k=5, prefilter="lexical"),
+                       time_budget=time_budget)
+    if stage == "compute_metrics":
+        pairs = []
+        for _ in range(ctx.samples):
+            hr = [ctx.rng.randint(1, 5) for _ in range(5)]
+            pairs.append((hr, ctx.rng.sample(range(1, 31), 5)))
+        return measure(stage, n, pairs, lambda pair: p.compute_metrics(*pair), time_budget=time_budget)
+    if stage == "calculate_ndcg":
+        ids = list(ctx.vacancies.keys())
+        pairs = [(ctx.rng.sample(ids, min(len(ids), 50)), ctx.rng.sample(ids, min(len(ids), 5)))
+                 for _ in range(ctx.samples)]
+        return measure(stage, n, pairs, lambda pair: p.matcher.calculate_ndcg(*pair, k=5),
+                       time_budget=time_budget)
+    if stage == "load_vacancies_csv":
+        # полный проход по CSV батчами, только нужные колонки
+        return measure(stage, n, [ctx.corpus["vacancies_csv"]],
+                       lambda path: sum(len(batch["id"]) for batch in p.read_csv_batches(path)),
+                       units_per_item=len(ctx.vacancies))
+    if stage == "load_vacancies_columns":
+        # колоночный файл собран заранее, замеряется только чтение батчей
+        columns = p.open_columns(ctx.corpus["vacancies_csv"])
+        try:
+            return measure(stage, n, [columns], lambda c: sum(len(batch["id"]) for batch in c.iter_batches()),
+                           units_per_item=len(columns))
+        finally:
+            columns.close()
+    raise ValueError(f"Неизвестный этап {stage}")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline stage benchmarks on a synthetic corpus")
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000],
+                        help="corpus sizes: number of CVs and of vacancies")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub",
+                        help="stub: hash-based offline encoder; model: real sentence-transformers models")
+    parser.add_argument("--samples", type=int, default=100, help="max calls per stage")
+    parser.add_argument("--time-budget", type=float, default=30.0, help="seconds per stage, at least 3 calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus-dir", default=os.path.join(ROOT, "benchmarks", "corpus"))
+    parser.add_argument("--out", help="results JSON, default: benchmarks/results/<timestamp>.json")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.encoder)
+    model = CorpusModel()
+    results = []
+    for scale in args.scales:
+        corpus_dir = os.path.join(args.corpus_dir, f"n{scale}_s{args.seed}")
+        t0 = time.perf_counter()
+        corpus = generate_corpus(corpus_dir, scale, scale, seed=args.seed, model=model)
+        print(f"\nКорпус {corpus_dir}: {time.perf_counter() - t0:.1f} с")
+        ctx = Context(pipeline, corpus, scale, args.samples, args.seed)
+        for stage in args.stages:
+            results.append(run_stage(stage, ctx, args.time_budget))
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "encoder": args.encoder,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "samples": args.samples,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    out_path = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                        datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# ==========================================
+# File: sharded_pool.py
+# Description: throughput of sharded multi-process top-k resume scoring against a full sort of the pool
+# ==========================================
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "research_v2"))
+
+import numpy as np
+
+from src.sharded_ranking import ShardedResumePool
+
+
+def full_sort(centroids: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Как rank_resumes_for_vacancy: скоры всего пула и полная сортировка
+    """
+    return np.argsort(-(queries @ centroids.T), axis=1, kind="stable")[:, :k]
+
+
+def _timed(fn, repeats: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded top-k resume scoring vs full sort")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--shard-size", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 centroids")
+    parser.add_argument("--queries", type=int, default=8, help="vacancies per call")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results JSON, default: benchmarks/results/sharded-<timestamp>.json")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    print(f"\n{'резюме':>9} {'воркеры':>8} {'мс/вызов':>9} {'вакансий/с':>11} {'ускорение':>10}")
+    for n in args.pool_sizes:
+        centroids = rng.standard_normal((n, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        reference = full_sort(centroids, queries, args.k)
+        baseline = _timed(lambda: full_sort(centroids, queries, args.k), args.repeats)
+        rows.append({"pool": n, "workers": 0, "seconds": baseline})
+        print(f"{n:>9} {'сорт.':>8} {baseline * 1000:>9.1f} {args.queries / baseline:>11.1f} {1.0:>9.2f}x")
+
+        for workers in args.workers:
+            with ShardedResumePool(np.arange(n), centroids, workers=workers, shard_size=args.shard_size) as pool:
+                found = [[rid for rid, _ in ranked] for ranked in pool.top_k(list(queries), args.k)]
+                if found != reference.tolist():
+                    print(f"Топ-{args.k} при {workers} воркерах расходится с полной сортировкой")
+                seconds = _timed(lambda: pool.top_k(list(queries), args.k), args.repeats)
+            rows.append({"pool": n, "workers": workers, "seconds": seconds, "speedup": baseline / seconds})
+            print(f"{n:>9} {workers:>8} {seconds * 1000:>9.1f} {args.queries / seconds:>11.1f} "
+                  f"{baseline / seconds:>9.2f}x")
+        del centroids
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "cpu_count": os.cpu_count(),
+            "dim": args.dim,
+            "queries": args.queries,
+            "k": args.k,
+            "shard_size": args.shard_size,
+        },
+        "results": rows,
+    }
+    out_path = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                        datetime.datetime.now().strftime("sharded-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
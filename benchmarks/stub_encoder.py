@@ -0,0 +1,70 @@
+# ==========================================
+# File: stub_encoder.py
+# Description: deterministic offline stand-in for SentenceTransformer models
+# ==========================================
+import hashlib
+import re
+from typing import Dict
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+# размерности настоящих моделей, чтобы матрицы в бенчмарке были того же размера
+MODEL_DIMS = {
+    "nomic-ai/nomic-embed-text-v1.5": 768,
+    "all-MiniLM-L6-v2": 384,
+}
+
+
+class StubModel:
+    """
+    Вектор текста — сумма псевдослучайных векторов его слов (seed — хэш слова).
+    Похожие по словам тексты получают похожие векторы, поэтому ранжирование
+    и метрики ведут себя осмысленно, а скорость не зависит от железа под torch
+    """
+
+    def __init__(self, model_name: str, dim: int = None):
+        self.model_name = model_name
+        self.dim = dim or MODEL_DIMS.get(model_name, 384)
+        self._words: Dict[str, np.ndarray] = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _word(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._words[word] = vector
+        return vector
+
+    def encode(self, sentences, normalize_embeddings: bool = False, convert_to_tensor: bool = False,
+               **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _TOKEN.findall(text.lower()):
+                embeddings[row] += self._word(word)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        if single:
+            embeddings = embeddings[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(embeddings)
+        return embeddings
+
+
+def install(*registries):
+    """
+    Подменяет модели во всех уже созданных CachedEncoder (реестры embedding_cache
+    бота и research_v2); веса настоящих моделей при этом не загружаются
+    """
+    for registry in registries:
+        for encoder in registry._encoders.values():
+            if not isinstance(encoder._model, StubModel):
+                encoder._model = StubModel(encoder.model_name)
@@ -0,0 +1,150 @@
+# ==========================================
+# File: synthetic.py
+# Description: synthetic CV (.docx) and vacancy CSV corpus modelled on the bundled data
+# ==========================================
+import csv
+import os
+import random
+import re
+import sys
+import uuid
+import zipfile
+from typing import Dict, List
+from xml.sax.saxutils import escape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "research_v2"))
+
+from src.docx_text import iter_docx_blocks
+
+SOURCE_CV_FOLDER = os.path.join(ROOT, "research_v2", "data", "CV")
+SOURCE_VACANCIES = os.path.join(ROOT, "research_v2", "data", "5_vacancies.csv")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+class CorpusModel:
+    """
+    Материал для генерации: абзацы и ячейки таблиц настоящих резюме, предложения
+    и заголовки настоящих вакансий, распределения длин
+    """
+
+    def __init__(self, cv_folder: str = SOURCE_CV_FOLDER, vacancies_csv: str = SOURCE_VACANCIES):
+        self.paragraphs: List[str] = []
+        self.cells: List[str] = []
+        self.cv_lengths: List[int] = []
+        for name in sorted(os.listdir(cv_folder)):
+            if not name.endswith(".docx"):
+                continue
+            count = 0
+            for kind, text in iter_docx_blocks(os.path.join(cv_folder, name)):
+                text = text.strip()
+                if not text:
+                    continue
+                (self.paragraphs if kind == "paragraph" else self.cells).append(text)
+                count += 1
+            self.cv_lengths.append(count)
+
+        self.titles: List[str] = []
+        self.sentences: List[str] = []
+        self.vacancy_lengths: List[int] = []
+        with open(vacancies_csv, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.titles.append(row["job_title"])
+                sentences = [s for s in re.split(r"(?<=[.!?])\s+", row["job_description"]) if s]
+                self.sentences.extend(sentences)
+                self.vacancy_lengths.append(len(sentences))
+
+    def cv_blocks(self, rng: random.Random):
+        """
+        Абзацы и ячейки одного резюме: число блоков — как у случайного настоящего резюме,
+        примерно каждый десятый блок уходит в таблицу, если в корпусе есть таблицы
+        """
+        count = rng.choice(self.cv_lengths)
+        paragraphs, cells = [], []
+        for _ in range(count):
+            if self.cells and rng.random() < 0.1:
+                cells.append(rng.choice(self.cells))
+            else:
+                paragraphs.append(rng.choice(self.paragraphs))
+        return paragraphs, cells
+
+    def vacancy(self, rng: random.Random) -> Dict[str, str]:
+        count = max(1, int(rng.choice(self.vacancy_lengths) * rng.uniform(0.5, 1.5)))
+        return {
+            "job_title": rng.choice(self.titles),
+            "job_description": " ".join(rng.choice(self.sentences) for _ in range(count)),
+        }
+
+
+def _paragraph_xml(text: str) -> str:
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def write_docx(path: str, paragraphs: List[str], cells: List[str]):
+    """
+    Минимальный корректный .docx: абзацы и таблица в одну колонку
+    """
+    body = "".join(_paragraph_xml(p) for p in paragraphs)
+    if cells:
+        rows = "".join(f"<w:tr><w:tc>{_paragraph_xml(c)}</w:tc></w:tr>" for c in cells)
+        body += f"<w:tbl>{rows}</w:tbl>"
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}"><w:body>{body}</w:body></w:document>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _RELS)
+        archive.writestr("word/document.xml", document)
+
+
+def generate_corpus(out_dir: str, n_cvs: int, n_vacancies: int, seed: int = 42,
+                    model: CorpusModel = None) -> Dict[str, str]:
+    """
+    Пишет out_dir/CV/1.docx … n_cvs.docx и out_dir/vacancies.csv с колонками
+    5_vacancies.csv. Повторный вызов с теми же параметрами ничего не перезаписывает
+    """
+    model = model or CorpusModel()
+    cv_folder = os.path.join(out_dir, "CV")
+    vacancies_csv = os.path.join(out_dir, "vacancies.csv")
+    os.makedirs(cv_folder, exist_ok=True)
+
+    rng = random.Random(seed)
+    for cv_id in range(1, n_cvs + 1):
+        paragraphs, cells = model.cv_blocks(rng)
+        path = os.path.join(cv_folder, f"{cv_id}.docx")
+        if not os.path.exists(path):
+            write_docx(path, paragraphs, cells)
+
+    if not os.path.exists(vacancies_csv):
+        rng = random.Random(seed + 1)
+        tmp_path = vacancies_csv + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["id", "job_description", "job_title", "uid"])
+            writer.writeheader()
+            for vacancy_id in range(1, n_vacancies + 1):
+                row = model.vacancy(rng)
+                row["id"] = vacancy_id
+                row["uid"] = uuid.UUID(int=rng.getrandbits(128)).hex
+                writer.writerow(row)
+        os.replace(tmp_path, vacancies_csv)
+
+    return {"cv_folder": cv_folder, "vacancies_csv": vacancies_csv}
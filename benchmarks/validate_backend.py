@@ -0,0 +1,206 @@
+# ==========================================
+# File: validate_backend.py
+# Description: ranking quality and speed of ONNX embedding backends against PyTorch on the annotated set
+# ==========================================
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESEARCH = os.path.join(ROOT, "research_v2")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# сравниваются векторы модели, а не кэша
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("PARSED_CACHE_PATH", "")
+
+sys.path.insert(0, RESEARCH)
+sys.path.insert(0, os.path.join(ROOT, "tg_bot"))
+
+import numpy as np
+
+from run import RssSampler
+
+# ранжирования, которые оцениваются по разметке
+PIPELINES = ("skills", "matcher")
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def evaluate_backend(backend: str, encoder: str, vectors_path: str) -> dict:
+    """
+    Один бэкенд в этом процессе: навыки KeyBERT + score_matrix (как train_and_evaluate)
+    и комбинированный скор VacancyResumeMatcher для всех пар резюме × вакансия
+    """
+    from src import embedding_cache as research_cache
+    from src.preprocessing import load_all_resumes, load_vacancies
+    from src.extract_skills import extract_skills_batch, model as skills_model
+    from src.ranking import score_matrix
+    from src.evaluation import evaluate_scores
+    from src.train_and_evaluate import load_annotations
+    import embedding_cache as bot_cache
+    from cv_matcher import VacancyResumeMatcher
+
+    matcher = VacancyResumeMatcher(backend=backend)
+    if encoder == "stub":
+        import stub_encoder
+        stub_encoder.install(research_cache, bot_cache)
+
+    resumes = load_all_resumes(os.path.join(RESEARCH, "data", "CV"))
+    vacancies = load_vacancies(os.path.join(RESEARCH, "data", "5_vacancies.csv"))
+    annot = load_annotations(os.path.join(RESEARCH, "data", "annotations-for-the-first-30-vacancies.txt"))
+    resume_ids = sorted(resumes)
+    resume_texts = [resumes[rid] for rid in resume_ids]
+    vacancy_texts = vacancies.job_description.tolist()
+
+    # загрузка весов (и экспорт в ONNX при первом запуске) отдельно от кодирования
+    with RssSampler() as rss:
+        _, load_skills = _timed(skills_model.encode, ["warm up"])
+        _, load_matcher = _timed(matcher.encode_texts, ["warm up"])
+
+        resume_skills, t_resume_skills = _timed(extract_skills_batch, resume_texts)
+        vacancy_skills, t_vacancy_skills = _timed(extract_skills_batch, vacancy_texts)
+        resume_emb, t_resume_emb = _timed(matcher.encode_texts, resume_texts)
+        vacancy_emb, t_vacancy_emb = _timed(matcher.encode_texts, vacancy_texts)
+
+    rids, skill_scores = score_matrix(dict(zip(resume_ids, resume_skills)), vacancy_skills)
+
+    vacancy_dict = {i: {"description": text} for i, text in enumerate(vacancy_texts)}
+    features = matcher.precompute_vacancy_features(vacancy_dict, dict(enumerate(vacancy_emb)))
+    matcher_scores = np.stack([matcher.score_vacancies(text, emb, features)
+                               for text, emb in zip(resume_texts, resume_emb)])
+
+    metrics = {}
+    for name, (row_ids, scores) in zip(PIPELINES, [(rids, skill_scores), (resume_ids, matcher_scores)]):
+        ndcg, spearman = evaluate_scores(row_ids, scores, annot)
+        metrics[name] = {"ndcg": ndcg.tolist(), "spearman": spearman.tolist()}
+
+    np.savez(vectors_path, resume=resume_emb, vacancy=vacancy_emb)
+    n_texts = len(resume_texts) + len(vacancy_texts)
+    return {
+        "backend": backend,
+        "metrics": metrics,
+        "timings": {
+            "load_skills_model_s": load_skills,
+            "load_matcher_model_s": load_matcher,
+            "extract_skills_s": t_resume_skills + t_vacancy_skills,
+            "encode_texts_s": t_resume_emb + t_vacancy_emb,
+            "encode_texts_per_s": n_texts / max(t_resume_emb + t_vacancy_emb, 1e-9),
+        },
+        "rss_peak_mb": rss.peak / 2 ** 20,
+    }
+
+
+def run_child(backend: str, encoder: str, workdir: str) -> dict:
+    """
+    Каждый бэкенд — в отдельном процессе: модели создаются при импорте модулей,
+    а замер памяти не должен включать веса другого бэкенда
+    """
+    out_path = os.path.join(workdir, f"{backend}.json")
+    vectors_path = os.path.join(workdir, f"{backend}.npz")
+    env = dict(os.environ, EMBEDDING_BACKEND=backend)
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", backend, "--encoder", encoder,
+                    "--child-out", out_path, "--child-vectors", vectors_path],
+                   env=env, cwd=RESEARCH, check=True)
+    with open(out_path, encoding="utf-8") as f:
+        result = json.load(f)
+    with np.load(vectors_path) as vectors:
+        result["vectors"] = {name: vectors[name] for name in vectors.files}
+    return result
+
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+
+def compare(reference: dict, candidate: dict) -> dict:
+    """
+    Разница средних NDCG/Spearman, худшая вакансия и близость векторов к эталону
+    """
+    report = {}
+    for name in PIPELINES:
+        entry = {}
+        for metric in ("ndcg", "spearman"):
+            ref = np.asarray(reference["metrics"][name][metric], dtype=np.float64)
+            cand = np.asarray(candidate["metrics"][name][metric], dtype=np.float64)
+            entry[metric] = float(np.nanmean(cand))
+            entry[f"{metric}_delta"] = float(np.nanmean(cand) - np.nanmean(ref))
+            entry[f"{metric}_max_abs_delta"] = float(np.nanmax(np.abs(cand - ref)))
+        report[name] = entry
+    cosines = np.concatenate([_cosine_rows(reference["vectors"][k], candidate["vectors"][k])
+                              for k in ("resume", "vacancy")])
+    report["embedding_cosine_mean"] = float(cosines.mean())
+    report["embedding_cosine_min"] = float(cosines.min())
+    report["speedup_encode"] = candidate["timings"]["encode_texts_per_s"] / reference["timings"]["encode_texts_per_s"]
+    report["rss_delta_mb"] = candidate["rss_peak_mb"] - reference["rss_peak_mb"]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ONNX/int8 embedding backends vs PyTorch on the annotated set")
+    parser.add_argument("--backends", nargs="+", default=["onnx-int8"], choices=["onnx", "onnx-int8"])
+    parser.add_argument("--encoder", choices=["stub", "model"], default="model",
+                        help="stub: hash-based offline encoder, only checks the plumbing")
+    parser.add_argument("--max-ndcg-drop", type=float, default=0.01,
+                        help="exit code 1 if mean NDCG of any pipeline drops by more than this")
+    parser.add_argument("--out", help="results JSON, default: benchmarks/results/backend-<timestamp>.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    parser.add_argument("--child-vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = evaluate_backend(args.child, args.encoder, args.child_vectors)
+        with open(args.child_out, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        reference = run_child("torch", args.encoder, workdir)
+        candidates = {backend: run_child(backend, args.encoder, workdir) for backend in args.backends}
+
+    failed = False
+    report = {"torch": {k: v for k, v in reference.items() if k != "vectors"}, "backends": {}}
+    print(f"\n{'бэкенд':<10} {'конвейер':<8} {'NDCG':>7} {'ΔNDCG':>8} {'Spearman':>9} {'ΔSpearman':>10}")
+    for name in PIPELINES:
+        ref = reference["metrics"][name]
+        print(f"{'torch':<10} {name:<8} {np.nanmean(ref['ndcg']):>7.4f} {'':>8} "
+              f"{np.nanmean(ref['spearman']):>9.4f}")
+    for backend, candidate in candidates.items():
+        summary = compare(reference, candidate)
+        report["backends"][backend] = {
+            "summary": summary,
+            "result": {k: v for k, v in candidate.items() if k != "vectors"},
+        }
+        for name in PIPELINES:
+            entry = summary[name]
+            print(f"{backend:<10} {name:<8} {entry['ndcg']:>7.4f} {entry['ndcg_delta']:>+8.4f} "
+                  f"{entry['spearman']:>9.4f} {entry['spearman_delta']:>+10.4f}")
+            failed |= entry["ndcg_delta"] < -args.max_ndcg_drop
+        print(f"{backend}: косинус к torch {summary['embedding_cosine_mean']:.4f} "
+              f"(мин. {summary['embedding_cosine_min']:.4f}), кодирование ×{summary['speedup_encode']:.2f}, "
+              f"RSS {summary['rss_delta_mb']:+.0f} МБ")
+
+    out_path = args.out or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("backend-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out_path}")
+    if failed:
+        print(f"NDCG упал больше чем на {args.max_ndcg_drop}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
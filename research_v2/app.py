@@ -1,31 +1,61 @@
+import os
+
 import streamlit as st
-from docx import Document
-from src.preprocessing import load_vacancies
+from src.preprocessing import load_vacancies, read_docx
 from src.extract_skills import extract_skills
-from src.ranking import skill_similarity
+from src.ranking import embedder, skill_similarity, skill_similarity_precomputed
+from src.catalog_artifact import open_artifact
+
+VACANCIES_CSV = 'data/5_vacancies.csv'
+# собирается командой tg_bot/compile_catalog.py --csv research_v2/data/5_vacancies.csv
+CATALOG_ARTIFACT = os.environ.get("CATALOG_ARTIFACT", 'data/5_vacancies.vcat')
+
+@st.cache_resource
+def load_artifact():
+    artifact = open_artifact(CATALOG_ARTIFACT)
+    if artifact is not None and not artifact.matches_csv(VACANCIES_CSV):
+        print(f"Артефакт {CATALOG_ARTIFACT} собран из другой версии {VACANCIES_CSV}, пропускаю")
+        return None
+    if artifact is not None and artifact.meta.get("skills_model") != embedder.cache_name:
+        print(f"Артефакт {CATALOG_ARTIFACT} собран другой моделью навыков, пропускаю")
+        return None
+    return artifact
 
 st.title("AI Resume Matcher")
 
-vacancies = load_vacancies()
+artifact = load_artifact()
+
+if artifact is not None:
+    titles = [vacancy["title"] for vacancy in artifact.vacancies]
+else:
+    vacancies = load_vacancies(VACANCIES_CSV)
+    titles = vacancies["job_title"].tolist()
 
 st.sidebar.header("Вакансия")
 vac_title = st.sidebar.selectbox(
     "Выберите вакансию",
-    vacancies["job_title"].tolist()
+    titles
 )
 
-vac_row = vacancies[vacancies["job_title"] == vac_title].iloc[0]
-vac_skills = extract_skills(vac_row.job_description)
+if artifact is not None:
+    # навыки вакансии и их эмбеддинги уже посчитаны
+    vac_skills, vac_skill_embeddings = artifact.skills(titles.index(vac_title))
+else:
+    vac_row = vacancies[vacancies["job_title"] == vac_title].iloc[0]
+    vac_skills = extract_skills(vac_row.job_description)
+    vac_skill_embeddings = None
 
 uploaded = st.file_uploader("Загрузите резюме (.docx)", type=["docx"])
 
 if uploaded:
-    doc = Document(uploaded)
-    text = "\n".join([p.text for p in doc.paragraphs])
+    text = read_docx(uploaded)
 
     resume_skills = extract_skills(text)
 
-    similarity = skill_similarity(resume_skills, vac_skills)
+    if vac_skill_embeddings is not None:
+        similarity = skill_similarity_precomputed(resume_skills, vac_skill_embeddings)
+    else:
+        similarity = skill_similarity(resume_skills, vac_skills)
 
     st.subheader("Процент соответствия навыков")
     st.metric(label="Match %", value=f"{similarity * 100:.2f}%")
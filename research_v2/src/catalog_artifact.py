@@ -0,0 +1,145 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"VCATALOG"
+FORMAT_VERSION = 1
+
+# MAGIC, версия формата, длина JSON-заголовка
+_PREFIX = struct.Struct("<8sII")
+# массивы выравниваются, чтобы их можно было читать из mmap без копирования
+_ALIGN = 64
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_artifact(path: str, meta: Dict, vacancies: List[Dict], arrays: Dict[str, np.ndarray]):
+    """
+    Запись артефакта: префикс, JSON-заголовок (meta, записи вакансий, раскладка массивов),
+    затем массивы little-endian с выравниванием. Файл пишется во временный и подменяется
+    одним rename, так что читатель никогда не видит его недописанным
+    """
+    arrays = {name: np.ascontiguousarray(a, dtype=a.dtype.newbyteorder("<")) for name, a in arrays.items()}
+
+    def header_bytes(layout):
+        header = {"meta": meta, "vacancies": vacancies, "arrays": layout}
+        return json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    # смещения зависят от длины заголовка, а заголовок — от смещений: считаем до сходимости
+    layout = {name: {"dtype": a.dtype.str, "shape": list(a.shape), "offset": 0} for name, a in arrays.items()}
+    while True:
+        offset = _aligned(_PREFIX.size + len(header_bytes(layout)))
+        changed = False
+        for name, a in arrays.items():
+            if layout[name]["offset"] != offset:
+                layout[name]["offset"] = offset
+                changed = True
+            offset = _aligned(offset + a.nbytes)
+        if not changed:
+            break
+    header = header_bytes(layout)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, a in arrays.items():
+            f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+            f.write(a.tobytes())
+    os.replace(tmp_path, path)
+
+
+class CatalogArtifact:
+    """
+    Артефакт каталога, открытый через mmap: массивы — представления numpy над файлом,
+    страницы читаются с диска по мере обращения и разделяются между процессами
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < _PREFIX.size:
+                raise ArtifactError(f"{path}: файл обрезан")
+            magic, version, header_len = _PREFIX.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ArtifactError(f"{path}: не артефакт каталога")
+            if version != FORMAT_VERSION:
+                raise ArtifactError(f"{path}: версия формата {version}, ожидалась {FORMAT_VERSION}")
+            header = json.loads(self._mmap[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+        except Exception:
+            self._mmap.close()
+            raise
+
+        self.meta: Dict = header["meta"]
+        self.vacancies: List[Dict] = header["vacancies"]
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            if spec["offset"] + count * dtype.itemsize > len(self._mmap):
+                raise ArtifactError(f"{self.path}: массив {name} выходит за конец файла")
+            self.arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                                              offset=spec["offset"]).reshape(spec["shape"])
+
+    def __len__(self):
+        return len(self.vacancies)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self.arrays["embeddings"]
+
+    @property
+    def word_counts(self) -> np.ndarray:
+        return self.arrays["word_counts"]
+
+    def matches_csv(self, csv_path: str) -> bool:
+        """
+        Собран ли артефакт из этого же CSV
+        """
+        return self.meta.get("csv_sha1") == file_sha1(csv_path)
+
+    def skills(self, row: int) -> Tuple[List[str], np.ndarray]:
+        """
+        Навыки вакансии (фразы KeyBERT) и их нормированные эмбеддинги
+        """
+        offsets = self.arrays["skill_offsets"]
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return self.vacancies[row]["skills"], self.arrays["skill_embeddings"][start:end]
+
+
+def open_artifact(path: Optional[str]) -> Optional[CatalogArtifact]:
+    """
+    Артефакт по пути или None, если файла нет или он не читается
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return CatalogArtifact(path)
+    except (ArtifactError, OSError, ValueError, KeyError) as e:
+        print(f"Артефакт каталога {path} не загружен: {e}")
+        return None
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_path_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".vcat"
@@ -0,0 +1,30 @@
+import numpy as np
+
+from src.metrics import compute_metrics_matrix
+
+def top_model_orders(rids, scores, max_rid=30, top=5):
+    """
+    model_order для каждой вакансии (столбца матрицы скоров): top лучших резюме
+    с id <= max_rid. Порядок как у rank_resumes_for_vacancy: по убыванию скора,
+    при равенстве — по порядку строк
+    """
+    rids = np.asarray(rids)
+    annotated = np.flatnonzero(rids.astype(np.int64) <= max_rid)
+    if len(annotated) < top:
+        raise ValueError(f"Размеченных резюме {len(annotated)}, нужно хотя бы {top}")
+
+    order = np.argsort(-scores[annotated], axis=0, kind='stable')[:top]
+    return rids[annotated][order].T.astype(np.int64)
+
+def evaluate_scores(rids, scores, annot, columns=None, max_rid=30):
+    """
+    NDCG и Spearman для вакансий columns (по умолчанию всех) по готовой матрице скоров.
+    Вариант скоринга оценивается без повторного ранжирования: достаточно передать
+    другую матрицу той же формы
+    """
+    if columns is None:
+        columns = np.arange(scores.shape[1])
+    columns = np.asarray(columns)
+    hr_ranks = np.asarray([annot[i] for i in columns], dtype=np.float64)
+    model_orders = top_model_orders(rids, scores[:, columns], max_rid=max_rid, top=hr_ranks.shape[1])
+    return compute_metrics_matrix(hr_ranks, model_orders)
@@ -1,8 +1,25 @@
+import numpy as np
 from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
+from keybert.backend import BaseEmbedder
+from sklearn.feature_extraction.text import CountVectorizer
+from src.embedding_cache import get_encoder
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-kw_model = KeyBERT(model=model)
+
+class CachedBackend(BaseEmbedder):
+    """
+    Бэкенд KeyBERT, который берёт эмбеддинги документов и фраз-кандидатов из общего кэша
+    """
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+
+    def embed(self, documents, verbose=False):
+        return self.encoder.encode(documents, show_progress_bar=verbose)
+
+
+model = get_encoder('all-MiniLM-L6-v2')
+kw_model = KeyBERT(model=CachedBackend(model))
 
 def extract_skills(text, top_n=25):
     """
@@ -14,4 +31,51 @@ def extract_skills(text, top_n=25):
         stop_words='english',
         top_n= top_n
     )
-    return [k[0] for k in keywords]
\ No newline at end of file
+    return [k[0] for k in keywords]
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def extract_skills_batch(texts, top_n=25, chunk_size=64):
+    """
+    Пакетная версия extract_skills: те же фразы, что и для одиночного вызова.
+
+    Словарь n-грамм строится по всему корпусу, каждая фраза кодируется один раз
+    (и берётся из кэша при повторных запусках), а кандидаты документа
+    оцениваются одним матричным произведением документов на словарь
+    """
+    texts = list(texts)
+    results = [[] for _ in texts]
+    positions = [i for i, text in enumerate(texts) if text]
+    if not positions:
+        return results
+
+    docs = [texts[i] for i in positions]
+    try:
+        count = CountVectorizer(ngram_range=(1, 2), stop_words='english').fit(docs)
+    except ValueError:
+        # во всех документах только стоп-слова
+        return results
+
+    vocabulary = count.get_feature_names_out()
+    doc_term = count.transform(docs).tocsr()
+    doc_term.sort_indices()
+
+    doc_emb = _normalize_rows(model.encode(docs))
+    vocab_emb = _normalize_rows(model.encode(vocabulary.tolist()))
+
+    for start in range(0, len(docs), chunk_size):
+        sims = doc_emb[start:start + chunk_size] @ vocab_emb.T
+        for row in range(sims.shape[0]):
+            doc = start + row
+            candidates = doc_term.indices[doc_term.indptr[doc]:doc_term.indptr[doc + 1]]
+            if len(candidates) == 0:
+                continue
+            distances = sims[row, candidates]
+            best = distances.argsort()[-top_n:][::-1]
+            results[positions[doc]] = [str(vocabulary[candidates[i]]) for i in best]
+
+    return results
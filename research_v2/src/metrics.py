@@ -1,6 +1,6 @@
 import numpy as np
 from sklearn.metrics import ndcg_score
-from scipy.stats import spearmanr
+from scipy.stats import rankdata, spearmanr
 
 def normalize_ranking(ranking):
     n = len(ranking)
@@ -27,4 +27,45 @@ def compute_metrics(hr_rank, model_rank):
         if spearman is None or np.isnan(spearman):
             spearman = 0.0
 
-    return ndcg, spearman
\ No newline at end of file
+    return ndcg, spearman
+
+def ndcg_matrix(hr_ranks, model_ranks):
+    """
+    NDCG из compute_metrics сразу для всех строк: hr_ranks и model_ranks — матрицы
+    вакансия x позиция одинаковой формы. Совпадающие значения model_rank в строке
+    обрабатываются как в ndcg_score: выгода внутри группы равных усредняется
+    """
+    hr_ranks = np.asarray(hr_ranks, dtype=np.float64)
+    model_ranks = np.asarray(model_ranks, dtype=np.float64)
+    n = hr_ranks.shape[1]
+    gains = n - hr_ranks + 1
+    model_scores = n - model_ranks + 1
+
+    discounts = 1 / np.log2(np.arange(n) + 2)
+    order = np.argsort(-model_scores, axis=1, kind='stable')
+    sorted_scores = np.take_along_axis(model_scores, order, axis=1)
+    sorted_gains = np.take_along_axis(gains, order, axis=1)
+    # сквозные номера групп равных скоров по всем строкам
+    starts = np.ones(sorted_scores.shape, dtype=bool)
+    starts[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+    groups = np.cumsum(starts.ravel()) - 1
+    mean_gains = np.bincount(groups, weights=sorted_gains.ravel()) / np.bincount(groups)
+    dcg = mean_gains[groups].reshape(sorted_gains.shape) @ discounts
+    ideal = -np.sort(-gains, axis=1) @ discounts
+    return np.divide(dcg, ideal, out=np.zeros_like(dcg), where=ideal > 0)
+
+def spearman_matrix(hr_ranks, model_ranks):
+    """
+    Spearman из compute_metrics сразу для всех строк; константная строка даёт 0
+    """
+    hr = rankdata(np.asarray(hr_ranks, dtype=np.float64), axis=1)
+    model = rankdata(np.asarray(model_ranks, dtype=np.float64), axis=1)
+    hr -= hr.mean(axis=1, keepdims=True)
+    model -= model.mean(axis=1, keepdims=True)
+
+    num = (hr * model).sum(axis=1)
+    den = np.sqrt((hr ** 2).sum(axis=1) * (model ** 2).sum(axis=1))
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+def compute_metrics_matrix(hr_ranks, model_ranks):
+    return ndcg_matrix(hr_ranks, model_ranks), spearman_matrix(hr_ranks, model_ranks)
@@ -0,0 +1,76 @@
+import os
+import threading
+
+# torch — исходная модель; onnx — экспорт в ONNX; onnx-int8 — экспорт с динамическим квантованием весов
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# набор инструкций для квантования: arm64, avx2, avx512, avx512_vnni
+QUANTIZATION = os.environ.get("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+EXPORT_DIR = os.environ.get("EMBEDDING_ONNX_DIR", ".cache/onnx")
+
+_export_lock = threading.Lock()
+
+
+def check_backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд эмбеддингов {backend!r}, допустимы: {', '.join(BACKENDS)}")
+    return backend
+
+
+def backend_model_name(model_name, backend):
+    """
+    Имя модели для ключей кэша и метаданных каталога: векторы разных бэкендов немного
+    различаются и не должны смешиваться. Для torch остаётся исходное имя
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def export_path(model_name, export_dir=EXPORT_DIR):
+    return os.path.join(export_dir, model_name.replace("/", "__"))
+
+
+def quantized_file(quantization=QUANTIZATION):
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def export_model(model_name, quantize=True, quantization=QUANTIZATION, export_dir=EXPORT_DIR, **model_kwargs):
+    """
+    Экспорт модели в ONNX (и квантованной копии) в каталог export_dir/<модель>.
+    Повторный вызов ничего не делает, если файлы уже есть
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = export_path(model_name, export_dir)
+    with _export_lock:
+        model = None
+        if not os.path.exists(os.path.join(path, "onnx", "model.onnx")):
+            print(f"Экспорт {model_name} в ONNX: {path}")
+            model = SentenceTransformer(model_name, backend="onnx", **model_kwargs)
+            model.save(path)
+        if quantize and not os.path.exists(os.path.join(path, quantized_file(quantization))):
+            print(f"Квантование {model_name} в int8 ({quantization})")
+            if model is None:
+                model = SentenceTransformer(path, backend="onnx", **model_kwargs)
+            export_dynamic_quantized_onnx_model(model, quantization, path)
+    return path
+
+
+def load_model(model_name, backend=None, **model_kwargs):
+    """
+    SentenceTransformer на выбранном бэкенде. ONNX-модели экспортируются при первом запуске
+    и дальше грузятся из каталога экспорта; инференс идёт в ONNX Runtime на CPU
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = check_backend(backend)
+    if backend == "torch":
+        return SentenceTransformer(model_name, **model_kwargs)
+
+    quantize = backend == "onnx-int8"
+    onnx_kwargs = dict(model_kwargs.pop("model_kwargs", None) or {})
+    path = export_model(model_name, quantize=quantize, **model_kwargs)
+    onnx_kwargs.setdefault("provider", "CPUExecutionProvider")
+    onnx_kwargs["file_name"] = quantized_file() if quantize else "onnx/model.onnx"
+    return SentenceTransformer(path, backend="onnx", model_kwargs=onnx_kwargs, **model_kwargs)
+
@@ -1,32 +1,45 @@
-import docx
 import pandas as pd
 import os
 
+from src.docx_text import extract_docx_text
+from src.resume_ingest import PARSED_CACHE_PATH, iter_docx_texts
+from src.vacancy_columns import BATCH_SIZE, iter_vacancy_batches
+
+# колонки вакансий, которые нужны ранжированию; остальные колонки CSV не читаются
+VACANCY_COLUMNS = {'id': 'int64', 'job_description': 'str', 'job_title': 'str'}
+
 def read_docx (file_path):
-    doc = docx.Document(file_path)
-    text = []
-    for p in doc.paragraphs:
-        if p.text.strip():
-            text.append(p.text)
-    
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                cell_text = cell.text.strip()
-                if cell_text:
-                    text.append(cell_text)
-
-    return '\n'.join(text).strip()
-    
-def load_all_resumes(cv_folder = 'data/CV'):
-    resumes = {}
+    """
+    Непустые абзацы, затем непустые ячейки таблиц.
+    Разбор word/document.xml потоком, без объектной модели python-docx
+    """
+    return extract_docx_text(file_path)
+
+def iter_resumes(cv_folder = 'data/CV', workers = None, cache_path = PARSED_CACHE_PATH):
+    """
+    Генератор (rid, text): разбор docx в пуле процессов, неизменённые файлы берутся из кэша
+    """
+    rids = {}
     for fname in os.listdir(cv_folder):
         if fname.endswith('.docx'):
-            rid = int(fname.split('.')[0])
-            resumes[rid] = read_docx(os.path.join(cv_folder,fname))
-    return resumes
+            rids[os.path.abspath(os.path.join(cv_folder, fname))] = int(fname.split('.')[0])
+
+    for path, text in iter_docx_texts(list(rids), read_docx, workers=workers, cache_path=cache_path):
+        yield rids[path], text
+
+def load_all_resumes(cv_folder = 'data/CV', workers = None):
+    return dict(iter_resumes(cv_folder, workers=workers))
+
+def iter_vacancies(file_path = 'data/5_vacancies.csv', batch_size = BATCH_SIZE):
+    """
+    Генератор DataFrame по batch_size вакансий (id, job_description, job_title).
+    CSV разбирается один раз в колоночный файл рядом с ним, дальше читается он
+    """
+    for batch in iter_vacancy_batches(file_path, VACANCY_COLUMNS, batch_size):
+        yield pd.DataFrame(batch, columns=list(VACANCY_COLUMNS))
 
 def load_vacancies(file_path = 'data/5_vacancies.csv'):
-    df = pd.read_csv(file_path)
-    df = df[['id', 'job_description', 'job_title']]
-    return df
\ No newline at end of file
+    batches = list(iter_vacancies(file_path))
+    if not batches:
+        return pd.DataFrame(columns=list(VACANCY_COLUMNS))
+    return pd.concat(batches, ignore_index=True)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+PARSED_CACHE_PATH = os.environ.get("PARSED_CACHE_PATH", ".cache/parsed_docx.sqlite")
+
+# как часто сбрасывать новые записи кэша на диск
+_COMMIT_EVERY = 500
+
+
+class ParsedTextCache:
+    """
+    Кэш извлечённого текста: запись действительна, пока у файла
+    не изменились mtime и размер и пока не сменился экстрактор
+    """
+
+    def __init__(self, path: Optional[str] = PARSED_CACHE_PATH):
+        self.path = path or None
+        self._conn = None
+        self._pending = 0
+        if self.path is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS parsed "
+                "(path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, reader TEXT, text TEXT)"
+            )
+
+    def get(self, path: str, mtime_ns: int, size: int, reader: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT text FROM parsed WHERE path = ? AND mtime_ns = ? AND size = ? AND reader = ?",
+            (path, mtime_ns, size, reader)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path: str, mtime_ns: int, size: int, reader: str, text: str):
+        if self._conn is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO parsed (path, mtime_ns, size, reader, text) VALUES (?, ?, ?, ?, ?)",
+            (path, mtime_ns, size, reader, text)
+        )
+        self._pending += 1
+        if self._pending >= _COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self._conn is not None and self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+
+def iter_docx_texts(paths: Iterable[str], reader: Callable[[str], str],
+                    workers: Optional[int] = None,
+                    cache_path: Optional[str] = PARSED_CACHE_PATH) -> Iterator[Tuple[str, str]]:
+    """
+    Потоковая загрузка: отдаёт (путь, текст) по мере готовности.
+    Сначала — файлы из кэша, затем разобранные пулом процессов в исходном порядке.
+    reader должен быть функцией уровня модуля, чтобы его можно было передать в процесс
+    """
+    reader_name = f"{reader.__module__}.{reader.__qualname__}"
+    cache = ParsedTextCache(cache_path)
+    try:
+        to_parse = []
+        for path in paths:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            text = cache.get(path, stat.st_mtime_ns, stat.st_size, reader_name)
+            if text is None:
+                to_parse.append((path, stat.st_mtime_ns, stat.st_size))
+            else:
+                yield path, text
+
+        if not to_parse:
+            return
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(to_parse) == 1:
+            parsed = map(reader, [p for p, _, _ in to_parse])
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            chunksize = max(1, len(to_parse) // (workers * 4))
+            parsed = pool.map(reader, [p for p, _, _ in to_parse], chunksize=chunksize)
+
+        try:
+            for (path, mtime_ns, size), text in zip(to_parse, parsed):
+                cache.put(path, mtime_ns, size, reader_name, text)
+                yield path, text
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        cache.close()
@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+# строк центроидов на одно произведение внутри шарда: блок скоров q x строк остаётся небольшим
+_ROW_BLOCK = 8192
+
+# матрица центроидов пула в воркере, только для чтения
+_pool = {}
+
+
+def _attach(name, shape):
+    """
+    Инициализатор воркера: подключение к общей памяти с центроидами без копирования.
+    BLAS в воркере однопоточный, параллельность — за счёт процессов
+    """
+    # у spawn-воркеров общий с родителем resource_tracker, память освобождает родитель в close()
+    shm = shared_memory.SharedMemory(name=name)
+    centroids = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    centroids.flags.writeable = False
+    _pool.update(shm=shm, centroids=centroids)
+    try:
+        from threadpoolctl import threadpool_limits
+        _pool["limits"] = threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def top_k_rows(scores, positions, k):
+    """
+    k лучших в каждой строке scores (q x n): номера positions и скоры по убыванию.
+    При равных скорах выше меньший номер, как у устойчивой сортировки всего пула
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((len(scores), 0), dtype=np.int64), np.zeros((len(scores), 0), dtype=scores.dtype)
+    if k < scores.shape[1]:
+        # из равных k-му скору cumsum берёт левые столбцы, а нужны меньшие номера:
+        # столбцы сначала упорядочиваются по номеру (в merge_top_k частичные топы
+        # склеены в порядке готовности шардов)
+        if positions.ndim > 1 or np.any(positions[1:] < positions[:-1]):
+            positions = np.broadcast_to(positions, scores.shape)
+            by_position = np.argsort(positions, axis=1, kind='stable')
+            positions = np.take_along_axis(positions, by_position, axis=1)
+            scores = np.take_along_axis(scores, by_position, axis=1)
+        neg = -scores
+        kth = np.partition(neg, k - 1, axis=1)[:, k - 1:k]
+        better = neg < kth
+        tied = neg == kth
+        need = k - better.sum(axis=1, keepdims=True)
+        cols = np.nonzero(better | (tied & (np.cumsum(tied, axis=1) <= need)))[1].reshape(len(scores), k)
+        scores = np.take_along_axis(scores, cols, axis=1)
+        positions = np.broadcast_to(positions, neg.shape) if positions.ndim == 1 else positions
+        positions = np.take_along_axis(positions, cols, axis=1)
+    else:
+        positions = np.broadcast_to(positions, scores.shape)
+    order = np.lexsort((positions, -scores), axis=1)
+    return np.take_along_axis(positions, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def merge_top_k(a, b, k):
+    """
+    Слияние двух частичных топов (номера, скоры) в общий топ-k
+    """
+    positions = np.concatenate([a[0], b[0]], axis=1)
+    scores = np.concatenate([a[1], b[1]], axis=1)
+    return top_k_rows(scores, positions, k)
+
+
+def _score_shard(start, stop, queries, k):
+    """
+    Топ-k шарда [start, stop) для каждого запроса; в памяти только блок скоров и q x k лучших
+    """
+    centroids = _pool["centroids"]
+    best = (np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32))
+    for lo in range(start, stop, _ROW_BLOCK):
+        hi = min(lo + _ROW_BLOCK, stop)
+        scores = queries @ centroids[lo:hi].T
+        best = merge_top_k(best, top_k_rows(scores, np.arange(lo, hi), k), k)
+    return best
+
+
+class ShardedResumePool:
+    """
+    Пул резюме для поиска по большим базам: центроиды навыков (SkillCentroidIndex)
+    лежат в общей памяти, пул делится на шарды, шарды считаются в процессах-воркерах.
+    Каждый воркер возвращает только топ-k своего шарда, частичные топы сливаются
+    по мере готовности, так что память на запрос ограничена k, а не размером пула.
+    Скоры те же, что у rank_resumes_for_vacancy (с точностью до округления float32)
+    """
+
+    def __init__(self, ids, centroids, workers=None, shard_size=50000):
+        centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.ids = np.asarray(ids)
+        self.dim = centroids.shape[1]
+        self.shards = [(lo, min(lo + shard_size, len(centroids))) for lo in range(0, len(centroids), shard_size)]
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(centroids.nbytes, 1))
+        np.ndarray(centroids.shape, dtype=np.float32, buffer=self._shm.buf)[:] = centroids
+        # spawn: воркеры не наследуют модели и потоки torch родителя
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1, mp_context=get_context("spawn"),
+            initializer=_attach, initargs=(self._shm.name, centroids.shape))
+
+    @classmethod
+    def from_index(cls, index, **kwargs):
+        return cls(index.ids, index.centroids, **kwargs)
+
+    @classmethod
+    def from_skills(cls, resume_skills_dict, **kwargs):
+        from src.ranking import SkillCentroidIndex
+        return cls.from_index(SkillCentroidIndex.build(resume_skills_dict), **kwargs)
+
+    def close(self):
+        self._executor.shutdown()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _queries(self, vacancy_skills_list):
+        """
+        Центроиды навыков вакансий (q x dim); вакансия — список фраз или готовый центроид
+        """
+        from src.ranking import skill_centroid
+        rows = [np.asarray(v, dtype=np.float32) if isinstance(v, np.ndarray) else skill_centroid(v)
+                for v in vacancy_skills_list]
+        return np.array(rows, dtype=np.float32).reshape(len(rows), self.dim)
+
+    def _ranked(self, best):
+        return [[(self.ids[p].item(), float(s)) for p, s in zip(positions, scores)]
+                for positions, scores in zip(*best)]
+
+    def stream(self, vacancy_skills_list, k=5):
+        """
+        Генератор частичных результатов: после каждого готового шарда —
+        (готово шардов, всего шардов, топ-k для каждой вакансии по уже посчитанным шардам)
+        """
+        queries = self._queries(vacancy_skills_list)
+        best = (np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32))
+        pending = {self._executor.submit(_score_shard, lo, hi, queries, k) for lo, hi in self.shards}
+        done = 0
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    best = merge_top_k(best, future.result(), k)
+                    done += 1
+                yield done, len(self.shards), self._ranked(best)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def top_k(self, vacancy_skills_list, k=5):
+        """
+        Итоговый топ-k резюме для каждой вакансии: список списков (id, скор)
+        """
+        ranked = [[] for _ in vacancy_skills_list]
+        for _, _, ranked in self.stream(vacancy_skills_list, k):
+            pass
+        return ranked
@@ -1,8 +1,9 @@
 import ast
 from src.preprocessing import load_all_resumes, load_vacancies
-from src.extract_skills import extract_skills
-from src.ranking import rank_resumes_for_vacancy
-from src.metrics import compute_metrics
+from src.extract_skills import extract_skills_batch
+from src.ranking import score_matrix
+from src.resume_dedup import collapse_duplicates
+from src.evaluation import evaluate_scores
 
 import numpy as np
 from sklearn.model_selection import KFold
@@ -22,13 +23,15 @@ def load_annotations(path='data/annotations-for-the-first-30-vacancies.txt'):
 
 
 def kfold_evaluate(
-        resumes,
         vacancies,
-        resume_skills_dict,
-        vacancy_skills_dict,
+        rids,
+        scores,
         annot,
         k_folds=5
 ):
+    """
+    Фолды — наборы столбцов матрицы скоров, повторного ранжирования нет
+    """
     print("\n\n===== STARTING K-FOLD CROSS-VALIDATION =====")
 
     kf = KFold(n_splits=k_folds, shuffle=True, random_state=42)
@@ -40,25 +43,7 @@ def kfold_evaluate(
     for fold, (train_idx, test_idx) in enumerate(kf.split(vacancy_indices), 1):
         print(f"\n===== FOLD {fold} / {k_folds} =====")
 
-        ndcg_scores = []
-        spear_scores = []
-
-        for i in test_idx:
-            row = vacancies.iloc[i]
-            vid = row.id
-
-            vac_sk = vacancy_skills_dict[vid]
-
-            # ранжирование
-            ranked = rank_resumes_for_vacancy(resume_skills_dict, vac_sk)
-            model_order = [int(r[0]) for r in ranked if int(r[0]) <= 30][:5]
-
-            hr_rank = annot[i]
-
-            ndcg, spearman = compute_metrics(hr_rank, model_order)
-
-            ndcg_scores.append(ndcg)
-            spear_scores.append(spearman)
+        ndcg_scores, spear_scores = evaluate_scores(rids, scores, annot, columns=test_idx)
 
         mean_ndcg = np.nanmean(ndcg_scores)
         mean_spear = np.nanmean(spear_scores)
@@ -85,33 +70,36 @@ def train_and_evaluate():
     vacancies = load_vacancies()
     annot = load_annotations()
 
+    # одинаковые и почти одинаковые резюме: навыки и скоры считаются один раз на группу
+    resume_ids = list(resumes.keys())
+    representative = collapse_duplicates(resumes)
+    unique_ids = list(dict.fromkeys(representative.values()))
+
     # извлечение навыков
-    resume_skills_dict = {rid: extract_skills(text) for rid, text in resumes.items()}
-    vacancy_skills_dict = {row.id: extract_skills(row.job_description) for _, row in vacancies.iterrows()}
+    resume_skills = extract_skills_batch([resumes[rid] for rid in unique_ids])
+    resume_skills_dict = dict(zip(unique_ids, resume_skills))
+    vacancy_skills = extract_skills_batch(vacancies.job_description.tolist())
+
+    # скоры всех резюме для всех вакансий, один раз; дальше только срезы
+    unique_rids, unique_scores = score_matrix(resume_skills_dict, vacancy_skills)
+    row = {rid: i for i, rid in enumerate(unique_rids.tolist())}
+    rids = np.array(resume_ids)
+    scores = unique_scores[[row[representative[rid]] for rid in resume_ids]]
+    if len(unique_ids) < len(resume_ids):
+        print(f'Повторов среди резюме: {len(resume_ids) - len(unique_ids)}')
 
     # k-fold validation
     kfold_evaluate(
-        resumes,
         vacancies,
-        resume_skills_dict,
-        vacancy_skills_dict,
+        rids,
+        scores,
         annot,
         k_folds=5
     )
 
     # обычная оценка
-    all_results = []
-    for i, row in vacancies.iterrows():
-        vid = row.id
-        vac_sk = vacancy_skills_dict[vid]
-
-        ranked = rank_resumes_for_vacancy(resume_skills_dict, vac_sk)
-
-        model_order = [int(r[0]) for r in ranked if int(r[0]) <= 30][:5]
-        hr_rank = annot[i]
-
-        ndcg, spearman = compute_metrics(hr_rank, model_order)
-        all_results.append((ndcg, spearman))
+    ndcg_scores, spear_scores = evaluate_scores(rids, scores, annot)
+    all_results = list(zip(ndcg_scores.tolist(), spear_scores.tolist()))
 
     print('\nРЕЗУЛЬТАТЫ МОДЕЛИ')
     for idx, r in enumerate(all_results):
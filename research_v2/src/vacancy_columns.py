@@ -0,0 +1,279 @@
+import csv
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"VCOLUMNS"
+FORMAT_VERSION = 1
+
+# колонки вакансий и их типы: int64 или str (UTF-8)
+VACANCY_COLUMNS = {"id": "int64", "job_title": "str", "job_description": "str", "uid": "str"}
+BATCH_SIZE = int(os.environ.get("VACANCY_BATCH_SIZE", 10000))
+# 0 — не писать колоночный кэш рядом с CSV, каждый раз читать CSV потоком
+COLUMNS_CACHE = os.environ.get("VACANCY_COLUMNS_CACHE", "1") != "0"
+
+# MAGIC, версия формата, длина JSON-заголовка
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 64
+_COPY_CHUNK = 1 << 20
+
+
+def _raise_field_limit():
+    # по умолчанию csv не читает поля длиннее 128 КБ, а описания вакансий бывают больше
+    limit = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(limit)
+            return
+        except OverflowError:
+            limit //= 2
+
+
+def read_csv_batches(csv_path: str, columns: Dict[str, str] = VACANCY_COLUMNS,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Dict[str, list]]:
+    """
+    Генератор батчей по batch_size строк: колонка -> список значений.
+    Остальные колонки CSV отбрасываются сразу, в памяти только текущий батч
+    """
+    _raise_field_limit()
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f"{csv_path}: нет колонок {', '.join(missing)}")
+        positions = [(name, header.index(name), int if kind == "int64" else str) for name, kind in columns.items()]
+        width = max(position for _, position, _ in positions) + 1
+
+        batch = {name: [] for name in columns}
+        rows = 0
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                raise ValueError(f"{csv_path}, строка {reader.line_num}: {len(row)} полей, "
+                                 f"нужно не меньше {width}")
+            for name, position, convert in positions:
+                batch[name].append(convert(row[position]))
+            rows += 1
+            if rows == batch_size:
+                yield batch
+                batch = {name: [] for name in columns}
+                rows = 0
+        if rows:
+            yield batch
+
+
+def _source_stamp(csv_path: str) -> Dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def convert_csv(csv_path: str, out_path: str, columns: Dict[str, str] = VACANCY_COLUMNS,
+                batch_size: int = BATCH_SIZE) -> int:
+    """
+    Однократное преобразование CSV в колоночный файл: для int64 — массив значений,
+    для строк — склеенные байты UTF-8 и массив смещений (как строковые колонки Arrow).
+    Батчи пишутся во временные файлы по колонкам и затем копируются в итоговый файл,
+    так что память не зависит от размера CSV. Возвращает число строк
+    """
+    stamp = _source_stamp(csv_path)
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+        sections = []
+        for name, kind in columns.items():
+            if kind == "int64":
+                sections.append((name, "values", "<i8"))
+            else:
+                sections.extend([(name, "offsets", "<i8"), (name, "data", "|u1")])
+        files = {(name, part): open(os.path.join(tmp, f"{name}.{part}"), "wb") for name, part, _ in sections}
+        # конец уже записанных байтов строковой колонки: смещения сквозные по всем батчам
+        ends = {name: 0 for name, kind in columns.items() if kind != "int64"}
+        try:
+            for name in ends:
+                files[name, "offsets"].write(np.zeros(1, dtype="<i8").tobytes())
+            for batch in read_csv_batches(csv_path, columns, batch_size):
+                for name, kind in columns.items():
+                    if kind == "int64":
+                        files[name, "values"].write(np.asarray(batch[name], dtype="<i8").tobytes())
+                        continue
+                    encoded = [value.encode("utf-8") for value in batch[name]]
+                    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+                    files[name, "offsets"].write((ends[name] + np.cumsum(lengths)).astype("<i8").tobytes())
+                    files[name, "data"].write(b"".join(encoded))
+                    ends[name] += int(lengths.sum())
+                rows += len(batch[next(iter(columns))])
+        finally:
+            for f in files.values():
+                f.close()
+
+        def header_bytes(layout):
+            header = {"meta": {"source": stamp, "rows": rows, "columns": columns}, "sections": layout}
+            return json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+        sizes = {(name, part): os.path.getsize(os.path.join(tmp, f"{name}.{part}")) for name, part, _ in sections}
+        # смещения зависят от длины заголовка, а заголовок — от смещений: считаем до сходимости
+        layout = {f"{name}.{part}": {"dtype": dtype, "offset": 0, "nbytes": sizes[name, part]}
+                  for name, part, dtype in sections}
+        while True:
+            offset = _aligned(_PREFIX.size + len(header_bytes(layout)))
+            changed = False
+            for name, part, _ in sections:
+                spec = layout[f"{name}.{part}"]
+                if spec["offset"] != offset:
+                    spec["offset"] = offset
+                    changed = True
+                offset = _aligned(offset + spec["nbytes"])
+            if not changed:
+                break
+        header = header_bytes(layout)
+
+        tmp_path = f"{out_path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as out:
+            out.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            out.write(header)
+            for name, part, _ in sections:
+                out.write(b"\0" * (layout[f"{name}.{part}"]["offset"] - out.tell()))
+                with open(os.path.join(tmp, f"{name}.{part}"), "rb") as src:
+                    shutil.copyfileobj(src, out, _COPY_CHUNK)
+        os.replace(tmp_path, out_path)
+    return rows
+
+
+class VacancyColumns:
+    """
+    Колоночный файл вакансий. Открывается без разбора CSV: числовые колонки и смещения
+    строк — np.memmap над файлом, текст читается с диска только для запрошенных строк
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ValueError(f"{path}: файл обрезан")
+            magic, version, header_len = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: не колоночный файл вакансий")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: версия формата {version}, ожидалась {FORMAT_VERSION}")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        self.meta: Dict = header["meta"]
+        self.columns: Dict[str, str] = self.meta["columns"]
+        self.rows: int = self.meta["rows"]
+        self._sections: Dict[str, Dict] = header["sections"]
+        if any(spec["offset"] + spec["nbytes"] > os.path.getsize(path) for spec in self._sections.values()):
+            raise ValueError(f"{path}: колонка выходит за конец файла")
+        self._fd = os.open(path, os.O_RDONLY)
+        self._arrays = {name: self._memmap(name) for name, spec in self._sections.items()
+                        if not name.endswith(".data")}
+
+    def _memmap(self, section: str) -> np.ndarray:
+        spec = self._sections[section]
+        dtype = np.dtype(spec["dtype"])
+        count = spec["nbytes"] // dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=spec["offset"], shape=(count,))
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._arrays = {}
+
+    def matches(self, csv_path: str, columns: Dict[str, str] = VACANCY_COLUMNS) -> bool:
+        """
+        Собран ли файл из этой версии CSV и с этими колонками
+        """
+        return self.meta["source"] == _source_stamp(csv_path) and all(
+            self.columns.get(name) == kind for name, kind in columns.items())
+
+    def values(self, name: str) -> np.ndarray:
+        """
+        Числовая колонка целиком (memmap, без чтения в память)
+        """
+        return self._arrays[f"{name}.values"]
+
+    def texts(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """
+        Строки [start, stop) текстовой колонки: одно чтение с диска на весь диапазон
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        if start >= stop:
+            return []
+        offsets = np.asarray(self._arrays[f"{name}.offsets"][start:stop + 1], dtype=np.int64)
+        base = self._sections[f"{name}.data"]["offset"]
+        data = os.pread(self._fd, int(offsets[-1] - offsets[0]), base + int(offsets[0]))
+        bounds = (offsets - offsets[0]).tolist()
+        return [data[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    def iter_batches(self, columns: Optional[Sequence[str]] = None,
+                     batch_size: int = BATCH_SIZE) -> Iterator[Dict[str, list]]:
+        """
+        Батчи как у read_csv_batches; в памяти только текущий батч
+        """
+        columns = list(columns or self.columns)
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            yield {name: (self.values(name)[start:stop].tolist() if self.columns[name] == "int64"
+                          else self.texts(name, start, stop))
+                   for name in columns}
+
+
+def columns_path_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".vcol"
+
+
+def open_columns(csv_path: str, columns: Dict[str, str] = VACANCY_COLUMNS,
+                 path: Optional[str] = None) -> Optional[VacancyColumns]:
+    """
+    Колоночный файл для CSV: готовый, если он собран из этой же версии CSV, иначе
+    собирается заново. None, если файл не удалось записать (каталог только для чтения)
+    """
+    path = path or columns_path_for(csv_path)
+    if os.path.exists(path):
+        try:
+            cached = VacancyColumns(path)
+            if cached.matches(csv_path, columns):
+                return cached
+            cached.close()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Колоночный файл {path} не загружен: {e}")
+    try:
+        rows = convert_csv(csv_path, path, columns)
+    except OSError as e:
+        print(f"Колоночный файл {path} не записан: {e}")
+        return None
+    print(f"Колоночный файл {path}: {rows} вакансий")
+    return VacancyColumns(path)
+
+
+def iter_vacancy_batches(csv_path: str, columns: Dict[str, str] = VACANCY_COLUMNS,
+                         batch_size: int = BATCH_SIZE, cache: bool = COLUMNS_CACHE) -> Iterator[Dict[str, list]]:
+    """
+    Вакансии батчами только с нужными колонками: из колоночного кэша, а без него — потоком из CSV
+    """
+    cached = open_columns(csv_path, columns) if cache else None
+    if cached is None:
+        yield from read_csv_batches(csv_path, columns, batch_size)
+        return
+    try:
+        yield from cached.iter_batches(list(columns), batch_size)
+    finally:
+        cached.close()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.lexical_index import LexicalIndex
+
+
+def test_ties_at_cutoff_prefer_smaller_slot():
+    # один термин: короткие документы получают один и тот же скор, длинные — меньший
+    documents = {i: ["python", "java"] if i % 3 else ["python", "java", "sql", "go"] for i in range(300)}
+    index = LexicalIndex.from_documents(documents)
+    keys, scores = index.search(["python"], 150)
+
+    assert keys == [i for i in range(300) if i % 3][:150]
+    assert np.all(scores == scores[0])
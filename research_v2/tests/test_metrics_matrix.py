@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluation import evaluate_scores, top_model_orders
+from src.metrics import compute_metrics, compute_metrics_matrix
+
+
+def _reference(hr_ranks, model_ranks):
+    return np.array([compute_metrics(list(hr), list(model)) for hr, model in zip(hr_ranks, model_ranks)]).T
+
+
+@pytest.mark.parametrize("hr_ranks, model_ranks", [
+    # разметка с повторами, как в аннотациях ([1, 5, 2, 1, 4])
+    ([[2, 1, 4, 3, 5], [1, 5, 2, 1, 4], [2, 4, 3, 2, 5]], [[7, 3, 12, 1, 5], [4, 2, 9, 8, 1], [1, 2, 3, 4, 5]]),
+    # константные строки: у HR, у модели и у обоих
+    ([[3, 3, 3, 3, 3], [1, 2, 3, 4, 5], [2, 2, 2, 2, 2]], [[1, 2, 3, 4, 5], [4, 4, 4, 4, 4], [6, 6, 6, 6, 6]]),
+    # совпадающие номера у модели
+    ([[1, 2, 3, 4, 5], [5, 4, 3, 2, 1]], [[1, 1, 2, 2, 3], [3, 1, 3, 1, 2]]),
+])
+def test_matrix_metrics_equal_compute_metrics(hr_ranks, model_ranks):
+    ndcg, spearman = compute_metrics_matrix(hr_ranks, model_ranks)
+    expected_ndcg, expected_spearman = _reference(hr_ranks, model_ranks)
+    np.testing.assert_allclose(ndcg, expected_ndcg, atol=1e-12)
+    np.testing.assert_allclose(spearman, expected_spearman, atol=1e-12)
+
+
+def test_random_rankings_with_ties():
+    rng = np.random.default_rng(0)
+    hr_ranks = rng.integers(1, 6, (300, 5))
+    for model_ranks in (rng.integers(1, 6, (300, 5)), np.array([rng.permutation(30)[:5] + 1 for _ in range(300)])):
+        ndcg, spearman = compute_metrics_matrix(hr_ranks, model_ranks)
+        expected_ndcg, expected_spearman = _reference(hr_ranks, model_ranks)
+        np.testing.assert_allclose(ndcg, expected_ndcg, atol=1e-12)
+        np.testing.assert_allclose(spearman, expected_spearman, atol=1e-12)
+
+
+def test_evaluate_scores_equals_per_vacancy_loop():
+    rng = np.random.default_rng(1)
+    rids = np.arange(1, 41)
+    # округление даёт равные скоры: порядок при равенстве — по строкам, как у устойчивой сортировки
+    scores = np.round(rng.random((40, 6)), 1)
+    annot = [list(rng.integers(1, 6, 5)) for _ in range(6)]
+
+    ndcg, spearman = evaluate_scores(rids, scores, annot)
+    orders = top_model_orders(rids, scores)
+    for col in range(scores.shape[1]):
+        annotated = rids <= 30
+        order = sorted(range(annotated.sum()), key=lambda row: -scores[annotated][row, col])[:5]
+        assert list(orders[col]) == [int(rids[annotated][row]) for row in order]
+        expected = compute_metrics(annot[col], list(orders[col]))
+        assert np.isclose(ndcg[col], expected[0]) and np.isclose(spearman[col], expected[1])
+
+    columns = [4, 1]
+    subset = evaluate_scores(rids, scores, annot, columns=columns)
+    np.testing.assert_allclose(subset[0], ndcg[columns])
+    np.testing.assert_allclose(subset[1], spearman[columns])
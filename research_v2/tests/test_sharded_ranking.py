@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sharded_ranking import merge_top_k, top_k_rows
+
+
+def test_merge_top_k_ties_do_not_depend_on_shard_order():
+    # два шарда с одинаковыми скорами: в топ попадают меньшие номера при любом порядке готовности
+    a = (np.array([[0, 1, 2]]), np.zeros((1, 3), dtype=np.float32))
+    b = (np.array([[100, 101, 102]]), np.zeros((1, 3), dtype=np.float32))
+
+    ab = merge_top_k(a, b, 2)
+    ba = merge_top_k(b, a, 2)
+
+    np.testing.assert_array_equal(ab[0], [[0, 1]])
+    np.testing.assert_array_equal(ba[0], ab[0])
+    np.testing.assert_array_equal(ba[1], ab[1])
+
+
+def test_top_k_rows_ties_with_unsorted_positions():
+    scores = np.array([[0.5, 0.9, 0.5, 0.5]], dtype=np.float32)
+    positions, top = top_k_rows(scores, np.array([7, 3, 5, 1]), 3)
+
+    np.testing.assert_array_equal(positions, [[3, 1, 5]])
+    np.testing.assert_allclose(top, [[0.9, 0.5, 0.5]])
@@ -0,0 +1,280 @@
+# ==========================================
+# File: async_main.py
+# Description: asyncio TG bot: non-blocking downloads, matching in a worker pool with per-user queues
+# ==========================================
+import asyncio
+import contextvars
+import datetime
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+import telebot
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import ReplyKeyboardRemove
+
+logger = telebot.logger
+
+formatter = '[%(asctime)s] %(levelname)8s --- %(message)s (%(filename)s:%(lineno)s)'
+logging.basicConfig(
+    filename=f'iconi_bot-from-{datetime.datetime.now().date()}.log',
+    filemode='w',
+    format=formatter,
+    datefmt='%Y-%m-%d %H:%M:%S',
+    level=logging.WARNING
+)
+
+# модели и каталог загружаются при импорте, поэтому после настройки логов
+from cv_matcher import read_docx_text
+from bot_core import (
+    FIND_VACANCIES, SHOW_MATCH, ADMIN_IDS, ERROR_TEXT, ONLY_DOCX_TEXT, FILE_RECEIVED_TEXT, catalog,
+    reload_catalog, get_active_state, set_active_state, gen_main_menu, cancel_text, welcome_text,
+    help_text, reload_text, vacancies_menu_text, ask_resume_text, vacancy_selected_text,
+    resume_received_text, match_text, ranks_texts,
+)
+from instrumentation import (
+    registry, request, stage, observe_stage, count_error, setup as setup_instrumentation,
+)
+
+TOKEN = os.environ.get("iconi_bot_token")
+# адрес Bot API; для локальных тестов — адрес telegram_stub.py
+API_URL = os.environ.get("iconi_bot_api_url", "https://api.telegram.org").rstrip("/")
+# потоков для разбора резюме и ранжирования
+WORKERS = int(os.environ.get("iconi_bot_workers", min(4, os.cpu_count() or 1)))
+# сколько запросов одного пользователя может ждать в очереди
+USER_QUEUE_SIZE = int(os.environ.get("iconi_bot_user_queue", 2))
+# сколько запросов всего может быть в работе и в очередях, дальше — отказ "занят"
+MAX_PENDING = int(os.environ.get("iconi_bot_max_pending", WORKERS * 16))
+# соединений к серверу файлов
+DOWNLOAD_CONNECTIONS = int(os.environ.get("iconi_bot_download_connections", 32))
+
+BUSY_TEXT = 'Сейчас много запросов. Попробуйте еще раз через минуту.'
+QUEUE_FULL_TEXT = 'Предыдущие запросы еще обрабатываются, подождите ответа.'
+
+asyncio_helper.API_URL = API_URL + "/bot{0}/{1}"
+asyncio_helper.FILE_URL = API_URL + "/file/bot{0}/{1}"
+
+bot = AsyncTeleBot(TOKEN, parse_mode='HTML')
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="matcher")
+
+
+class RequestScheduler:
+    """
+    Очередь запросов на пользователя: запросы одного пользователя выполняются по порядку,
+    разные пользователи — параллельно. Общее число ожидающих запросов ограничено,
+    лишние отклоняются сразу, а не копятся перед пулом
+    """
+
+    def __init__(self, user_queue_size: int = USER_QUEUE_SIZE, max_pending: int = MAX_PENDING):
+        self.user_queue_size = user_queue_size
+        self.max_pending = max_pending
+        self.pending = 0
+        self._queues: Dict[int, asyncio.Queue] = {}
+        # сильные ссылки на задачи, иначе сборщик мусора может их остановить
+        self._tasks = set()
+
+    def submit(self, user_id: int, job: Callable[[], Awaitable[None]]) -> Optional[str]:
+        """
+        Ставит job в очередь пользователя; возвращает текст отказа, если очередь полна
+        """
+        if self.pending >= self.max_pending:
+            return BUSY_TEXT
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = asyncio.Queue(maxsize=self.user_queue_size)
+            task = asyncio.create_task(self._drain(user_id, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return QUEUE_FULL_TEXT
+        self.pending += 1
+        return None
+
+    async def _drain(self, user_id: int, queue: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    await job()
+                except Exception as e:
+                    logger.error(e)
+                finally:
+                    self.pending -= 1
+        finally:
+            # пустую очередь убираем, чтобы не копить их по всем пользователям
+            del self._queues[user_id]
+
+
+scheduler = RequestScheduler()
+
+REJECTED = registry.counter("iconi_bot_requests_rejected_total", "Requests refused by the scheduler, by kind")
+registry.callback("iconi_bot_requests_pending", "Requests queued or running in the scheduler",
+                  "gauge", lambda: {(): scheduler.pending})
+
+_http: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http() -> aiohttp.ClientSession:
+    global _http
+    if _http is None or _http.closed:
+        _http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=DOWNLOAD_CONNECTIONS))
+    return _http
+
+
+async def run_blocking(fn, *args):
+    # контекст копируется, чтобы этапы в потоке пула попадали в лог с request_id запроса
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def enqueue(message, kind: str, job: Callable[[], Awaitable[None]]):
+    queued = time.perf_counter()
+
+    async def timed_job():
+        with request(kind):
+            observe_stage("queue_wait", time.perf_counter() - queued)
+            await job()
+
+    refusal = scheduler.submit(message.from_user.id, timed_job)
+    if refusal is not None:
+        REJECTED.inc(kind=kind)
+        await bot.reply_to(message, refusal)
+
+
+# Handle '/cancel'
+@bot.message_handler(commands=['cancel'])
+async def send_cancel(message):
+    set_active_state(message.from_user.id, mode=FIND_VACANCIES, vacancy_id=None)
+    markup = ReplyKeyboardRemove()
+    await bot.send_message(message.from_user.id, cancel_text(), reply_markup=markup)
+
+# Handle '/reload'
+@bot.message_handler(commands=['reload'])
+async def send_reload(message):
+    if ADMIN_IDS and message.from_user.id not in ADMIN_IDS:
+        await bot.reply_to(message, 'Недостаточно прав.')
+        return
+    stats = await run_blocking(reload_catalog)
+    await bot.reply_to(message, reload_text(stats))
+
+# Handle '/start'
+@bot.message_handler(commands=['start'])
+async def send_welcome(message):
+    await bot.send_message(message.from_user.id, welcome_text(message.from_user.first_name),
+                           reply_markup=gen_main_menu())
+
+@bot.message_handler(func=lambda message: message.text == SHOW_MATCH)
+async def process_ask_question_match(message):
+    set_active_state(message.from_user.id, mode=SHOW_MATCH)
+    await bot.send_message(message.from_user.id, vacancies_menu_text(catalog.snapshot))
+
+@bot.message_handler(func=lambda message: message.text == FIND_VACANCIES)
+async def process_ask_question(message):
+    set_active_state(message.from_user.id, mode=FIND_VACANCIES)
+    await bot.send_message(message.from_user.id, ask_resume_text())
+
+# Handle '/help'
+@bot.message_handler(commands=['help'])
+async def send_help(message):
+    await bot.send_message(message.from_user.id, help_text(message.from_user.first_name),
+                           reply_markup=gen_main_menu())
+
+
+@bot.message_handler(content_types=['document'])
+async def handle_document(message):
+    if message.document.file_name.endswith('.docx'):
+        await enqueue(message, "document", lambda: process_document(message))
+    else:
+        await bot.reply_to(message, ONLY_DOCX_TEXT)
+
+async def process_document(message):
+    try:
+        with stage("get_file"):
+            file_info = await bot.get_file(message.document.file_id)
+        download_url = asyncio_helper.FILE_URL.format(TOKEN, file_info.file_path)
+
+        http = await get_http()
+        with stage("download"):
+            async with http.get(download_url) as response:
+                status = response.status
+                content = await response.read() if status == 200 else None
+        if status != 200:
+            await bot.reply_to(message, ERROR_TEXT)
+            return
+
+        resume_text = await run_blocking(read_docx_text, BytesIO(content))
+        await bot.reply_to(message, FILE_RECEIVED_TEXT)
+
+        state = get_active_state(message.from_user.id)
+        snapshot = catalog.snapshot
+        if state.mode == FIND_VACANCIES:
+            await build_answer(message, resume_text, snapshot)
+        elif state.mode == SHOW_MATCH and state.vacancy_id:
+            await show_match(message, resume_text, snapshot)
+        else:
+            await bot.reply_to(message, ERROR_TEXT)
+    except Exception as e:
+        count_error("document")
+        print(e)
+
+async def answer(message):
+    state = get_active_state(message.from_user.id)
+    snapshot = catalog.snapshot
+    if state.mode == FIND_VACANCIES:
+        await enqueue(message, "text", lambda: build_answer(message, message.text, snapshot))
+    elif state.mode == SHOW_MATCH and str.isdigit(message.text) and int(message.text) in snapshot.vacancies.keys():
+        state = set_active_state(message.from_user.id, vacancy_id=int(message.text))
+        await bot.send_message(message.from_user.id, vacancy_selected_text(state.vacancy_id))
+    elif state.mode == SHOW_MATCH and not str.isdigit(message.text) and state.vacancy_id:
+        await bot.reply_to(message, resume_received_text(state.vacancy_id))
+        await enqueue(message, "text", lambda: show_match(message, message.text, snapshot))
+    else:
+        await bot.reply_to(message, ERROR_TEXT)
+
+async def show_match(message, resume_text, snapshot):
+    vac_id = get_active_state(message.from_user.id).vacancy_id
+    text = await run_blocking(match_text, resume_text, vac_id, snapshot)
+    with stage("send_reply"):
+        await bot.reply_to(message, text)
+
+async def build_answer(message, resume_text, snapshot):
+    for resp in await run_blocking(ranks_texts, resume_text, snapshot):
+        with stage("send_reply"):
+            await bot.reply_to(message, resp)
+
+
+@bot.edited_message_handler(func=lambda message: True)
+async def handle_edited_message(message):
+    await answer(message)
+
+@bot.message_handler(func=lambda message: True)
+async def handle_message(message):
+    await answer(message)
+
+
+async def main():
+    setup_instrumentation()
+    try:
+        await bot.infinity_polling()
+    finally:
+        if _http is not None:
+            await _http.close()
+        if asyncio_helper.session_manager.session is not None:
+            await bot.close_session()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
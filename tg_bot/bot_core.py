@@ -0,0 +1,218 @@
+# ==========================================
+# File: bot_core.py
+# Description: models, vacancy catalog, user state and reply texts shared by bot front ends
+# ==========================================
+import os
+from typing import List
+
+import telebot
+from telebot.types import ReplyKeyboardMarkup, KeyboardButton
+
+from catalog_artifact import artifact_path_for
+from cv_matcher import VacancyResumeMatcher
+from vacancy_catalog import VacancyCatalog
+
+from extract_skills import extract_skills
+from ranking import skill_similarity_precomputed
+from resume_dedup import ResumeDedupIndex
+from session_store import SessionStore
+from instrumentation import registry, stage
+
+logger = telebot.logger
+
+RANK = 3
+
+VACANCIES_CSV = "./tg_bot/5_vacancies.csv"
+# предрасчитанный каталог (compile_catalog.py); если его нет, всё считается при старте
+CATALOG_ARTIFACT = os.environ.get("iconi_bot_catalog_artifact", artifact_path_for(VACANCIES_CSV))
+# как часто проверять CSV на изменения (секунды), 0 — только по команде /reload
+VACANCIES_WATCH_INTERVAL = float(os.environ.get("iconi_bot_vacancies_watch_interval", 60))
+# размерность эмбеддингов после Matryoshka-усечения (768/512/256/128), 0 — полная
+EMBEDDING_DIM = int(os.environ.get("iconi_bot_embedding_dim", 0))
+# тип хранения векторов вакансий: float32, float16 или int8
+EMBEDDING_STORAGE = os.environ.get("iconi_bot_embedding_storage", "float32")
+# сколько секунд отдавать сохранённый ответ на повторно присланное резюме, 0 — не сохранять
+DEDUP_TTL = float(os.environ.get("iconi_bot_dedup_ttl", 3600))
+# доля общих шинглов (оценка Жаккара), с которой резюме считается почти тем же
+DEDUP_THRESHOLD = float(os.environ.get("iconi_bot_dedup_threshold", 0.9))
+DEDUP_ITEMS = int(os.environ.get("iconi_bot_dedup_items", 10000))
+# отбор вакансий перед комбинированным скором: vector, lexical (BM25 по терминам) или hybrid
+PREFILTER = os.environ.get("iconi_bot_prefilter", "vector")
+# длина BM25-шортлиста
+LEXICAL_CANDIDATES = int(os.environ.get("iconi_bot_lexical_candidates", 1000))
+# сессия пользователя забывается после стольких секунд без сообщений
+SESSION_TTL = float(os.environ.get("iconi_bot_session_ttl", 86400))
+# сколько сессий держать в памяти, дальше вытесняются давно не активные
+SESSIONS_MAX = int(os.environ.get("iconi_bot_sessions_max", 100000))
+# файл SQLite для сессий, чтобы они переживали перезапуск; пусто — только в памяти
+SESSION_DB = os.environ.get("iconi_bot_session_db", "")
+# id пользователей, которым разрешён /reload; пусто — всем
+ADMIN_IDS = {int(uid) for uid in os.environ.get("iconi_bot_admins", "").split(",") if uid.strip()}
+
+try:
+    cv_matcher = VacancyResumeMatcher(dim=EMBEDDING_DIM, storage=EMBEDDING_STORAGE,
+                                      prefilter=PREFILTER, n_lexical=LEXICAL_CANDIDATES)
+    catalog = VacancyCatalog(cv_matcher, VACANCIES_CSV, artifact_path=CATALOG_ARTIFACT)
+    catalog.reload()
+    if VACANCIES_WATCH_INTERVAL > 0:
+        catalog.watch(VACANCIES_WATCH_INTERVAL)
+except Exception as e:
+    logger.error(e)
+
+# одинаковые и почти одинаковые резюме (повторная отправка, правка сообщения) получают
+# сохранённые ранжирование и навыки; ранжирование привязано к снимку каталога
+resume_dedup = ResumeDedupIndex(threshold=DEDUP_THRESHOLD, ttl=DEDUP_TTL, max_items=DEDUP_ITEMS)
+registry.callback("iconi_bot_resume_dedup_lookups_total", "Resume fingerprint lookups by result", "counter",
+                  lambda: {(("result", "exact"),): resume_dedup.exact_hits,
+                           (("result", "near"),): resume_dedup.near_hits,
+                           (("result", "miss"),): resume_dedup.misses})
+
+FIND_VACANCIES = "Find vacancies"
+SHOW_MATCH = "Show match"
+
+sessions = SessionStore(FIND_VACANCIES, ttl=SESSION_TTL, max_sessions=SESSIONS_MAX, path=SESSION_DB)
+registry.callback("iconi_bot_sessions", "User sessions held in memory (live SQLite rows in webhook mode)", "gauge",
+                  lambda: {(): len(sessions)})
+registry.callback("iconi_bot_sessions_dropped_total", "Sessions dropped from memory or expired on load, by reason", "counter",
+                  lambda: {(("reason", "evicted"),): sessions.evicted, (("reason", "expired"),): sessions.expired})
+
+ERROR_TEXT = 'Что-то пошло не так. Попробуйте еще раз.'
+ONLY_DOCX_TEXT = 'Только .docx файлы.'
+FILE_RECEIVED_TEXT = "Получил файл, проверяю..."
+
+
+# в воркере webhook_server.py /reload не перечитывает каталог сам, а только просит мастера:
+# мастер перечитывает его один раз и заменяет всех воркеров
+reload_delegate = None
+
+
+def reload_catalog():
+    """
+    Перечитывает каталог и возвращает статистику изменений; в воркере webhook
+    только передаёт запрос мастеру и возвращает None
+    """
+    if reload_delegate is not None:
+        reload_delegate()
+        return None
+    return catalog.reload()
+
+def get_active_state(user_id):
+    return sessions.get(user_id)
+
+def set_active_state(user_id, **fields):
+    return sessions.update(user_id, **fields)
+
+def get_ranks(resume_text, snapshot):
+    resume_embedding = cv_matcher.encode_texts([resume_text])
+
+    # Ранжируем вакансии для этого резюме
+    return cv_matcher.rank_vacancies(resume_text, resume_embedding[0], snapshot.features, top_k=RANK)
+
+def gen_main_menu():
+    markup = ReplyKeyboardMarkup(True, False)
+    markup.add(KeyboardButton(FIND_VACANCIES))
+    markup.add(KeyboardButton(SHOW_MATCH))
+    return markup
+
+def cancel_text():
+    return f"""\
+        Отмена \
+        """
+
+def welcome_text(first_name):
+    return f"""\
+        Привет, <i>{first_name}</i>. Я HRBot. \
+        \n\nЯ помогу тебе с поиском вакансий. \
+        \n\nЖми на кнопку {FIND_VACANCIES} чтобы подобрать топ-{RANK} вакансий по резюме, \
+        \n\nили {SHOW_MATCH} чтобы посмотреть совпадения по конкретной вакансии. \
+        \n\nПомощь /help. \
+        """
+
+def help_text(first_name):
+    return f"""\
+        Привет, <i>{first_name}</i>. Я HRBot. \
+        \n\nЯ помогу тебе с поиском вакансий. \
+        \n\nЖми на кнопку {FIND_VACANCIES} чтобы подобрать топ-{RANK} вакансий по резюме, \
+        \n\nили {SHOW_MATCH} чтобы посмотреть совпадения по конкретной вакансии. \
+        """
+
+def reload_text(stats):
+    if stats is None:
+        return "Перезагрузка каталога запланирована, новые вакансии появятся через несколько секунд"
+    return (f"Каталог обновлён: {len(catalog.snapshot)} вакансий "
+            f"(новых {stats['added']}, изменённых {stats['changed']}, удалённых {stats['removed']})")
+
+def vacancies_menu_text(snapshot):
+    vacs_text = ""
+    for vac_id, vac in snapshot.vacancies.items():
+        vacs_text += f"\n\n{vac_id}. {vac['title']}"
+
+    return f"""\
+        \n\nВыбери вакансию, отправь мне только ее номер {vacs_text}  \
+        """
+
+def ask_resume_text():
+    return f"""\
+        \n\nПришли мне docx файл резюме или краткий текст резюме одним сообщением \
+        """
+
+def vacancy_selected_text(vac_id):
+    return f"""\
+            \n\nВыбрана вакансия {vac_id}. Теперь пришли мне docx файл резюме или краткий текст резюме одним сообщением \
+            """
+
+def resume_received_text(vac_id):
+    return f"Выбраная вакансия {vac_id}. Получил резюме, проверяю..."
+
+def match_text(resume_text, vac_id, snapshot):
+    """
+    Ответ режима Show match: сравнение навыков резюме и выбранной вакансии
+    """
+    vacancy_skills = snapshot.vacancy_skills(vac_id)
+    if vacancy_skills is None:
+        return f'Вакансия {vac_id} больше не доступна. Выберите другую.'
+
+    # навыки вакансии посчитаны один раз на снимок (или взяты из артефакта)
+    vac_skills, vac_skill_embeddings = vacancy_skills
+
+    with stage("extract_skills"):
+        resume_skills = resume_dedup.cached(resume_text, "skills", lambda: extract_skills(resume_text))
+
+    with stage("skill_similarity"):
+        similarity = skill_similarity_precomputed(resume_skills, vac_skill_embeddings)
+
+    return f"""
+        \nПроцент соответствия навыков: {similarity * 100:.2f}%
+        \nИзвлечённые навыки из резюме: {[formatted(s, vac_skills) for s in resume_skills]}
+        \nНавыки вакансии: {[formatted(s, resume_skills) for s in vac_skills]}
+        """
+
+def formatted(skill, skills):
+    return f"<b>{skill}</b>" if skill in skills else skill
+
+def ranks_texts(resume_text, snapshot) -> List[str]:
+    """
+    Ответ режима Find vacancies: заголовок и по сообщению на каждую вакансию из топа.
+    Для уже присланного (или почти такого же) резюме и того же снимка каталога — сохранённый
+    """
+    return resume_dedup.cached(resume_text, "ranks", lambda: build_ranks_texts(resume_text, snapshot),
+                               scope=snapshot)
+
+def build_ranks_texts(resume_text, snapshot) -> List[str]:
+    result = get_ranks(resume_text, snapshot)
+    texts = [f'Топ-{RANK} рекомендуемых вакансий:']
+    with stage("key_terms"):
+        skills = cv_matcher.extract_key_terms(resume_text)
+    for i, (vacancy_id, score) in enumerate(result):
+        vacancy = snapshot.vacancies[vacancy_id]
+        skill_overlap = cv_matcher.calculate_skill_overlap(vacancy['description'], resume_text)
+        confidence = int(score * 100)
+        resp = f"""
+            {i + 1}. Вакансия #{vacancy_id}: {vacancy['title']}
+            ├─ Уверенность подбора: {confidence}%
+            ├─ Перекрытие навыков: {int(skill_overlap * 100)}%
+            ├─ Основные навыки кандидата: {', '.join(skills[:5]) if skills else 'Не определены'}
+            └─ Рекомендация: {'Высокий приоритет' if confidence >= 75 else '✓ Средний приоритет' if confidence >= 50 else 'Низкий приоритет'}
+        """
+        texts.append(f"{resp}")
+    return texts
@@ -0,0 +1,75 @@
+# ==========================================
+# File: compile_catalog.py
+# Description: offline build of the vacancy catalog artifact (embeddings, skills, term sets)
+# ==========================================
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+from catalog_artifact import FORMAT_VERSION, artifact_path_for, file_sha1, write_artifact
+from cv_matcher import VacancyResumeMatcher
+from extract_skills import extract_skills_batch, model as skills_model
+from ranking import encode_phrases
+from vacancy_catalog import VacancyCatalog
+from vacancy_columns import iter_vacancy_batches
+
+
+def compile_catalog(matcher: VacancyResumeMatcher, csv_path: str, out_path: str) -> int:
+    """
+    Считает всё, что бот и app.py иначе считали бы для вакансий при старте и на каждом
+    запросе, и пишет одним файлом. Возвращает число вакансий
+    """
+    embeddings, skill_embeddings, skill_counts, word_counts, records = [], [], [], [], []
+    # батчами из колоночного файла: модели видят по BATCH_SIZE описаний, в памяти копятся только результаты
+    for batch in iter_vacancy_batches(csv_path):
+        texts = batch['job_description']
+        # полноразмерные векторы: усечение и тип хранения выбирает бот при загрузке
+        embeddings.append(matcher.model.encode(texts, normalize_embeddings=True,
+                                               show_progress_bar=False).astype(np.float32))
+        skills = extract_skills_batch(texts)
+        flat_skills = [p for phrases in skills for p in phrases]
+        index, phrase_embeddings = encode_phrases(flat_skills)
+        skill_embeddings.append(phrase_embeddings[[index[p] for p in flat_skills]].astype(np.float32))
+        skill_counts.extend(len(p) for p in skills)
+        word_counts.extend(len(text.split()) for text in texts)
+
+        for vid, title, uid, text, phrases in zip(batch['id'], batch['job_title'], batch['uid'], texts, skills):
+            records.append({
+                'id': vid,
+                'uid': uid,
+                'title': title,
+                'digest': VacancyCatalog.digest({'description': text}),
+                'terms': matcher.extract_key_terms(text),
+                'skills': phrases,
+            })
+    print(f"Загружено вакансий: {len(records)}")
+
+    meta = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'csv_sha1': file_sha1(csv_path),
+        'model': matcher.model.cache_name,
+        'skills_model': skills_model.cache_name,
+        'skill_terms': matcher.skill_matcher.fingerprint,
+    }
+    write_artifact(out_path, meta, records, {
+        'embeddings': np.concatenate(embeddings),
+        'word_counts': np.array(word_counts, dtype=np.int64),
+        'skill_embeddings': np.concatenate(skill_embeddings),
+        'skill_offsets': np.concatenate([[0], np.cumsum(skill_counts)]).astype(np.int64),
+    })
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the vacancy catalog artifact")
+    parser.add_argument("--csv", default="./tg_bot/5_vacancies.csv")
+    parser.add_argument("--out", help="artifact path, default: CSV path with .vcat extension")
+    args = parser.parse_args()
+
+    out_path = args.out or artifact_path_for(args.csv)
+    start = time.perf_counter()
+    count = compile_catalog(VacancyResumeMatcher(), args.csv, out_path)
+    print(f"Артефакт каталога (формат {FORMAT_VERSION}) записан в {out_path}: "
+          f"{count} вакансий за {time.perf_counter() - start:.1f} с")
@@ -3,16 +3,131 @@
 # Description: VacancyResumeMatcher class for cv analysis
 # Author: @Olga492024
 # ==========================================
-import csv
-import re
+import json
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import numpy as np
+from scipy import sparse
 
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import MinMaxScaler
 
+from embedding_service import get_batched_encoder
+from skill_terms import DEFAULT_SKILL_TERMS, SkillTermMatcher
+from vector_index import build_index, save_index, load_index
+from lexical_index import LexicalIndex
+from vector_store import MATRYOSHKA_LAYER_NORM, STORAGE_DTYPES, EmbeddingMatrix, matryoshka_truncate
+from resume_ingest import iter_docx_texts
+from vacancy_columns import iter_vacancy_batches
+from docx_text import extract_docx_text
+from instrumentation import stage
+
+# отбор кандидатов перед комбинированным скором: vector — ближайшие по эмбеддингу (векторный индекс),
+# lexical — BM25 по терминам словаря, hybrid — объединение обоих шортлистов
+PREFILTERS = ("vector", "lexical", "hybrid")
+
+# слагаемые комбинированного скора и их веса по умолчанию; подобранные по аннотациям HR
+# веса (tune_weights.py) лежат в score_weights.json и загружаются при создании матчера
+SCORE_COMPONENTS = ("cosine", "skill_overlap", "length_match")
+DEFAULT_WEIGHTS = {"cosine": 0.60, "skill_overlap": 0.25, "length_match": 0.15}
+DEFAULT_SCORE_WEIGHTS = Path(__file__).with_name("score_weights.json")
+
+
+@stage("docx_parse")
+def read_docx_text(source) -> str:
+    """
+    Извлечение текста из DOCX (путь или файловый объект): абзацы и ячейки таблиц.
+    Функция модуля, чтобы её можно было вызывать в пуле процессов
+    """
+    try:
+        return extract_docx_text(source)
+    except Exception as e:
+        print(f"Ошибка при чтении {source}: {e}")
+        return ""
+
+
+def load_score_weights(path=DEFAULT_SCORE_WEIGHTS, expected: Optional[Dict] = None) -> np.ndarray:
+    """
+    Веса слагаемых скора в порядке SCORE_COMPONENTS из JSON {"weights": {...}};
+    если файла нет, он испорчен или подобран при других настройках (ключи expected:
+    модель, размерность, хранение, словарь) — DEFAULT_WEIGHTS
+    """
+    defaults = np.array([DEFAULT_WEIGHTS[name] for name in SCORE_COMPONENTS])
+    if not path or not Path(path).exists():
+        return defaults
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        values = np.array([float(config["weights"][name]) for name in SCORE_COMPONENTS])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Веса скора {path} не загружены: {e}")
+        return defaults
+    stale = [key for key, value in (expected or {}).items() if config.get(key) != value]
+    if stale:
+        print(f"Веса скора {path} подобраны с другими настройками ({', '.join(stale)}), беру веса по умолчанию")
+        return defaults
+    if not np.all(np.isfinite(values)) or np.any(values < 0) or values.sum() <= 0:
+        print(f"Веса скора {path} не загружены: нужны неотрицательные числа")
+        return defaults
+    print(f"Веса скора из {path}: " + ", ".join(f"{n}={w:.3f}" for n, w in zip(SCORE_COMPONENTS, values)))
+    return values
+
+
+class VacancyFeatures:
+    """
+    Признаки вакансий, рассчитанные один раз при загрузке:
+    нормированная матрица эмбеддингов (EmbeddingMatrix), множества навыков и длины текстов.
+    lexical — BM25-индекс терминов; каталог передаёт свой, обновляемый при перезагрузке,
+    с ключами lexical_keys (uid вакансий в порядке строк), иначе индекс строится по строкам
+    """
+
+    def __init__(self, vacancy_ids: List[int], embeddings,
+                 term_sets: List[set], word_counts: np.ndarray,
+                 lexical: Optional[LexicalIndex] = None, lexical_keys: Optional[List] = None):
+        self.vacancy_ids = np.asarray(vacancy_ids, dtype=np.int64)
+
+        if not isinstance(embeddings, EmbeddingMatrix):
+            embeddings = EmbeddingMatrix.from_vectors(embeddings)
+        self.embeddings = embeddings
+
+        self.term_sets = term_sets
+        self.word_counts = np.asarray(word_counts, dtype=np.float64)
+
+        # разреженная матрица вакансия x термин для векторного подсчёта пересечений
+        self.term_index = {}
+        rows, cols = [], []
+        for row, terms in enumerate(term_sets):
+            for term in terms:
+                rows.append(row)
+                cols.append(self.term_index.setdefault(term, len(self.term_index)))
+        self.term_matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(term_sets), max(len(self.term_index), 1))
+        )
+        self.term_counts = np.array([len(terms) for terms in term_sets], dtype=np.float64)
+
+        if lexical is None:
+            lexical, lexical_keys = LexicalIndex.from_documents(dict(enumerate(term_sets))), None
+        self.lexical = lexical
+        self.lexical_positions = None if lexical_keys is None else {key: row for row, key in enumerate(lexical_keys)}
+
+        # векторный индекс для отбора кандидатов (build_vector_index / load_vector_index)
+        self.index = None
+
+    def __len__(self):
+        return len(self.vacancy_ids)
+
+    def lexical_candidates(self, terms: List[str], n: int) -> np.ndarray:
+        """
+        Строки до n вакансий с наибольшим BM25 по терминам; вакансии, которых нет
+        в этом снимке (индекс каталога уже обновился), пропускаются
+        """
+        keys, _ = self.lexical.search(terms, n)
+        if self.lexical_positions is None:
+            return np.asarray(keys, dtype=np.int64)
+        rows = (self.lexical_positions.get(key) for key in keys)
+        return np.fromiter((row for row in rows if row is not None), dtype=np.int64)
+
 
 class VacancyResumeMatcher:
     """
@@ -20,61 +135,90 @@ class VacancyResumeMatcher:
     Использует векторный поиск через nomic-embed-text и комбинированный скоринг
     """
 
-    def __init__(self, model_name: str = "nomic-ai/nomic-embed-text-v1.5"):
+    def __init__(self, model_name: str = "nomic-ai/nomic-embed-text-v1.5",
+                 skill_terms_path: str = DEFAULT_SKILL_TERMS, backend: Optional[str] = None,
+                 dim: Optional[int] = None, storage: str = "float32",
+                 prefilter: str = "vector", n_lexical: int = 1000,
+                 score_weights_path=DEFAULT_SCORE_WEIGHTS):
         """
-        Инициализация модели эмбеддингов
+        Инициализация модели эмбеддингов.
+        Веса загружаются лениво, эмбеддинги берутся из общего кэша.
+        backend — torch, onnx или onnx-int8 (ONNX Runtime на CPU), по умолчанию EMBEDDING_BACKEND.
+        dim — размерность после Matryoshka-усечения (None — полная),
+        storage — тип хранения векторов вакансий: float32, float16 или int8,
+        prefilter — отбор кандидатов (PREFILTERS), n_lexical — длина BM25-шортлиста,
+        score_weights_path — веса комбинированного скора (load_score_weights)
         """
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Неизвестный тип хранения {storage!r}, допустимы: {', '.join(STORAGE_DTYPES)}")
+        if prefilter not in PREFILTERS:
+            raise ValueError(f"Неизвестный отбор кандидатов {prefilter!r}, допустимы: {', '.join(PREFILTERS)}")
         print(f"Загрузка модели {model_name}...")
-        self.model = SentenceTransformer(model_name, trust_remote_code=True)
+        self.model = get_batched_encoder(model_name, backend=backend, trust_remote_code=True)
+        self.dim = dim or None
+        self.storage = storage
         self.scaler = MinMaxScaler()
+        self.skill_matcher = SkillTermMatcher.from_file(skill_terms_path)
+        # сколько кандидатов индекса пересчитывается комбинированным скором
+        self.n_candidates = 200
+        self.prefilter = prefilter
+        self.n_lexical = n_lexical
+        # веса cosine, skill_overlap, length_match
+        self.weights = load_score_weights(score_weights_path, self.score_settings())
+
+    def score_settings(self) -> Dict:
+        """
+        Настройки, от которых зависят слагаемые скора: веса, подобранные при других, не подходят
+        """
+        return {
+            'model': self.model.cache_name,
+            'dim': self.dim or 0,
+            'storage': self.storage,
+            'skill_terms': self.skill_matcher.fingerprint,
+        }
 
     def extract_text_from_docx(self, filepath: str) -> str:
         """
         Извлечение текста из DOCX файла
         """
-        try:
-            from docx import Document
-            doc = Document(filepath)
-            text = "\n".join([para.text for para in doc.paragraphs])
-            return text
-        except Exception as e:
-            print(f"Ошибка при чтении {filepath}: {e}")
-            return ""
+        return read_docx_text(filepath)
 
-    def load_resumes(self, cv_folder: str) -> Dict[int, str]:
+    def load_resumes(self, cv_folder: str, workers: Optional[int] = None) -> Dict[int, str]:
         """
-        Загрузка всех резюме из папки CV
+        Загрузка всех резюме из папки CV: разбор в пуле из workers процессов,
+        неизменённые файлы берутся из кэша извлечённого текста
         """
         resumes = {}
-        cv_path = Path(cv_folder)
-
-        for docx_file in sorted(cv_path.glob("*.docx")):
+        cv_ids = {}
+        for docx_file in sorted(Path(cv_folder).glob("*.docx")):
             try:
-                cv_id = int(docx_file.stem)
-                text = self.extract_text_from_docx(str(docx_file))
-                if text.strip():
-                    resumes[cv_id] = text
-                    print(f"✓ Загружено резюме {cv_id}")
+                cv_ids[str(docx_file.resolve())] = int(docx_file.stem)
             except ValueError:
                 continue
 
+        for path, text in iter_docx_texts(list(cv_ids), read_docx_text, workers=workers):
+            if text.strip():
+                cv_id = cv_ids[path]
+                resumes[cv_id] = text
+                print(f"✓ Загружено резюме {cv_id}")
+
         print(f"\nВсего загружено резюме: {len(resumes)}")
         return resumes
 
     def load_vacancies(self, csv_path: str) -> Dict[int, Dict]:
         """
-        Загрузка вакансий из CSV файла
+        Загрузка вакансий из CSV файла: только нужные колонки, батчами,
+        со второго раза — из колоночного файла без разбора CSV
         """
         vacancies = {}
 
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                vacancy_id = int(row['id'])
+        for batch in iter_vacancy_batches(csv_path):
+            for vacancy_id, title, description, uid in zip(batch['id'], batch['job_title'],
+                                                           batch['job_description'], batch['uid']):
                 vacancies[vacancy_id] = {
-                    'title': row['job_title'],
-                    'description': row['job_description'],
-                    'uid': row['uid']
+                    'title': title,
+                    'description': description,
+                    'uid': uid
                 }
 
         print(f"Загружено вакансий: {len(vacancies)}")
@@ -82,33 +226,11 @@ class VacancyResumeMatcher:
 
     def extract_key_terms(self, text: str) -> List[str]:
         """
-        Извлечение ключевых терминов из текста
-        """
-        skill_patterns = [
-            r'\b(python|java|c\+\+|c#|javascript|typescript|php|ruby|go|rust|kotlin)\b',
-            r'\b(sql|mysql|postgresql|oracle|mongodb|elasticsearch|redis)\b',
-            r'\b(react|angular|vue|django|flask|spring|asp\.net|express)\b',
-            r'\b(aws|azure|gcp|kubernetes|docker|jenkins|gitlab)\b',
-            r'\b(git|svn|tfs|mercurial)\b',
-            r'\b(agile|scrum|kanban|devops|ci/cd)\b',
-            r'\b(rest|api|graphql|soap|microservices)\b',
-            r'\b(linux|unix|windows|macos)\b',
-            r'\b(html|css|xml|json|yaml)\b',
-            r'\b(testing|unit test|integration test|qa|qc)\b',
-        ]
-
-        terms = []
-        text_lower = text.lower()
-
-        for pattern in skill_patterns:
-            matches = re.finditer(pattern, text_lower)
-            for match in matches:
-                term = match.group(1)
-                if term not in terms:
-                    terms.append(term)
-
-        return terms
+        Извлечение ключевых терминов из текста (словарь skill_terms.txt, один проход)
+        """
+        return self.skill_matcher.terms(text)
 
+    @stage("skill_overlap")
     def calculate_skill_overlap(self, vacancy_text: str, resume_text: str) -> float:
         """
         Расчёт перекрытия навыков между вакансией и резюме (0-1)
@@ -138,12 +260,25 @@ class VacancyResumeMatcher:
         else:
             return 1.0
 
+    @stage("encode_texts")
     def encode_texts(self, texts) -> np.ndarray:
         """
         Кодирование текстов в векторы с помощью модели эмбеддингов
         """
         embeddings = self.model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-        return embeddings
+        return self.truncate(embeddings)
+
+    def truncate(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Matryoshka-усечение полноразмерных эмбеддингов (из модели или артефакта) до self.dim
+        """
+        return matryoshka_truncate(embeddings, self.dim, self.model.model_name in MATRYOSHKA_LAYER_NORM)
+
+    def compact(self, embeddings: np.ndarray) -> EmbeddingMatrix:
+        """
+        Усечённые эмбеддинги вакансий в одной матрице с типом хранения self.storage
+        """
+        return EmbeddingMatrix.from_vectors(embeddings, self.storage)
 
     def rank_vacancies_for_resume(self, resume_text: str,
                                    vacancies: Dict[int, Dict],
@@ -153,6 +288,7 @@ class VacancyResumeMatcher:
         Ранжирование вакансий для конкретного резюме
         """
         scores = []
+        w_cosine, w_overlap, w_length = self.weights
 
         for vacancy_id, vacancy in vacancies.items():
             vacancy_text = vacancy['description']
@@ -172,9 +308,9 @@ class VacancyResumeMatcher:
 
             # Комбинированный скор
             combined_score = (
-                0.60 * cosine_sim +
-                0.25 * skill_overlap +
-                0.15 * length_match
+                w_cosine * cosine_sim +
+                w_overlap * skill_overlap +
+                w_length * length_match
             )
 
             scores.append((vacancy_id, combined_score))
@@ -184,6 +320,157 @@ class VacancyResumeMatcher:
 
         return scores
 
+    def precompute_vacancy_features(self, vacancies: Dict[int, Dict], vacancy_embeddings) -> VacancyFeatures:
+        """
+        Однократный расчёт признаков вакансий для rank_vacancies.
+        vacancy_embeddings — словарь id -> вектор или матрица в порядке vacancies (из encode_texts)
+        """
+        vacancy_ids = list(vacancies.keys())
+        texts = [vacancies[vid]['description'] for vid in vacancy_ids]
+        if isinstance(vacancy_embeddings, dict):
+            vacancy_embeddings = np.stack([vacancy_embeddings[vid] for vid in vacancy_ids])
+        embeddings = self.compact(vacancy_embeddings)
+        term_sets = [set(self.extract_key_terms(text)) for text in texts]
+        word_counts = [len(text.split()) for text in texts]
+        return VacancyFeatures(vacancy_ids, embeddings, term_sets, word_counts)
+
+    def build_vector_index(self, features: VacancyFeatures, kind: str = "auto", **params):
+        """
+        Построение индекса для отбора кандидатов: 'flat', 'ivf', 'hnsw' или 'auto'
+        """
+        features.index = build_index(features.embeddings, kind=kind, **params)
+        print(f"Индекс вакансий ({features.index.kind}) построен: {len(features)} векторов")
+        return features.index
+
+    def save_vector_index(self, features: VacancyFeatures, path: str):
+        save_index(features.index, path, features.vacancy_ids)
+
+    def load_vector_index(self, features: VacancyFeatures, path: str):
+        features.index = load_index(path, features.vacancy_ids)
+        return features.index
+
+    def score_vacancies(self, resume_text: str, resume_embedding: np.ndarray,
+                        features: VacancyFeatures,
+                        positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Комбинированный скор резюме для всех вакансий (как в rank_vacancies_for_resume)
+        или только для строк positions
+        """
+        return self.weights @ self.score_components(resume_text, resume_embedding, features, positions)
+
+    def score_components(self, resume_text: str, resume_embedding: np.ndarray,
+                         features: VacancyFeatures,
+                         positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Слагаемые комбинированного скора без весов: матрица 3 x вакансии
+        в порядке SCORE_COMPONENTS
+        """
+        if positions is None:
+            term_matrix = features.term_matrix
+            term_counts, word_counts = features.term_counts, features.word_counts
+        else:
+            term_matrix = features.term_matrix[positions]
+            term_counts, word_counts = features.term_counts[positions], features.word_counts[positions]
+
+        # 1. Косинусное сходство: одно произведение матрицы на вектор (по блокам для float16/int8)
+        resume_embedding = np.asarray(resume_embedding, dtype=np.float32)
+        norm = np.linalg.norm(resume_embedding)
+        if norm > 0:
+            resume_embedding = resume_embedding / norm
+        cosine_sim = features.embeddings.dot(resume_embedding, positions).astype(np.float64)
+
+        # 2. Перекрытие навыков (Жаккар): |V ∩ R| / (|V| + |R| - |V ∩ R|)
+        resume_terms = set(self.extract_key_terms(resume_text))
+        resume_vector = np.zeros(term_matrix.shape[1], dtype=np.float64)
+        for term in resume_terms:
+            col = features.term_index.get(term)
+            if col is not None:
+                resume_vector[col] = 1.0
+        intersection = term_matrix @ resume_vector
+        union = term_counts + len(resume_terms) - intersection
+        skill_overlap = np.divide(intersection, union, out=np.full(len(term_counts), 0.5),
+                                  where=term_counts > 0)
+
+        # 3. Соответствие по длине
+        resume_length = len(resume_text.split())
+        length_match = np.where(
+            resume_length < word_counts * 0.3, 0.5,
+            np.where(resume_length > word_counts * 2, 0.7, 1.0)
+        )
+
+        return np.stack([cosine_sim, skill_overlap, length_match])
+
+    @stage("rank_vacancies")
+    def rank_vacancies(self, resume_text: str, resume_embedding: np.ndarray,
+                       features: VacancyFeatures, top_k: Optional[int] = None,
+                       n_candidates: Optional[int] = None,
+                       prefilter: Optional[str] = None) -> List[Tuple[int, float]]:
+        """
+        Векторная версия rank_vacancies_for_resume по предрассчитанным признакам.
+        Комбинированный скор считается только для шортлиста candidate_positions,
+        если каталог больше него. При заданном top_k полная сортировка заменяется на argpartition
+        """
+        n_candidates = max(n_candidates or self.n_candidates, top_k or 0)
+        positions = self.candidate_positions(resume_text, resume_embedding, features, n_candidates,
+                                             top_k or 0, prefilter or self.prefilter)
+        if positions is not None:
+            scores = self.score_vacancies(resume_text, resume_embedding, features, positions)
+        else:
+            positions = np.arange(len(features))
+            scores = self.score_vacancies(resume_text, resume_embedding, features)
+        return self._top_k(scores, positions, features, top_k)
+
+    def candidate_positions(self, resume_text: str, resume_embedding: np.ndarray,
+                            features: VacancyFeatures, n_candidates: int, top_k: int = 0,
+                            prefilter: str = "vector") -> Optional[np.ndarray]:
+        """
+        Строки-кандидаты для комбинированного скора; None — считать весь каталог.
+        vector: n_candidates ближайших по векторному индексу;
+        lexical: n_lexical лучших по BM25 терминов резюме, а если совпадений меньше top_k
+        (в резюме нет терминов словаря) — векторные кандидаты;
+        hybrid: объединение обоих
+        """
+        if prefilter not in PREFILTERS:
+            raise ValueError(f"Неизвестный отбор кандидатов {prefilter!r}, допустимы: {', '.join(PREFILTERS)}")
+        lexical = None
+        if prefilter != "vector" and len(features) > self.n_lexical:
+            with stage("lexical_prefilter"):
+                lexical = features.lexical_candidates(self.extract_key_terms(resume_text), self.n_lexical)
+            if prefilter == "lexical" and len(lexical) >= max(top_k, 1):
+                return lexical
+
+        vector = None
+        if features.index is not None and len(features) > n_candidates:
+            _, vector = features.index.search(resume_embedding, n_candidates)
+        if lexical is None:
+            return vector
+        if vector is None and len(features) <= n_candidates:
+            # каталог не больше векторного шортлиста: отбор ничего не сэкономит
+            return None
+        if vector is None:
+            # векторного индекса нет: остаётся только лексический шортлист
+            return lexical if len(lexical) >= max(top_k, 1) else None
+        return np.union1d(lexical, vector)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, positions: np.ndarray, features: VacancyFeatures,
+               top_k: Optional[int]) -> List[Tuple[int, float]]:
+        if top_k is not None and top_k < len(scores):
+            if top_k > 0:
+                # из равных top_k-му скору берутся вакансии, загруженные раньше
+                kth = -np.partition(-scores, top_k - 1)[top_k - 1]
+                better = np.flatnonzero(scores > kth)
+                tied = np.flatnonzero(scores == kth)
+                tied = tied[np.argsort(positions[tied], kind='stable')]
+                selected = np.concatenate([better, tied[:top_k - len(better)]])
+            else:
+                selected = np.array([], dtype=np.int64)
+        else:
+            selected = np.arange(len(scores))
+        # при равных скорах сохраняется порядок загрузки вакансий, как у стабильной сортировки
+        order = selected[np.lexsort((positions[selected], -scores[selected]))]
+        return [(int(features.vacancy_ids[positions[i]]), float(scores[i])) for i in order]
+
     def calculate_ndcg(self, predicted_ranking: List[int],
                   ground_truth_ranking: List[int], k: int = 5) -> float:
         """
@@ -0,0 +1,149 @@
+# ==========================================
+# File: docx_text.py
+# Description: streaming DOCX text extraction without python-docx
+# ==========================================
+import zipfile
+from typing import Iterator, Tuple
+from xml.etree import ElementTree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_BODY = W + "body"
+_P = W + "p"
+_R = W + "r"
+_HYPERLINK = W + "hyperlink"
+_TBL = W + "tbl"
+_TR = W + "tr"
+_TC = W + "tc"
+_TCPR = W + "tcPr"
+_TRPR = W + "trPr"
+_VAL = W + "val"
+
+# содержимое w:r, которое python-docx переводит в текст
+_RUN_TEXT = {
+    W + "tab": "\t",
+    W + "ptab": "\t",
+    W + "cr": "\n",
+    W + "noBreakHyphen": "-",
+}
+_BR = W + "br"
+
+
+def _run_text(run) -> str:
+    parts = []
+    for child in run:
+        if child.tag == W + "t":
+            parts.append(child.text or "")
+        elif child.tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[child.tag])
+        elif child.tag == _BR:
+            # разрывы страницы и колонки текста не дают
+            if child.get(W + "type", "textWrapping") == "textWrapping":
+                parts.append("\n")
+    return "".join(parts)
+
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            parts.append(_run_text(child))
+        elif child.tag == _HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == _R)
+    return "".join(parts)
+
+
+def _cell_props(tc) -> Tuple[int, bool]:
+    span, continued = 1, False
+    tc_pr = tc.find(_TCPR)
+    if tc_pr is not None:
+        grid_span = tc_pr.find(W + "gridSpan")
+        if grid_span is not None:
+            span = int(grid_span.get(_VAL, 1))
+        v_merge = tc_pr.find(W + "vMerge")
+        if v_merge is not None:
+            continued = v_merge.get(_VAL, "continue") == "continue"
+    return span, continued
+
+
+def _grid_before(tr) -> int:
+    tr_pr = tr.find(_TRPR)
+    if tr_pr is not None:
+        grid_before = tr_pr.find(W + "gridBefore")
+        if grid_before is not None:
+            return int(grid_before.get(_VAL, 0))
+    return 0
+
+
+def _table_cells(tbl) -> Iterator[str]:
+    """
+    Тексты ячеек по строкам, как row.cells в python-docx: ячейка с gridSpan
+    повторяется по числу колонок, продолжение вертикального объединения
+    берёт текст ячейки сверху
+    """
+    above = {}
+    for tr in tbl:
+        if tr.tag != _TR:
+            continue
+        row = {}
+        offset = _grid_before(tr)
+        for tc in tr:
+            if tc.tag != _TC:
+                continue
+            span, continued = _cell_props(tc)
+            if continued and offset in above:
+                text, span = above[offset]
+            else:
+                text = "\n".join(_paragraph_text(p) for p in tc if p.tag == _P)
+            row[offset] = (text, span)
+            for _ in range(span):
+                yield text
+            offset += span
+        above = row
+
+
+def iter_docx_blocks(source) -> Iterator[Tuple[str, str]]:
+    """
+    Потоковый разбор word/document.xml: ('paragraph', текст) для абзацев верхнего уровня
+    и ('cell', текст) для ячеек таблиц верхнего уровня, в порядке документа.
+    DOM всего документа не строится, картинки из архива не читаются.
+    source — путь к файлу или файловый объект
+    """
+    with zipfile.ZipFile(source) as archive:
+        with archive.open("word/document.xml") as xml:
+            depth = 0
+            body, body_depth = None, None
+            for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if elem.tag == _BODY and body is None:
+                        body, body_depth = elem, depth
+                    continue
+
+                depth -= 1
+                if body is None or depth != body_depth:
+                    continue
+                # закрыт дочерний элемент w:body
+                if elem.tag == _P:
+                    yield "paragraph", _paragraph_text(elem)
+                elif elem.tag == _TBL:
+                    for text in _table_cells(elem):
+                        yield "cell", text
+                body.clear()
+
+
+def extract_docx_text(source) -> str:
+    """
+    Текст резюме в том же виде, что и read_docx на python-docx:
+    непустые абзацы, затем непустые ячейки таблиц
+    """
+    paragraphs, cells = [], []
+    for kind, text in iter_docx_blocks(source):
+        if kind == "paragraph":
+            if text.strip():
+                paragraphs.append(text)
+        else:
+            text = text.strip()
+            if text:
+                cells.append(text)
+    return "\n".join(paragraphs + cells).strip()
@@ -0,0 +1,214 @@
+# ==========================================
+# File: embedding_cache.py
+# Description: persistent content-addressed cache for text embeddings
+# ==========================================
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from onnx_backend import check_backend, backend_model_name, load_model
+
+DEFAULT_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+DEFAULT_MEMORY_ITEMS = int(os.environ.get("EMBEDDING_CACHE_MEMORY_ITEMS", "50000"))
+
+# SQLite ограничивает число параметров в одном запросе
+_SQL_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов: LRU в памяти процесса + SQLite на диске.
+    Ключ — хэш от (имя модели, флаг нормализации, текст)
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH,
+                 max_memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.path = path or None
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, normalize: bool, text: str) -> str:
+        payload = f"{model_name}\x00{int(bool(normalize))}\x00{text}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        # после fork соединение родителя использовать нельзя
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Возвращает найденные в кэше векторы (ключ -> вектор)
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            conn = self._connection()
+            if conn is not None and missing:
+                for start in range(0, len(missing), _SQL_CHUNK):
+                    chunk = missing[start:start + _SQL_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    )
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """
+        Сохраняет векторы в память и на диск
+        """
+        with self._lock:
+            rows = []
+            for key, vector in items.items():
+                vector = np.ascontiguousarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, int(vector.shape[0]), vector.tobytes()))
+
+            conn = self._connection()
+            if conn is not None and rows:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows
+                    )
+
+
+class CachedEncoder:
+    """
+    Обёртка над SentenceTransformer с тем же методом encode.
+    Модель загружается только тогда, когда в кэше не нашлось какого-то текста.
+    backend — torch, onnx или onnx-int8 (по умолчанию EMBEDDING_BACKEND)
+    """
+
+    def __init__(self, model_name: str, cache: Optional[EmbeddingCache] = None,
+                 backend: Optional[str] = None, **model_kwargs):
+        self.model_name = model_name
+        self.backend = check_backend(backend)
+        # векторы разных бэкендов хранятся в кэше под разными ключами
+        self.cache_name = backend_model_name(model_name, self.backend)
+        self.cache = cache if cache is not None else get_cache()
+        self.model_kwargs = model_kwargs
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_model(self.model_name, self.backend, **self.model_kwargs)
+        return self._model
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, normalize_embeddings: bool = False,
+               convert_to_tensor: bool = False, show_progress_bar: bool = False,
+               batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        keys = [EmbeddingCache.make_key(self.cache_name, normalize_embeddings, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # каждый отсутствующий текст кодируется один раз, даже если повторяется во входе
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.model.encode(
+                list(missing.values()),
+                normalize_embeddings=normalize_embeddings,
+                show_progress_bar=show_progress_bar,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                **kwargs
+            )
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        if texts:
+            embeddings = np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+        else:
+            embeddings = np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        if single:
+            embeddings = embeddings[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(np.array(embeddings))
+        return embeddings
+
+
+_default_cache = None
+_encoders = {}
+_registry_lock = threading.RLock()
+
+
+def get_cache() -> EmbeddingCache:
+    """
+    Общий для процесса кэш эмбеддингов
+    """
+    global _default_cache
+    with _registry_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def get_encoder(model_name: str, backend: Optional[str] = None, **model_kwargs) -> CachedEncoder:
+    """
+    Один кэширующий энкодер на модель и бэкенд: все модули процесса используют одну копию весов
+    """
+    backend = check_backend(backend)
+    key = backend_model_name(model_name, backend)
+    with _registry_lock:
+        if key not in _encoders:
+            _encoders[key] = CachedEncoder(model_name, backend=backend, **model_kwargs)
+        return _encoders[key]
@@ -0,0 +1,182 @@
+# ==========================================
+# File: embedding_service.py
+# Description: micro-batching of embedding requests from concurrent users
+# ==========================================
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_cache import CachedEncoder, EmbeddingCache, get_encoder
+
+# 0 — кодировать сразу в потоке вызывающего, без сборки пакетов
+BATCHING_ENABLED = os.environ.get("EMBEDDING_BATCHING", "1") != "0"
+MAX_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+
+class _Request:
+    __slots__ = ("texts", "group", "kwargs", "future")
+
+    def __init__(self, texts: List[str], group: Tuple, kwargs: Dict):
+        self.texts = texts
+        self.group = group
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Сервис эмбеддингов поверх CachedEncoder с тем же методом encode.
+
+    Тексты, которых нет в кэше, ставятся в общую очередь; фоновый поток собирает
+    из очереди пакет, пока в нём не наберётся max_batch_size текстов или не пройдёт
+    max_wait_ms с первого запроса, кодирует его одним вызовом модели и раздаёт
+    каждому вызывающему его векторы. Внутри пакета тексты отсортированы по длине,
+    чтобы в батчах модели было меньше паддинга.
+    Вызывать из рабочих потоков, не из потока event loop: encode блокирует до результата
+    """
+
+    def __init__(self, encoder: CachedEncoder, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        self.encoder = encoder
+        self.model_name = encoder.model_name
+        self.backend = encoder.backend
+        self.cache_name = encoder.cache_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.batched_texts = 0
+        # сколько вызовов encode сейчас ждут результата
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self.encoder.model
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def _ensure_worker(self) -> queue.Queue:
+        # после fork поток родителя в дочернем процессе не существует
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    self._worker = threading.Thread(target=self._loop, args=(self._queue,),
+                                                    name=f"embedding-batcher-{self.cache_name}",
+                                                    daemon=True)
+                    self._worker.start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def encode(self, sentences, normalize_embeddings: bool = False,
+               convert_to_tensor: bool = False, show_progress_bar: bool = False,
+               batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        keys = [EmbeddingCache.make_key(self.cache_name, normalize_embeddings, t) for t in texts]
+        found = self.encoder.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            request = _Request(list(missing.values()),
+                               (bool(normalize_embeddings), tuple(sorted(kwargs.items()))),
+                               dict(kwargs, normalize_embeddings=normalize_embeddings))
+            with self._waiting_lock:
+                self._waiting += 1
+            try:
+                self._ensure_worker().put(request)
+                found.update(zip(missing.keys(), request.future.result()))
+            finally:
+                with self._waiting_lock:
+                    self._waiting -= 1
+
+        if texts:
+            embeddings = np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+        else:
+            embeddings = np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        if single:
+            embeddings = embeddings[0]
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(np.array(embeddings))
+        return embeddings
+
+    def _collect(self, requests: queue.Queue) -> List[_Request]:
+        """
+        Первый запрос ждём сколько угодно, остальные — до заполнения пакета или до дедлайна.
+        Если все ожидающие вызовы уже в пакете, ждать некого и пакет уходит сразу,
+        так что одиночный запрос не платит за окно сборки
+        """
+        batch = [requests.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size and self._waiting > len(batch):
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _loop(self, requests: queue.Queue):
+        while True:
+            batch = self._collect(requests)
+            groups: Dict[Tuple, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.group, []).append(request)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, group: List[_Request]):
+        try:
+            unique = list(dict.fromkeys(t for request in group for t in request.texts))
+            unique.sort(key=len, reverse=True)
+            vectors = self.encoder.encode(unique, batch_size=self.max_batch_size, **group[0].kwargs)
+            by_text = dict(zip(unique, vectors))
+            self.batches += 1
+            self.batched_texts += len(unique)
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        for request in group:
+            request.future.set_result([by_text[t] for t in request.texts])
+
+
+_services = {}
+_registry_lock = threading.Lock()
+
+
+def get_batched_encoder(model_name: str, backend: Optional[str] = None, **model_kwargs):
+    """
+    Один сервис на модель поверх общего кэширующего энкодера;
+    при EMBEDDING_BATCHING=0 возвращается сам энкодер
+    """
+    encoder = get_encoder(model_name, backend=backend, **model_kwargs)
+    if not BATCHING_ENABLED:
+        return encoder
+    with _registry_lock:
+        if encoder.cache_name not in _services:
+            _services[encoder.cache_name] = MicroBatcher(encoder)
+        return _services[encoder.cache_name]
@@ -0,0 +1,415 @@
+# ==========================================
+# File: instrumentation.py
+# Description: stage timings, counters and gauges with a Prometheus endpoint, JSON log and sampling profiler
+# ==========================================
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import embedding_cache
+import embedding_service
+
+# порт эндпоинта /metrics; 0 — не запускать
+METRICS_PORT = int(os.environ.get("iconi_bot_metrics_port", 0))
+METRICS_HOST = os.environ.get("iconi_bot_metrics_host", "127.0.0.1")
+# файл для JSON-лога этапов и запросов, '-' — stderr; пусто — выключен
+METRICS_LOG = os.environ.get("iconi_bot_metrics_log", "")
+# сэмплирующий профайлер: 1 — включить
+PROFILE = os.environ.get("iconi_bot_profile", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("iconi_bot_profile_interval_ms", 10))
+PROFILE_PATH = os.environ.get("iconi_bot_profile_path", "iconi_bot-profile.folded")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # счётчики по корзинам (не накопительные), сумма, число наблюдений
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in series:
+            for bound, cumulative in zip(self.buckets, itertools.accumulate(counts)):
+                yield f"{self.name}_bucket{_format_labels(labels, (('le', repr(bound)),))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class _Callback(_Metric):
+    """
+    Значение считается в момент запроса /metrics (например, счётчики кэша эмбеддингов)
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, fn: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.fn = fn
+
+    def expose(self) -> Iterable[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Метрика {self.name} не посчитана: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def callback(self, name: str, help_text: str, kind: str, fn: Callable[[], Dict[Labels, float]]):
+        with self._lock:
+            self._metrics[name] = _Callback(name, help_text, kind, fn)
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.expose()) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter("iconi_bot_requests_total", "User requests by kind")
+REQUEST_ERRORS = registry.counter("iconi_bot_request_errors_total", "User requests that raised, by kind")
+REQUEST_SECONDS = registry.histogram("iconi_bot_request_seconds", "Whole request latency by kind")
+REQUESTS_IN_FLIGHT = registry.gauge("iconi_bot_requests_in_flight", "Requests being processed, by kind")
+STAGE_SECONDS = registry.histogram("iconi_bot_stage_seconds", "Latency of a pipeline stage")
+STAGE_ERRORS = registry.counter("iconi_bot_stage_errors_total", "Pipeline stages that raised")
+STAGES_IN_FLIGHT = registry.gauge("iconi_bot_stages_in_flight", "Pipeline stages running now")
+
+
+
+def _cache_counts() -> Dict[Labels, float]:
+    cache = embedding_cache.get_cache()
+    return {(("result", "hit"),): cache.hits, (("result", "miss"),): cache.misses}
+
+
+def _batcher_counts(attr: str) -> Callable[[], Dict[Labels, float]]:
+    def collect():
+        return {(("model", name),): getattr(service, attr)
+                for name, service in list(embedding_service._services.items())}
+    return collect
+
+
+registry.callback("iconi_bot_embedding_cache_lookups_total", "Embedding cache lookups by result",
+                  "counter", _cache_counts)
+registry.callback("iconi_bot_embedding_batches_total", "Model calls made by the micro-batcher",
+                  "counter", _batcher_counts("batches"))
+registry.callback("iconi_bot_embedding_batched_texts_total", "Unique texts encoded by the micro-batcher",
+                  "counter", _batcher_counts("batched_texts"))
+
+_request_id = contextvars.ContextVar("iconi_bot_request_id", default=None)
+_request_kind = contextvars.ContextVar("iconi_bot_request_kind", default=None)
+_request_ids = itertools.count(1)
+
+_json_log: Optional[logging.Logger] = None
+
+
+def _setup_json_log():
+    global _json_log
+    if not METRICS_LOG:
+        return
+    _json_log = logging.getLogger("iconi_bot.metrics")
+    _json_log.propagate = False
+    _json_log.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stderr) if METRICS_LOG == "-" else logging.FileHandler(METRICS_LOG)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _json_log.addHandler(handler)
+
+
+def _log(event: str, name: str, seconds: float, error: Optional[BaseException]):
+    if _json_log is None:
+        return
+    record = {
+        "ts": round(time.time(), 3),
+        "event": event,
+        "name": name,
+        "request_id": _request_id.get(),
+        "kind": _request_kind.get(),
+        "duration_ms": round(seconds * 1000, 3),
+    }
+    if error is not None:
+        record["error"] = type(error).__name__
+    _json_log.info(json.dumps(record, ensure_ascii=False))
+
+
+class stage(ContextDecorator):
+    """
+    Замер этапа: with stage("docx_parse"): ... или @stage("encode_texts").
+    Пишет гистограмму длительности, число ошибок и число выполняющихся этапов
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._started = threading.local()
+
+    def __enter__(self):
+        STAGES_IN_FLIGHT.inc(stage=self.name)
+        # один объект может быть декоратором, который вызывают из разных потоков
+        stack = getattr(self._started, "stack", None)
+        if stack is None:
+            stack = self._started.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started.stack.pop()
+        STAGES_IN_FLIGHT.dec(stage=self.name)
+        STAGE_SECONDS.observe(seconds, stage=self.name)
+        if exc is not None:
+            STAGE_ERRORS.inc(stage=self.name)
+        _log("stage", self.name, seconds, exc)
+        return False
+
+
+class request(ContextDecorator):
+    """
+    Замер запроса пользователя целиком; этапы внутри попадают в JSON-лог с его request_id
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._state = threading.local()
+
+    def __enter__(self):
+        REQUESTS.inc(kind=self.kind)
+        REQUESTS_IN_FLIGHT.inc(kind=self.kind)
+        stack = getattr(self._state, "stack", None)
+        if stack is None:
+            stack = self._state.stack = []
+        stack.append((time.perf_counter(),
+                      _request_id.set(next(_request_ids)),
+                      _request_kind.set(self.kind)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        started, id_token, kind_token = self._state.stack.pop()
+        seconds = time.perf_counter() - started
+        REQUESTS_IN_FLIGHT.dec(kind=self.kind)
+        REQUEST_SECONDS.observe(seconds, kind=self.kind)
+        if exc is not None:
+            REQUEST_ERRORS.inc(kind=self.kind)
+        _log("request", self.kind, seconds, exc)
+        _request_id.reset(id_token)
+        _request_kind.reset(kind_token)
+        return False
+
+
+def observe_stage(name: str, seconds: float):
+    """
+    Этап, длительность которого измерена снаружи (например, ожидание в очереди)
+    """
+    STAGE_SECONDS.observe(seconds, stage=name)
+    _log("stage", name, seconds, None)
+
+
+def count_error(kind: str):
+    """
+    Ошибка, которую обработчик перехватил сам и ответил пользователю
+    """
+    REQUEST_ERRORS.inc(kind=kind)
+
+
+class SamplingProfiler:
+    """
+    Раз в interval секунд снимает стеки всех потоков и копит их в формате folded
+    (строка "frame;frame;frame count"), который понимают flamegraph.pl и speedscope
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, path: str = PROFILE_PATH):
+        self.interval = interval
+        self.path = path
+        self.samples = _Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            with self._lock:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            atexit.register(self.dump)
+
+    def stop(self):
+        self._stop.set()
+
+    def folded(self) -> str:
+        with self._lock:
+            items = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def dump(self, path: Optional[str] = None):
+        with open(path or self.path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+
+profiler: Optional[SamplingProfiler] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = registry.expose().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/profile" and profiler is not None:
+            body = profiler.folded().encode("utf-8")
+            content_type = "text/plain; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Метрики: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def setup(metrics_port: int = METRICS_PORT, profile_path: str = PROFILE_PATH):
+    """
+    Включает то, что задано переменными окружения: JSON-лог, профайлер, эндпоинт /metrics.
+    Порт и файл профиля можно переопределить (у каждого воркера webhook_server.py свои)
+    """
+    global profiler
+    _setup_json_log()
+    if PROFILE and profiler is None:
+        profiler = SamplingProfiler(path=profile_path)
+        profiler.start()
+    return start_metrics_server(metrics_port)
@@ -0,0 +1,160 @@
+# ==========================================
+# File: lexical_index.py
+# Description: incremental BM25 inverted index over skill terms for candidate shortlists
+# ==========================================
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+
+def phrase_tokens(phrases: Iterable[str]) -> List[str]:
+    """
+    Слова фраз навыков KeyBERT: у вакансии и резюме одна и та же технология
+    часто входит в разные фразы ("java spring" и "java developer")
+    """
+    return [word for phrase in phrases for word in _WORD.findall(phrase.lower())]
+
+
+class LexicalIndex:
+    """
+    Инвертированный индекс BM25: термин -> документы, где он встречается.
+    Документы добавляются, заменяются и удаляются по одному, без перестройки индекса.
+    Поиск проходит только по спискам документов терминов запроса, поэтому его цена
+    зависит от числа совпадений и длины шортлиста, а не от размера корпуса
+    (кроме запросов с очень частыми терминами — там суммы копятся в плотном массиве).
+    Потокобезопасен: изменения и поиск под одной блокировкой
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # списки документов терминов в виде массивов; пересобираются после изменения термина
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._slots: Dict[Hashable, int] = {}
+        self._keys: List[Optional[Hashable]] = []
+        self._doc_terms: List[Optional[Counter]] = []
+        self._lengths = np.zeros(0, dtype=np.float64)
+        self._free: List[int] = []
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_documents(cls, documents: Dict[Hashable, Iterable[str]], **params) -> "LexicalIndex":
+        index = cls(**params)
+        for key, terms in documents.items():
+            index.add(key, terms)
+        return index
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def add(self, key: Hashable, terms: Iterable[str]):
+        """
+        Добавляет документ; документ с тем же ключом заменяется
+        """
+        counts = Counter(terms)
+        with self._lock:
+            if key in self._slots:
+                self.remove(key)
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._keys)
+                self._keys.append(None)
+                self._doc_terms.append(None)
+                if slot >= len(self._lengths):
+                    self._lengths = np.concatenate([self._lengths, np.zeros(max(slot, 64), dtype=np.float64)])
+            self._slots[key] = slot
+            self._keys[slot] = key
+            self._doc_terms[slot] = counts
+            self._lengths[slot] = sum(counts.values())
+            self._total_length += self._lengths[slot]
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[slot] = tf
+                self._arrays.pop(term, None)
+
+    def remove(self, key: Hashable) -> bool:
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is None:
+                return False
+            for term in self._doc_terms[slot]:
+                postings = self._postings[term]
+                del postings[slot]
+                if not postings:
+                    del self._postings[term]
+                self._arrays.pop(term, None)
+            self._total_length -= self._lengths[slot]
+            self._lengths[slot] = 0
+            self._keys[slot] = None
+            self._doc_terms[slot] = None
+            self._free.append(slot)
+            return True
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if postings is None:
+                return None
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float64, count=len(postings)))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, terms: Iterable[str], n: int) -> Tuple[List[Hashable], np.ndarray]:
+        """
+        До n документов с наибольшим BM25 по терминам запроса: ключи и скоры по убыванию.
+        Документы без общих терминов в выдачу не попадают
+        """
+        with self._lock:
+            count = len(self._slots)
+            if count == 0 or n <= 0:
+                return [], np.zeros(0, dtype=np.float64)
+            avg_length = max(self._total_length / count, 1e-9)
+
+            slot_parts, score_parts = [], []
+            for term in set(terms):
+                arrays = self._term_arrays(term)
+                if arrays is None:
+                    continue
+                slots, tf = arrays
+                idf = math.log(1 + (count - len(slots) + 0.5) / (len(slots) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[slots] / avg_length)
+                slot_parts.append(slots)
+                score_parts.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            if not slot_parts:
+                return [], np.zeros(0, dtype=np.float64)
+
+            slots = np.concatenate(slot_parts)
+            if len(slots) * 8 >= len(self._keys):
+                # совпадений много (частые термины): сложение в плотном массиве дешевле сортировки
+                totals = np.bincount(slots, weights=np.concatenate(score_parts), minlength=len(self._keys))
+                slots = np.flatnonzero(totals)
+                scores = totals[slots]
+            else:
+                slots, inverse = np.unique(slots, return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            if n < len(scores):
+                # на границе шортлиста из равных n-му скору берутся меньшие слоты,
+                # а не те, что вернула бы argpartition
+                kth = -np.partition(-scores, n - 1)[n - 1]
+                better = np.flatnonzero(scores > kth)
+                tied = np.flatnonzero(scores == kth)
+                tied = tied[np.argsort(slots[tied], kind='stable')]
+                top = np.concatenate([better, tied[:n - len(better)]])
+            else:
+                top = np.arange(len(scores))
+            # при равных скорах — меньший слот, чтобы выдача не зависела от порядка терминов
+            top = top[np.lexsort((slots[top], -scores[top]))]
+            return [self._keys[slot] for slot in slots[top]], scores[top]
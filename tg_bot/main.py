@@ -6,19 +6,14 @@
 import os
 import requests
 
-from docx import Document
 from io import BytesIO
 
 import telebot
-from telebot.types import ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove, KeyboardButton
+from telebot import apihelper
+from telebot.types import ReplyKeyboardRemove
 import datetime
 import logging
 
-from cv_matcher import VacancyResumeMatcher
-
-from extract_skills import extract_skills
-from ranking import skill_similarity
-
 logger = telebot.logger
 
 formatter = '[%(asctime)s] %(levelname)8s --- %(message)s (%(filename)s:%(lineno)s)'
@@ -30,7 +25,16 @@ logging.basicConfig(
     level=logging.WARNING
 )
 
-RANK = 3
+# модели и каталог загружаются при импорте, поэтому после настройки логов
+from cv_matcher import read_docx_text
+from bot_core import (
+    RANK, FIND_VACANCIES, SHOW_MATCH, ADMIN_IDS, ERROR_TEXT, ONLY_DOCX_TEXT, FILE_RECEIVED_TEXT,
+    cv_matcher, catalog, reload_catalog, get_active_state, set_active_state, gen_main_menu,
+    cancel_text, welcome_text, help_text, reload_text, vacancies_menu_text, ask_resume_text,
+    vacancy_selected_text, resume_received_text, match_text, ranks_texts,
+)
+from instrumentation import request, stage, count_error, setup as setup_instrumentation
+
 SAVE_FILES = False
 
 if SAVE_FILES:
@@ -38,27 +42,21 @@ if SAVE_FILES:
     if not os.path.exists(DOWNLOAD_FOLDER):
         os.makedirs(DOWNLOAD_FOLDER)
 
-VACANCIES_CSV = "./tg_bot/5_vacancies.csv"
-
-try:
-    cv_matcher = VacancyResumeMatcher()
-    vacancies = cv_matcher.load_vacancies(VACANCIES_CSV)
-    all_vacancy_texts = [vacancies[vid]['description'] for vid in sorted(vacancies.keys())]
-    vacancy_ids = sorted(vacancies.keys())
-    vacancy_embeddings_list = cv_matcher.encode_texts(all_vacancy_texts)
-    vacancy_embeddings = {vid: vacancy_embeddings_list[i] for i, vid in enumerate(vacancy_ids)}
-except Exception as e:
-    logger.error(e)
-
 TOKEN = os.environ.get("iconi_bot_token")
+# адрес Bot API; для локальных тестов — адрес telegram_stub.py
+API_URL = os.environ.get("iconi_bot_api_url", "https://api.telegram.org").rstrip("/")
+# 1 — принимать обновления через webhook (webhook_server.py) вместо long polling
+WEBHOOK = os.environ.get("iconi_bot_webhook", "0") == "1"
 
-bot = telebot.TeleBot(TOKEN, parse_mode='HTML')
+apihelper.API_URL = API_URL + "/bot{0}/{1}"
+apihelper.FILE_URL = API_URL + "/file/bot{0}/{1}"
 
-FIND_VACANCIES = "Find vacancies"
-SHOW_MATCH = "Show match"
+bot = telebot.TeleBot(TOKEN, parse_mode='HTML')
 
-ACTIVE_STATE_INIT = {'mode': FIND_VACANCIES, 'id': None}
-ACTIVE_STATE = {}
+# /metrics, JSON-лог этапов и профайлер — по переменным окружения iconi_bot_metrics_*, iconi_bot_profile;
+# в режиме webhook их включает каждый воркер
+if not WEBHOOK:
+    setup_instrumentation()
 
 
 def read_docx(message, docx_file):
@@ -67,91 +65,65 @@ def read_docx(message, docx_file):
         print(f"✓ Загружено резюме")
         return text.strip() if text else text
     except ValueError:
-        msg = bot.send_message(message, 'Что-то пошло не так. Попробуйте еще раз.')
-
-def get_ranks(resume_text):
-    resume_embedding = cv_matcher.encode_texts([resume_text])
-    
-    # Ранжируем вакансии для этого резюме
-    ranked = cv_matcher.rank_vacancies_for_resume(resume_text, vacancies, 
-                                                  vacancy_embeddings, resume_embedding[0])
-
-    return ranked[:RANK]
-
-def gen_main_menu():
-    markup = ReplyKeyboardMarkup(True, False)
-    markup.add(KeyboardButton(FIND_VACANCIES))
-    markup.add(KeyboardButton(SHOW_MATCH))
-    return markup
-
-def get_active_state(user_id):
-    return ACTIVE_STATE.get(user_id, ACTIVE_STATE_INIT)
+        msg = bot.send_message(message, ERROR_TEXT)
 
 # Handle '/cancel'
 @bot.message_handler(commands=['cancel'])
 def send_cancel(message):
-    get_active_state(message.from_user.id)['mode'] = FIND_VACANCIES
-    get_active_state(message.from_user.id)['id'] = None
+    set_active_state(message.from_user.id, mode=FIND_VACANCIES, vacancy_id=None)
     markup = ReplyKeyboardRemove()
-    msg = bot.send_message(message.from_user.id, f"""\
-        Отмена \
-        """, reply_markup=markup)
+    msg = bot.send_message(message.from_user.id, cancel_text(), reply_markup=markup)
+
+# Handle '/reload'
+@bot.message_handler(commands=['reload'])
+def send_reload(message):
+    if ADMIN_IDS and message.from_user.id not in ADMIN_IDS:
+        bot.reply_to(message, 'Недостаточно прав.')
+        return
+    stats = reload_catalog()
+    bot.reply_to(message, reload_text(stats))
 
 # Handle '/start'
 @bot.message_handler(commands=['start'])
 def send_welcome(message):
-    msg = bot.send_message(message.from_user.id, f"""\
-        Привет, <i>{message.from_user.first_name}</i>. Я HRBot. \
-        \n\nЯ помогу тебе с поиском вакансий. \
-        \n\nЖми на кнопку {FIND_VACANCIES} чтобы подобрать топ-{RANK} вакансий по резюме, \
-        \n\nили {SHOW_MATCH} чтобы посмотреть совпадения по конкретной вакансии. \
-        \n\nПомощь /help. \
-        """, reply_markup=gen_main_menu())
+    msg = bot.send_message(message.from_user.id, welcome_text(message.from_user.first_name),
+                           reply_markup=gen_main_menu())
 
 @bot.message_handler(func=lambda message: message.text == SHOW_MATCH)
 def process_ask_question_match(message):
-    get_active_state(message.from_user.id)['mode'] = SHOW_MATCH
-    vacs_text = ""
-    for vac_id, vac in vacancies.items():
-        vacs_text += f"\n\n{vac_id}. {vac['title']}"
-    
-    msg = bot.send_message(message.from_user.id, f"""\
-        \n\nВыбери вакансию, отправь мне только ее номер {vacs_text}  \
-        """)
+    set_active_state(message.from_user.id, mode=SHOW_MATCH)
+    msg = bot.send_message(message.from_user.id, vacancies_menu_text(catalog.snapshot))
 
 @bot.message_handler(func=lambda message: message.text == FIND_VACANCIES)
 def process_ask_question(message):
-    get_active_state(message.from_user.id)['mode'] = FIND_VACANCIES
-    msg = bot.send_message(message.from_user.id, f"""\
-        \n\nПришли мне docx файл резюме или краткий текст резюме одним сообщением \
-        """)
+    set_active_state(message.from_user.id, mode=FIND_VACANCIES)
+    msg = bot.send_message(message.from_user.id, ask_resume_text())
 
 # Handle '/help'
 @bot.message_handler(commands=['help'])
 def send_help(message):
-    msg = bot.send_message(message.from_user.id, f"""\
-        Привет, <i>{message.from_user.first_name}</i>. Я HRBot. \
-        \n\nЯ помогу тебе с поиском вакансий. \
-        \n\nЖми на кнопку {FIND_VACANCIES} чтобы подобрать топ-{RANK} вакансий по резюме, \
-        \n\nили {SHOW_MATCH} чтобы посмотреть совпадения по конкретной вакансии. \       
-        """, reply_markup=gen_main_menu())
+    msg = bot.send_message(message.from_user.id, help_text(message.from_user.first_name),
+                           reply_markup=gen_main_menu())
 
 
 @bot.message_handler(content_types=['document'])
+@request("document")
 def handle_document(message):
     if message.document.file_name.endswith('.docx'):
         try:
             # Get file ID
             file_id = message.document.file_id
             # Get file information (file_path)
-            file_info = bot.get_file(file_id)
+            with stage("get_file"):
+                file_info = bot.get_file(file_id)
             file_path = file_info.file_path
 
             # Construct the download URL
-            download_url = f"https://api.telegram.org/file/bot{TOKEN}/{file_path}"
-            
+            download_url = apihelper.FILE_URL.format(TOKEN, file_path)
+
             # Download the file
-            response = requests.get(download_url)
+            with stage("download"):
+                response = requests.get(download_url)
             if response.status_code == 200:
                 # Save the file to the local directory
                 if SAVE_FILES:
@@ -160,91 +132,53 @@ def handle_document(message):
                         f.write(response.content)
                     resume_text = read_docx(message, save_path)
                 else:
-                    docx_content = BytesIO(response.content)
-
-                    # Open the document using python-docx
-                    document = Document(docx_content)
+                    # Extract paragraphs and table cells straight from the zip
+                    resume_text = read_docx_text(BytesIO(response.content))
 
-                    # Extract all text, paragraph by paragraph
-                    full_text = []
-                    for paragraph in document.paragraphs:
-                        full_text.append(paragraph.text)
+                bot.reply_to(message, FILE_RECEIVED_TEXT)
 
-                    # Join the paragraphs with newlines
-                    extracted_text = '\n'.join(full_text)
-
-                    resume_text = extracted_text
-                
-                bot.reply_to(message, f"Получил файл, проверяю...")
-                
                 state = get_active_state(message.from_user.id)
-                if state['mode'] == FIND_VACANCIES:
-                    result = get_ranks(resume_text)
-                    build_answer(message, result, resume_text)
-                elif state['mode'] == SHOW_MATCH and state['id']:
-                    show_match(message, resume_text)
+                snapshot = catalog.snapshot
+                if state.mode == FIND_VACANCIES:
+                    build_answer(message, resume_text, snapshot)
+                elif state.mode == SHOW_MATCH and state.vacancy_id:
+                    show_match(message, resume_text, snapshot)
                 else:
-                    bot.reply_to(message, 'Что-то пошло не так. Попробуйте еще раз.')
+                    bot.reply_to(message, ERROR_TEXT)
             else:
-                bot.reply_to(message, 'Что-то пошло не так. Попробуйте еще раз.')
+                bot.reply_to(message, ERROR_TEXT)
         except Exception as e:
+            count_error("document")
             print(e)
             # bot.reply_to(message, f"Ошибка: {e}")
     else:
-        bot.reply_to(message, 'Только .docx файлы.')
+        bot.reply_to(message, ONLY_DOCX_TEXT)
 
+@request("text")
 def answer(message):
     state = get_active_state(message.from_user.id)
-    if state['mode'] == FIND_VACANCIES:
-        result = get_ranks(message.text)
-        build_answer(message, result, message.text)
-    elif state['mode'] == SHOW_MATCH and str.isdigit(message.text) and int(message.text) in vacancies.keys():
-        state['id'] = int(message.text)
-        bot.send_message(message.from_user.id, f"""\
-            \n\nВыбрана вакансия {state['id']}. Теперь пришли мне docx файл резюме или краткий текст резюме одним сообщением \
-            """)
-    elif state['mode'] == SHOW_MATCH and not str.isdigit(message.text) and state['id']:
-        bot.reply_to(message, f"Выбраная вакансия {state['id']}. Получил резюме, проверяю...")
-        show_match(message, message.text)
-    else: 
-        bot.reply_to(message, 'Что-то пошло не так. Попробуйте еще раз.')
-
-def show_match(message, resume_text):
-    vac_id = get_active_state(message.from_user.id)['id']
-    vacancy = vacancies[vac_id]
-
-    vac_skills = extract_skills(vacancy['description'])
-
-    resume_skills = extract_skills(resume_text)
-
-    similarity = skill_similarity(resume_skills, vac_skills)
-
-    resp = f"""
-        \nПроцент соответствия навыков: {similarity * 100:.2f}%
-        \nИзвлечённые навыки из резюме: {[formatted(s, vac_skills) for s in resume_skills]}
-        \nНавыки вакансии: {[formatted(s, resume_skills) for s in vac_skills]}
-        """
-
-    bot.reply_to(message, resp)
-    
-def formatted(skill, skills):
-    return f"<b>{skill}</b>" if skill in skills else skill
-
-def build_answer(message, result, resume_text):
-    bot.reply_to(message, f'Топ-{RANK} рекомендуемых вакансий:')
-    for i, (vacancy_id, score) in enumerate(result):
-        vacancy = vacancies[vacancy_id]
-        skills = cv_matcher.extract_key_terms(resume_text)
-        skill_overlap = cv_matcher.calculate_skill_overlap(vacancy['description'], resume_text)
-        confidence = int(score * 100)
-        resp = f"""
-            {i + 1}. Вакансия #{vacancy_id}: {vacancy['title']}
-            ├─ Уверенность подбора: {confidence}%
-            ├─ Перекрытие навыков: {int(skill_overlap * 100)}%
-            ├─ Основные навыки кандидата: {', '.join(skills[:5]) if skills else 'Не определены'}
-            └─ Рекомендация: {'Высокий приоритет' if confidence >= 75 else '✓ Средний приоритет' if confidence >= 50 else 'Низкий приоритет'}
-        """
-        bot.reply_to(message, f"{resp}")
+    snapshot = catalog.snapshot
+    if state.mode == FIND_VACANCIES:
+        build_answer(message, message.text, snapshot)
+    elif state.mode == SHOW_MATCH and str.isdigit(message.text) and int(message.text) in snapshot.vacancies.keys():
+        state = set_active_state(message.from_user.id, vacancy_id=int(message.text))
+        bot.send_message(message.from_user.id, vacancy_selected_text(state.vacancy_id))
+    elif state.mode == SHOW_MATCH and not str.isdigit(message.text) and state.vacancy_id:
+        bot.reply_to(message, resume_received_text(state.vacancy_id))
+        show_match(message, message.text, snapshot)
+    else:
+        bot.reply_to(message, ERROR_TEXT)
+
+def show_match(message, resume_text, snapshot):
+    vac_id = get_active_state(message.from_user.id).vacancy_id
+    text = match_text(resume_text, vac_id, snapshot)
+    with stage("send_reply"):
+        bot.reply_to(message, text)
+
+def build_answer(message, resume_text, snapshot):
+    for resp in ranks_texts(resume_text, snapshot):
+        with stage("send_reply"):
+            bot.reply_to(message, resp)
 
 
 @bot.edited_message_handler(func=lambda message: True)
@@ -256,4 +190,9 @@ def handle_message(message):
     answer(message)
 
 
-bot.polling(none_stop=True, interval=0)
+if __name__ == "__main__":
+    if WEBHOOK:
+        from webhook_server import serve
+        serve(bot)
+    else:
+        bot.polling(none_stop=True, interval=0)
@@ -3,11 +3,12 @@
 # Description: analysis skills similarity and ranking
 # Author: @wavvybaby
 # ==========================================
-from sentence_transformers import SentenceTransformer
 from sentence_transformers import util
+import numpy as np
+from embedding_service import get_batched_encoder
+from lexical_index import phrase_tokens
 
-
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+embedder = get_batched_encoder('all-MiniLM-L6-v2')
 
 def skill_similarity(resume_skills, vacancy_skills):
     """
@@ -15,19 +16,251 @@ def skill_similarity(resume_skills, vacancy_skills):
     """
     if not resume_skills or not vacancy_skills:
         return 0.0
-    
+
     emb_res = embedder.encode(resume_skills, convert_to_tensor=True)
     emb_vac = embedder.encode(vacancy_skills, convert_to_tensor=True)
 
     sim_matrix = util.cos_sim(emb_res, emb_vac)
-    
+
     return float(sim_matrix.mean())
 
+def encode_phrases(phrases):
+    """
+    Кодирует уникальные фразы за один проход модели.
+    Возвращает словарь фраза -> номер строки и матрицу нормированных эмбеддингов
+    """
+    unique = list(dict.fromkeys(phrases))
+    index = {p: i for i, p in enumerate(unique)}
+    if not unique:
+        return index, np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    emb = embedder.encode(unique, convert_to_numpy=True, normalize_embeddings=True,
+                          show_progress_bar=False)
+    return index, emb
+
+def skill_similarity_precomputed(resume_skills, vacancy_skill_embeddings):
+    """
+    skill_similarity с заранее посчитанными нормированными эмбеддингами навыков вакансии:
+    кодируются только навыки резюме
+    """
+    if not resume_skills or len(vacancy_skill_embeddings) == 0:
+        return 0.0
+
+    # среднее матрицы косинусов = скалярное произведение центроидов
+    return float(skill_centroid(resume_skills) @ np.asarray(vacancy_skill_embeddings).mean(axis=0))
+
+def skill_centroid(skills):
+    """
+    Среднее нормированных эмбеддингов фраз (с повторами, как в skill_similarity)
+    """
+    index, emb = encode_phrases(skills)
+    if not skills:
+        return np.zeros(emb.shape[1], dtype=np.float32)
+    return emb[[index[p] for p in skills]].mean(axis=0)
+
 def rank_resumes_for_vacancy(resume_skills_dict, vacancy_skills):
-    scores = {}
-    for rid, skills in resume_skills_dict.items():
-        score = skill_similarity(skills, vacancy_skills)
-        scores[rid] = score
-    
-    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return ranked
\ No newline at end of file
+    """
+    Пакетное ранжирование: все фразы пула резюме и вакансии кодируются один раз.
+
+    Среднее по матрице косинусов |A| x |B| для нормированных векторов равно
+    скалярному произведению центроидов A и B, поэтому скоры всего пула —
+    одно произведение матрицы центроидов резюме на центроид вакансии.
+    """
+    rids = list(resume_skills_dict.keys())
+    if not vacancy_skills:
+        return [(rid, 0.0) for rid in rids]
+
+    index, emb = encode_phrases(list(vacancy_skills) + [p for skills in resume_skills_dict.values() for p in skills])
+    resumes = SkillCentroidIndex.build(resume_skills_dict, index, emb)
+    return resumes.rank(emb[[index[p] for p in vacancy_skills]])
+
+def rank_resumes_shortlist(resume_index, lexical_index, vacancy_skills, n_candidates=500,
+                           aggregation="mean", top_n=None):
+    """
+    rank_resumes_for_vacancy для большого пула с готовыми индексами: BM25 по словам навыков
+    (LexicalIndex над phrase_tokens) отбирает n_candidates резюме, сходство навыков
+    по SkillCentroidIndex считается только для них
+    """
+    candidates, _ = lexical_index.search(phrase_tokens(vacancy_skills), n_candidates)
+    return resume_index.rank(vacancy_skills, aggregation, top_n=top_n, candidates=candidates)
+
+AGGREGATIONS = ("mean", "max", "topk")
+# документов на блок при max/topk: матрица косинусов блока q x документ x фраза
+_DOC_BLOCK = 2048
+
+class SkillCentroidIndex:
+    """
+    Навыки набора документов (резюме или вакансий): центроид каждого документа
+    и эмбеддинги его фраз одной непрерывной матрицей.
+
+    Сходство запроса Q (фразы) с документом D по матрице косинусов S = Q x D:
+      mean — среднее S, равно скалярному произведению центроидов: O(dim) на пару;
+      max  — для каждой фразы запроса лучшая фраза документа, среднее по запросу;
+      topk — для каждой фразы запроса среднее k лучших фраз документа
+             (k=1 — то же, что max; k >= |D| — то же, что mean).
+    max и topk считаются по закэшированным фразам, без повторного кодирования
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or embedder.get_sentence_embedding_dimension()
+        self.ids = []
+        self.skills = []
+        self._positions = {}
+        self._chunks = []
+        self._centroid_rows = []
+        self._matrices = None
+
+    @classmethod
+    def build(cls, skills_dict, phrase_index=None, phrase_embeddings=None):
+        """
+        Индекс по словарю id -> навыки. Фразы, которых нет в phrase_index
+        (результат encode_phrases), кодируются одним проходом модели
+        """
+        phrase_index = phrase_index or {}
+        missing = [p for skills in skills_dict.values() for p in skills if p not in phrase_index]
+        extra_index, extra_emb = encode_phrases(missing)
+
+        index = cls(phrase_embeddings.shape[1] if phrase_embeddings is not None else extra_emb.shape[1])
+        for doc_id, skills in skills_dict.items():
+            rows = [phrase_embeddings[phrase_index[p]] if p in phrase_index else extra_emb[extra_index[p]]
+                    for p in skills]
+            index.add(doc_id, skills, np.array(rows, dtype=np.float32).reshape(len(rows), index.dim))
+        return index
+
+    def add(self, doc_id, skills, embeddings=None):
+        """
+        Добавляет документ; embeddings — нормированные эмбеддинги skills в том же порядке,
+        иначе фразы кодируются. Повторный id заменяет прежние навыки
+        """
+        skills = list(skills)
+        if embeddings is None:
+            index, emb = encode_phrases(skills)
+            embeddings = emb[[index[p] for p in skills]].reshape(len(skills), self.dim)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        centroid = embeddings.mean(axis=0) if len(embeddings) else np.zeros(self.dim, dtype=np.float32)
+
+        if doc_id in self._positions:
+            pos = self._positions[doc_id]
+            self.skills[pos], self._chunks[pos], self._centroid_rows[pos] = skills, embeddings, centroid
+        else:
+            self._positions[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+            self.skills.append(skills)
+            self._chunks.append(embeddings)
+            self._centroid_rows.append(centroid)
+        self._matrices = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def _stacked(self):
+        """
+        Центроиды (n x dim), фразы всех документов (m x dim) и начало фраз каждого документа.
+        Собираются заново только после add
+        """
+        if self._matrices is None:
+            centroids = np.array(self._centroid_rows, dtype=np.float32).reshape(len(self.ids), self.dim)
+            phrases = np.concatenate(self._chunks) if self._chunks else np.zeros((0, self.dim), dtype=np.float32)
+            lengths = np.array([len(chunk) for chunk in self._chunks], dtype=np.int64)
+            self._matrices = (centroids, phrases, np.concatenate([[0], np.cumsum(lengths)]))
+        return self._matrices
+
+    @property
+    def centroids(self):
+        return self._stacked()[0]
+
+    def centroid(self, doc_id):
+        return self._centroid_rows[self._positions[doc_id]]
+
+    def phrase_embeddings(self, doc_id):
+        return self._chunks[self._positions[doc_id]]
+
+    def _query(self, query):
+        """
+        Запрос — список фраз или уже посчитанные нормированные эмбеддинги фраз
+        """
+        if isinstance(query, np.ndarray):
+            return query.reshape(-1, self.dim).astype(np.float32, copy=False)
+        query = list(query)
+        index, emb = encode_phrases(query)
+        return emb[[index[p] for p in query]].reshape(len(query), self.dim)
+
+    def scores(self, query, aggregation="mean", k=3, candidates=None):
+        """
+        Сходство запроса со всеми документами в порядке self.ids или только с candidates
+        (шортлист id, в его порядке). mean — одно произведение матрицы центроидов на центроид запроса
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Неизвестная агрегация {aggregation!r}, допустимы: {', '.join(AGGREGATIONS)}")
+        query = self._query(query)
+        centroids, phrases, starts = self._stacked()
+        if candidates is None:
+            positions = np.arange(len(self.ids))
+        else:
+            positions = np.array([self._positions[c] for c in candidates], dtype=np.int64)
+            centroids = centroids[positions]
+        if len(query) == 0 or len(positions) == 0:
+            return np.zeros(len(positions), dtype=np.float64)
+        if aggregation == "mean":
+            return (centroids @ query.mean(axis=0)).astype(np.float64)
+
+        # косинусы фраз запроса с фразами индекса, разложенные по документам блоками:
+        # q x документ x фраза, пустые места -inf
+        take = 1 if aggregation == "max" else k
+        lengths = np.diff(starts)
+        out = np.zeros(len(positions), dtype=np.float64)
+        for lo in range(0, len(positions), _DOC_BLOCK):
+            hi = min(lo + _DOC_BLOCK, len(positions))
+            block = positions[lo:hi]
+            block_lengths = lengths[block]
+            width = max(int(block_lengths.max()), 1)
+            valid = np.arange(width) < block_lengths[:, None]
+            slots = (starts[block, None] + np.arange(width))[valid]
+            sims = np.full((len(query), hi - lo, width), -np.inf, dtype=np.float32)
+            sims[:, valid] = query @ phrases[slots].T
+
+            best = -np.sort(-sims, axis=2)[:, :, :take]
+            counts = np.maximum(np.minimum(block_lengths, take), 1)
+            per_query = np.where(np.isfinite(best), best, 0).sum(axis=2) / counts
+            out[lo:hi] = np.where(block_lengths > 0, per_query.mean(axis=0), 0.0)
+        return out
+
+    def similarity(self, query, doc_id, aggregation="mean", k=3):
+        """
+        Сходство запроса с одним документом; для mean — скалярное произведение центроидов
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Неизвестная агрегация {aggregation!r}, допустимы: {', '.join(AGGREGATIONS)}")
+        query = self._query(query)
+        doc = self.phrase_embeddings(doc_id)
+        if len(query) == 0 or len(doc) == 0:
+            return 0.0
+        if aggregation == "mean":
+            return float(query.mean(axis=0) @ self.centroid(doc_id))
+        sims = query @ doc.T
+        take = min(1 if aggregation == "max" else k, len(doc))
+        return float(-np.sort(-sims, axis=1)[:, :take].mean(axis=1).mean())
+
+    def rank(self, query, aggregation="mean", k=3, top_n=None, candidates=None):
+        """
+        Документы (все или из шортлиста candidates) по убыванию сходства с запросом: список (id, скор)
+        """
+        scores = self.scores(query, aggregation, k, candidates)
+        ids = self.ids if candidates is None else list(candidates)
+        ranked = sorted(zip(ids, scores.tolist()), key=lambda x: x[1], reverse=True)
+        return ranked if top_n is None else ranked[:top_n]
+
+    def explain(self, query_skills, doc_id):
+        """
+        Для каждой фразы запроса — ближайшая фраза документа и их косинус
+        """
+        doc = self.phrase_embeddings(doc_id)
+        doc_skills = self.skills[self._positions[doc_id]]
+        if not query_skills or len(doc) == 0:
+            return [(p, None, 0.0) for p in query_skills]
+        sims = self._query(query_skills) @ doc.T
+        best = sims.argmax(axis=1)
+        return [(p, doc_skills[j], float(sims[i, j])) for i, (p, j) in enumerate(zip(query_skills, best))]
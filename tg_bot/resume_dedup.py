@@ -0,0 +1,221 @@
+# ==========================================
+# File: resume_dedup.py
+# Description: exact and near-duplicate resume detection (sha256 + MinHash/LSH) and reuse of their results
+# ==========================================
+import hashlib
+import itertools
+import re
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# простое число Мерсенна 2^31 - 1: (a * x + b) для 32-битных x не переполняет uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Текст без различий в регистре и пробелах: повторная отправка того же резюме
+    из другого редактора даёт тот же хэш
+    """
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def shingles(text: str, size: int = 3) -> np.ndarray:
+    """
+    32-битные хэши словесных n-грамм нормализованного текста
+    """
+    words = normalize_text(text).split()
+    grams = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))} if words else set()
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class ResumeFingerprint:
+    """
+    sha256 нормализованного текста и MinHash-сигнатура его шинглов
+    """
+    __slots__ = ("digest", "signature")
+
+    def __init__(self, digest: str, signature: Optional[np.ndarray]):
+        self.digest = digest
+        self.signature = signature
+
+
+class MinHasher:
+    """
+    MinHash с num_perm универсальными хэш-функциями (a * x + b) mod p.
+    Доля совпавших координат двух сигнатур оценивает коэффициент Жаккара шинглов
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def fingerprint(self, text: str) -> ResumeFingerprint:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        hashes = shingles(text, self.shingle_size) % _PRIME
+        if len(hashes) == 0:
+            # пустой текст совпадает только сам с собой, по хэшу
+            return ResumeFingerprint(digest, None)
+        signature = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+        return ResumeFingerprint(digest, signature.astype(np.uint32))
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+class _Entry:
+    __slots__ = ("key", "fingerprint", "expires", "results")
+
+    def __init__(self, key: int, fingerprint: ResumeFingerprint, expires: float):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.results = {}
+
+
+class ResumeDedupIndex:
+    """
+    Группы одинаковых и почти одинаковых резюме. Точные повторы находятся по sha256,
+    почти одинаковые — через LSH: сигнатура режется на bands полос, резюме с общей
+    полосой — кандидаты, кандидат принимается при оценке Жаккара >= threshold.
+    У группы ключ и результаты расчётов (ранжирование, навыки); группа живёт ttl секунд
+    с первого появления, при переполнении вытесняется давно не использованная
+    """
+
+    def __init__(self, threshold: float = 0.9, ttl: float = 3600, max_items: int = 10000,
+                 num_perm: int = 128, bands: int = 32, shingle_size: int = 3):
+        if num_perm % bands:
+            raise ValueError(f"num_perm={num_perm} не делится на bands={bands}")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_items = max_items
+        self.bands = bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._digests: Dict[str, int] = {}
+        self._buckets: Dict[tuple, set] = {}
+        # (срок, ключ) в порядке создания: сроки возрастают, истёкшие всегда в начале
+        self._expiry = deque()
+        self._keys = itertools.count(1)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        return [(band, chunk.tobytes()) for band, chunk in enumerate(np.split(signature, self.bands))]
+
+    def _drop(self, entry: _Entry):
+        del self._entries[entry.key]
+        if self._digests.get(entry.fingerprint.digest) == entry.key:
+            del self._digests[entry.fingerprint.digest]
+        if entry.fingerprint.signature is not None:
+            for band in self._band_keys(entry.fingerprint.signature):
+                bucket = self._buckets.get(band)
+                if bucket is not None:
+                    bucket.discard(entry.key)
+                    if not bucket:
+                        del self._buckets[band]
+
+    def _expire(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            entry = self._entries.get(self._expiry.popleft()[1])
+            if entry is not None:
+                self._drop(entry)
+
+    def _find(self, fingerprint: ResumeFingerprint) -> Optional[_Entry]:
+        key = self._digests.get(fingerprint.digest)
+        if key is not None:
+            self.exact_hits += 1
+            return self._entries[key]
+        if fingerprint.signature is not None:
+            candidates = set()
+            for band in self._band_keys(fingerprint.signature):
+                candidates |= self._buckets.get(band, set())
+            best, best_similarity = None, self.threshold
+            for key in candidates:
+                entry = self._entries[key]
+                similarity = MinHasher.similarity(fingerprint.signature, entry.fingerprint.signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is not None:
+                self.near_hits += 1
+                return best
+        self.misses += 1
+        return None
+
+    def _resolve(self, fingerprint: ResumeFingerprint) -> _Entry:
+        """
+        Группа резюме: найденная среди живых или новая
+        """
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._find(fingerprint)
+        if entry is not None:
+            self._entries.move_to_end(entry.key)
+            return entry
+
+        entry = _Entry(next(self._keys), fingerprint, now + self.ttl)
+        self._entries[entry.key] = entry
+        self._expiry.append((entry.expires, entry.key))
+        self._digests[fingerprint.digest] = entry.key
+        if fingerprint.signature is not None:
+            for band in self._band_keys(fingerprint.signature):
+                self._buckets.setdefault(band, set()).add(entry.key)
+        while len(self._entries) > self.max_items:
+            self._drop(next(iter(self._entries.values())))
+        return entry
+
+    def group(self, text: str) -> int:
+        """
+        Ключ группы резюме; одинаковые и почти одинаковые тексты получают один ключ
+        """
+        fingerprint = self.hasher.fingerprint(text)
+        with self._lock:
+            return self._resolve(fingerprint).key
+
+    def cached(self, text: str, name: Hashable, compute: Callable[[], object], scope: object = None):
+        """
+        Результат name для группы резюме: сохранённый или compute().
+        scope — объект, к которому привязан результат (снимок каталога): после замены
+        снимка результат считается заново
+        """
+        fingerprint = self.hasher.fingerprint(text)
+        with self._lock:
+            entry = self._resolve(fingerprint)
+            stored = entry.results.get(name)
+        if stored is not None and (stored[0] is None if scope is None else stored[0]() is scope):
+            return stored[1]
+
+        value = compute()
+        with self._lock:
+            entry.results[name] = (weakref.ref(scope) if scope is not None else None, value)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def collapse_duplicates(texts: Dict[Hashable, str], threshold: float = 0.9, **params) -> Dict[Hashable, Hashable]:
+    """
+    Пакетный режим: id -> id представителя группы (первого встреченного резюме группы).
+    Навыки и скоры считаются только для представителей, остальным копируются
+    """
+    index = ResumeDedupIndex(threshold=threshold, ttl=float("inf"), max_items=max(len(texts), 1), **params)
+    representatives = {}
+    mapping = {}
+    for text_id, text in texts.items():
+        group = index.group(text)
+        mapping[text_id] = representatives.setdefault(group, text_id)
+    return mapping
@@ -0,0 +1,186 @@
+# ==========================================
+# File: session_store.py
+# Description: bounded per-user session store with LRU + TTL eviction and optional SQLite persistence
+# ==========================================
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# удаление просроченных строк SQLite — раз в столько записей
+_PURGE_EVERY = 1000
+
+
+class Session:
+    """
+    Состояние диалога одного пользователя: режим и выбранная вакансия.
+    Меняется только через SessionStore.update, чтобы изменения попадали на диск
+    """
+    __slots__ = ("user_id", "mode", "vacancy_id", "updated", "stored")
+
+    def __init__(self, user_id: int, mode: str, vacancy_id: Optional[int] = None, updated: float = 0.0):
+        self.user_id = user_id
+        self.mode = mode
+        self.vacancy_id = vacancy_id
+        self.updated = updated
+        # время активности, записанное в SQLite
+        self.stored = updated
+
+
+class SessionStore:
+    """
+    Сессии пользователей: в памяти не больше max_sessions (давно не активные вытесняются),
+    сессия без активности дольше ttl секунд забывается. Поиск и обновление — O(1).
+    С path сессии пишутся в SQLite и переживают перезапуск бота.
+    Один замок на все операции: обработчики asyncio и потоки пула работают с одним хранилищем
+    """
+
+    def __init__(self, default_mode: str, ttl: float = 86400, max_sessions: int = 100000,
+                 path: Optional[str] = None):
+        self.default_mode = default_mode
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.path = path or None
+        self.shared = False
+        self._sessions: "OrderedDict[int, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._writes = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        # после fork соединение родителя использовать нельзя
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(user_id INTEGER PRIMARY KEY, mode TEXT NOT NULL, vacancy_id INTEGER, updated REAL NOT NULL)"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _load(self, user_id: int, now: float) -> Optional[Session]:
+        conn = self._connection()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT mode, vacancy_id, updated FROM sessions WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        if row is None:
+            return None
+        if row[2] + self.ttl <= now:
+            # в памяти такой сессии нет, истечение видно только здесь
+            if self.shared:
+                self.expired += 1
+            return None
+        return Session(user_id, row[0], row[1], row[2])
+
+    def _save(self, session: Session):
+        conn = self._connection()
+        if conn is None:
+            return
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (user_id, mode, vacancy_id, updated) VALUES (?, ?, ?, ?)",
+                         (session.user_id, session.mode, session.vacancy_id, session.updated))
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM sessions WHERE updated <= ?", (session.updated - self.ttl,))
+        session.stored = session.updated
+
+    def _touch(self, session: Session):
+        """
+        Продление срока сессии в SQLite при чтении: срок считается от последней активности,
+        а не от последнего изменения режима. Запись не чаще раза в ttl / 10
+        """
+        if session.updated - session.stored <= self.ttl / 10:
+            return
+        conn = self._connection()
+        if conn is None:
+            return
+        with conn:
+            conn.execute("UPDATE sessions SET updated = ? WHERE user_id = ?", (session.updated, session.user_id))
+        session.stored = session.updated
+
+    def _remember(self, session: Session):
+        self._sessions[session.user_id] = session
+        self._sessions.move_to_end(session.user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def _get(self, user_id: int, now: float) -> Session:
+        if self.shared:
+            session = self._load(user_id, now) or Session(user_id, self.default_mode, None, now)
+            session.updated = now
+            self._touch(session)
+            return session
+        session = self._sessions.get(user_id)
+        if session is not None and session.updated + self.ttl <= now:
+            del self._sessions[user_id]
+            self.expired += 1
+            session = None
+        if session is None:
+            # у каждого нового пользователя своя сессия, а не общий объект по умолчанию
+            session = self._load(user_id, now) or Session(user_id, self.default_mode, None, now)
+        session.updated = now
+        self._touch(session)
+        self._remember(session)
+        return session
+
+    def get(self, user_id: int) -> Session:
+        """
+        Сессия пользователя (из памяти, с диска или новая); продлевает её срок
+        """
+        with self._lock:
+            return self._get(user_id, time.time())
+
+    def update(self, user_id: int, **fields) -> Session:
+        """
+        Меняет поля сессии (mode, vacancy_id) и сохраняет её
+        """
+        with self._lock:
+            session = self._get(user_id, time.time())
+            for name, value in fields.items():
+                if name not in ("mode", "vacancy_id"):
+                    raise AttributeError(f"У сессии нет поля {name!r}")
+                setattr(session, name, value)
+            self._save(session)
+            return session
+
+    def share(self, path: str):
+        """
+        Режим нескольких процессов (воркеры webhook_server.py): сессии только в SQLite
+        (path, если файл ещё не задан), каждое чтение идёт в файл, чтобы изменение
+        в одном воркере сразу видели остальные
+        """
+        with self._lock:
+            self.path = self.path or path
+            self.shared = True
+            self._sessions.clear()
+
+    def __len__(self):
+        """
+        Число сессий в памяти; в режиме share() — живых сессий в SQLite
+        """
+        with self._lock:
+            if not self.shared:
+                return len(self._sessions)
+            conn = self._connection()
+            return conn.execute("SELECT COUNT(*) FROM sessions WHERE updated > ?",
+                                (time.time() - self.ttl,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
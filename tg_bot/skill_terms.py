@@ -0,0 +1,90 @@
+# ==========================================
+# File: skill_terms.py
+# Description: dictionary-driven skill term matcher
+# ==========================================
+import hashlib
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+DEFAULT_SKILL_TERMS = Path(__file__).with_name("skill_terms.txt")
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Регулярное выражение из префиксного дерева: общие префиксы терминов
+    проверяются один раз, поэтому время поиска почти не зависит от размера словаря
+    """
+    terminal = "" in node
+    branches = [re.escape(ch) + _trie_pattern(child)
+                for ch, child in sorted(node.items()) if ch != ""]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    # жадный '?' сначала пробует более длинный термин, затем откатывается к короткому
+    return pattern + "?" if terminal else pattern
+
+
+class SkillTermMatcher:
+    """
+    Поиск терминов словаря за один проход по тексту
+    """
+
+    def __init__(self, groups: List[List[str]]):
+        self.group_of = {}
+        for group_idx, terms in enumerate(groups):
+            for term in terms:
+                self.group_of.setdefault(term.lower(), group_idx)
+
+        trie = {}
+        for term in self.group_of:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        self.pattern = re.compile(r"\b(" + _trie_pattern(trie) + r")\b") if trie else None
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_SKILL_TERMS) -> "SkillTermMatcher":
+        """
+        Загрузка словаря: строка — термин, строка с '#' начинает новую группу
+        """
+        groups = [[]]
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#"):
+                    if groups[-1]:
+                        groups.append([])
+                elif line:
+                    groups[-1].append(line)
+        return cls([g for g in groups if g])
+
+    def __len__(self):
+        return len(self.group_of)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Хэш словаря: по нему проверяется, что сохранённые наборы терминов ещё актуальны
+        """
+        payload = "\n".join(f"{group}\t{term}" for term, group in sorted(self.group_of.items()))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def find(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Уникальные термины с позицией первого вхождения,
+        упорядоченные по группе словаря и затем по позиции
+        """
+        if self.pattern is None:
+            return []
+        first_seen = {}
+        for match in self.pattern.finditer(text.lower()):
+            first_seen.setdefault(match.group(1), match.start())
+        return sorted(first_seen.items(), key=lambda item: (self.group_of[item[0]], item[1]))
+
+    def terms(self, text: str) -> List[str]:
+        return [term for term, _ in self.find(text)]
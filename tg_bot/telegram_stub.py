@@ -0,0 +1,266 @@
+# ==========================================
+# File: telegram_stub.py
+# Description: local stand-in for the Telegram Bot API to test and load the bot without Telegram
+# ==========================================
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+
+class TelegramStub:
+    """
+    Минимальный Bot API: getMe, getUpdates (long polling), setWebhook, sendMessage, getFile
+    и раздача файлов. Входящие сообщения и файлы подкладываются через /stub/*,
+    отправленные ботом сообщения можно забрать через /stub/sent.
+    С webhook обновления не копятся для getUpdates, а отправляются POST-запросом на его адрес
+    """
+
+    def __init__(self, webhook: Optional[str] = None, webhook_secret: str = ""):
+        self.updates: List[Dict] = []
+        self.sent: List[Dict] = []
+        self.files: Dict[str, bytes] = {}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._listeners = []
+        self.webhook = webhook
+        self.webhook_secret = webhook_secret
+        self._session: Optional[aiohttp.ClientSession] = None
+        # сильные ссылки на задачи доставки
+        self._deliveries = set()
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/stub/updates", self.handle_push_update)
+        app.router.add_post("/stub/files/{file_id}", self.handle_push_file)
+        app.router.add_get("/stub/sent", self.handle_sent)
+        app.router.add_route("*", "/file/bot{token}/{file_path:.+}", self.handle_download)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        return app
+
+    # --- входящие сообщения ---
+
+    def push_message(self, user_id: int, text: Optional[str] = None,
+                     document: Optional[Dict] = None) -> int:
+        message_id = next(self._message_ids)
+        message = {
+            "message_id": message_id,
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "chat": {"id": user_id, "type": "private"},
+            "date": int(time.time()),
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if document is not None:
+            message["document"] = document
+        update = {"update_id": next(self._update_ids), "message": message}
+        if self.webhook:
+            task = asyncio.ensure_future(self._deliver(update))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+        else:
+            self.updates.append(update)
+            self._new_update.set()
+        return message_id
+
+    async def _deliver(self, update: Dict):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        try:
+            async with self._session.post(self.webhook, json=update, headers=headers) as response:
+                if response.status != 200:
+                    print(f"Webhook ответил {response.status} на обновление {update['update_id']}")
+        except aiohttp.ClientError as e:
+            print(f"Webhook недоступен: {e}")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def push_file(self, file_id: str, content: bytes):
+        self.files[file_id] = content
+
+    def on_sent(self, listener):
+        self._listeners.append(listener)
+
+    # --- служебные эндпоинты ---
+
+    async def handle_push_update(self, request):
+        data = await request.json()
+        message_id = self.push_message(int(data["user_id"]), data.get("text"), data.get("document"))
+        return web.json_response({"message_id": message_id})
+
+    async def handle_push_file(self, request):
+        self.push_file(request.match_info["file_id"], await request.read())
+        return web.json_response({"ok": True})
+
+    async def handle_sent(self, request):
+        return web.json_response(self.sent)
+
+    async def handle_download(self, request):
+        content = self.files.get(request.match_info["file_path"])
+        if content is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=content)
+
+    # --- Bot API ---
+
+    async def handle_method(self, request):
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            elif request.content_type == "application/x-www-form-urlencoded":
+                # AsyncTeleBot шлёт getFile методом GET с телом формы, request.post() его не читает
+                params.update(parse_qsl(await request.text()))
+            else:
+                params.update(await request.post())
+        method = request.match_info["method"]
+        handler = getattr(self, "api_" + method.lower(), None)
+        result = await handler(params) if handler is not None else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def api_getme(self, params):
+        return {"id": 1, "is_bot": True, "first_name": "stub", "username": "stub_bot"}
+
+    async def api_getupdates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        # подтверждённые обновления удаляем, как настоящий API
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self.updates[:limit]
+
+    async def api_setwebhook(self, params):
+        self.webhook = params.get("url") or None
+        self.webhook_secret = params.get("secret_token", "")
+        return True
+
+    async def api_deletewebhook(self, params):
+        self.webhook = None
+        return True
+
+    async def api_sendmessage(self, params):
+        chat_id = int(params["chat_id"])
+        reply_to = params.get("reply_to_message_id")
+        if params.get("reply_parameters"):
+            reply_to = json.loads(params["reply_parameters"]).get("message_id")
+        sent = {
+            "chat_id": chat_id,
+            "text": params.get("text", ""),
+            "reply_to_message_id": int(reply_to) if reply_to else None,
+            "time": time.perf_counter(),
+        }
+        self.sent.append(sent)
+        for listener in self._listeners:
+            listener(sent)
+        return {
+            "message_id": next(self._message_ids),
+            "from": {"id": 1, "is_bot": True, "first_name": "stub"},
+            "chat": {"id": chat_id, "type": "private"},
+            "date": int(time.time()),
+            "text": sent["text"],
+        }
+
+    async def api_getfile(self, params):
+        file_id = params["file_id"]
+        return {"file_id": file_id, "file_unique_id": file_id,
+                "file_size": len(self.files.get(file_id, b"")), "file_path": file_id}
+
+
+async def run_load(stub: TelegramStub, users: int, messages: int, text: str, docx: Optional[bytes]):
+    """
+    users пользователей одновременно отправляют по messages резюме, каждый следующее —
+    после ответа на предыдущее. Латентность — от отправки до первого ответа бота
+    на это сообщение (для текста это список вакансий, для файла — "Получил файл")
+    """
+    waiting: Dict[int, asyncio.Future] = {}
+
+    def listener(sent):
+        future = waiting.pop(sent["reply_to_message_id"], None)
+        if future is not None and not future.done():
+            future.set_result(sent["time"])
+
+    stub.on_sent(listener)
+    if docx is not None:
+        stub.push_file("resume.docx", docx)
+    loop = asyncio.get_running_loop()
+
+    async def user(user_id):
+        latencies = []
+        for _ in range(messages):
+            start = time.perf_counter()
+            if docx is not None:
+                message_id = stub.push_message(user_id, document={
+                    "file_id": "resume.docx", "file_unique_id": "resume.docx", "file_name": "resume.docx"})
+            else:
+                message_id = stub.push_message(user_id, text)
+            future = waiting[message_id] = loop.create_future()
+            latencies.append(await asyncio.wait_for(future, 120) - start)
+        return latencies
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(user(1000 + i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    latencies = np.array([x for r in results for x in r]) * 1000
+    report = {
+        "users": users,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        "max_ms": round(float(latencies.max()), 1),
+    }
+    print(json.dumps(report, ensure_ascii=False))
+    return report
+
+
+async def main(args):
+    stub = TelegramStub(args.webhook, args.webhook_secret)
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Bot API stub: http://{args.host}:{args.port}")
+    try:
+        if args.users:
+            docx = open(args.docx, "rb").read() if args.docx else None
+            for users in args.users:
+                await run_load(stub, users, args.messages, args.text, docx)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await stub.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--users", type=int, nargs="*",
+                        help="load mode: concurrent users per step, e.g. --users 1 10 50")
+    parser.add_argument("--messages", type=int, default=5, help="resumes per user")
+    parser.add_argument("--text", default="Python developer: Django, PostgreSQL, Docker, REST API, 5 years",
+                        help="resume text sent in load mode")
+    parser.add_argument("--docx", help="send this .docx instead of text in load mode")
+    parser.add_argument("--webhook", help="POST updates to this URL instead of serving getUpdates, "
+                                          "e.g. http://127.0.0.1:8443/webhook")
+    parser.add_argument("--webhook-secret", default="", help="X-Telegram-Bot-Api-Secret-Token for --webhook")
+    asyncio.run(main(parser.parse_args()))
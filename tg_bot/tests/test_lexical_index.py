@@ -0,0 +1,83 @@
+# ==========================================
+# File: test_lexical_index.py
+# Description: incremental updates of the BM25 index match a full rebuild
+# ==========================================
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexical_index import LexicalIndex
+
+VOCABULARY = ["python", "java", "sql", "docker", "aws", "react", "go", "kafka", "spark", "linux"]
+
+
+def _random_documents(rng, count):
+    return {f"doc{i}": [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 8))] for i in range(count)}
+
+
+def test_removed_slot_is_reused():
+    index = LexicalIndex.from_documents({"a": ["python"], "b": ["java"], "c": ["sql"]})
+    slot = index._slots["b"]
+    assert index.remove("b")
+    assert not index.remove("b")
+    index.add("d", ["go"])
+
+    assert index._slots["d"] == slot
+    assert "b" not in index and len(index) == 3
+    assert index.search(["java"], 5)[0] == []
+    assert index.search(["go"], 5)[0] == ["d"]
+
+
+def test_replaced_document_is_rescored():
+    index = LexicalIndex.from_documents({"a": ["python", "sql"], "b": ["java"]})
+    index.add("a", ["java", "java", "docker"])
+
+    assert index.search(["python"], 5)[0] == []
+    keys, scores = index.search(["java"], 5)
+    rebuilt = LexicalIndex.from_documents({"a": ["java", "java", "docker"], "b": ["java"]})
+    expected_keys, expected_scores = rebuilt.search(["java"], 5)
+    assert keys == expected_keys
+    np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_incremental_updates_match_full_rebuild():
+    rng = random.Random(0)
+    documents = _random_documents(rng, 200)
+    index = LexicalIndex.from_documents(documents)
+
+    for step in range(300):
+        key = f"doc{rng.randrange(260)}"
+        if key in documents and rng.random() < 0.4:
+            index.remove(key)
+            del documents[key]
+        else:
+            terms = [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 8))]
+            index.add(key, terms)
+            documents[key] = terms
+
+    rebuilt = LexicalIndex.from_documents(documents)
+    assert len(index) == len(rebuilt) == len(documents)
+    for _ in range(30):
+        query = rng.sample(VOCABULARY, rng.randint(1, 3))
+        for n in (5, 50, len(documents)):
+            keys, scores = index.search(query, n)
+            expected_keys, expected_scores = rebuilt.search(query, n)
+            np.testing.assert_allclose(scores, expected_scores)
+            # слоты после удалений другие, поэтому порядок равных скоров может отличаться
+            full = dict(zip(*rebuilt.search(query, len(documents))))
+            for key, score in zip(keys, scores):
+                assert np.isclose(full[key], score)
+
+
+def test_ties_at_cutoff_prefer_smaller_slot():
+    # один термин: короткие документы получают один и тот же скор, длинные — меньший
+    documents = {i: ["python", "java"] if i % 3 else ["python", "java", "sql", "go"] for i in range(300)}
+    index = LexicalIndex.from_documents(documents)
+    keys, scores = index.search(["python"], 150)
+
+    assert keys == [i for i in range(300) if i % 3][:150]
+    assert np.all(scores == scores[0])
@@ -0,0 +1,102 @@
+# ==========================================
+# File: test_resume_dedup.py
+# Description: exact, near and missed lookups of resume groups, expiry, eviction and scoped results
+# ==========================================
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resume_dedup
+from resume_dedup import ResumeDedupIndex, collapse_duplicates
+
+TTL = 100
+RESUME = ("Python developer with eight years of experience building backend services in Django "
+          "and FastAPI, designing PostgreSQL schemas, tuning slow queries, running Kafka consumers, "
+          "deploying to Kubernetes with Helm, writing CI pipelines and mentoring junior engineers. "
+          "Led the migration of a monolith to services, cut p99 latency by half and introduced "
+          "contract tests between teams. Comfortable with Linux, Docker, Terraform and AWS.")
+OTHER = ("Graphic designer focused on brand identity, packaging and print layouts. Works in Figma, "
+         "Illustrator and InDesign, prepares files for offset printing and runs workshops for clients.")
+
+
+class _Scope:
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resume_dedup.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_exact_near_and_miss(clock):
+    index = ResumeDedupIndex(ttl=TTL)
+    key = index.group(RESUME)
+    assert (index.exact_hits, index.near_hits, index.misses) == (0, 0, 1)
+
+    # регистр и пробелы не меняют хэш
+    assert index.group("  " + RESUME.upper().replace(" ", "\n ")) == key
+    assert (index.exact_hits, index.near_hits, index.misses) == (1, 0, 1)
+
+    assert index.group(RESUME.replace("mentoring junior engineers", "mentoring engineers")) == key
+    assert (index.exact_hits, index.near_hits, index.misses) == (1, 1, 1)
+
+    assert index.group(OTHER) != key
+    assert (index.exact_hits, index.near_hits, index.misses) == (1, 1, 2)
+    assert len(index) == 2
+
+
+def test_group_expires_after_ttl(clock):
+    index = ResumeDedupIndex(ttl=TTL)
+    key = index.group(RESUME)
+    clock[0] += TTL - 1
+    # срок считается с первого появления, повторы его не продлевают
+    assert index.group(RESUME) == key
+    clock[0] += 1
+    assert index.group(RESUME) != key
+    assert len(index) == 1
+    assert index.misses == 2
+
+
+def test_least_recently_used_group_is_evicted(clock):
+    index = ResumeDedupIndex(ttl=TTL, max_items=2)
+    first = index.group(RESUME)
+    second = index.group(OTHER)
+    assert index.group(RESUME) == first
+    index.group("Accountant: payroll, tax reports, 1C, reconciliation of supplier invoices")
+
+    assert len(index) == 2
+    assert index.group(RESUME) == first
+    assert index.group(OTHER) != second
+
+
+def test_cached_result_is_bound_to_scope(clock):
+    index = ResumeDedupIndex(ttl=TTL)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    snapshot = _Scope()
+    assert index.cached(RESUME, "ranks", compute, scope=snapshot) == 1
+    assert index.cached(RESUME.lower(), "ranks", compute, scope=snapshot) == 1
+    assert index.cached(RESUME, "skills", compute) == 2
+    assert index.cached(RESUME, "skills", compute) == 2
+
+    # новый снимок каталога: результат считается заново, без scope — остаётся
+    snapshot = _Scope()
+    assert index.cached(RESUME, "ranks", compute, scope=snapshot) == 3
+    assert index.cached(RESUME, "ranks", compute, scope=snapshot) == 3
+    assert index.cached(RESUME, "skills", compute) == 2
+    assert index.cached(RESUME, "ranks", compute) == 4
+    assert len(calls) == 4
+
+
+def test_collapse_duplicates_maps_to_first_of_group():
+    texts = {1: RESUME, 2: OTHER, 3: RESUME.upper(), 4: RESUME.replace("Terraform and AWS", "Terraform, AWS")}
+    assert collapse_duplicates(texts) == {1: 1, 2: 2, 3: 1, 4: 1}
@@ -0,0 +1,40 @@
+# ==========================================
+# File: test_score_weights.py
+# Description: tuned score weights are applied only under the settings they were tuned with
+# ==========================================
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cv_matcher import DEFAULT_WEIGHTS, SCORE_COMPONENTS, load_score_weights
+
+SETTINGS = {"model": "nomic-ai/nomic-embed-text-v1.5", "dim": 0, "storage": "float32", "skill_terms": "abc"}
+DEFAULTS = [DEFAULT_WEIGHTS[name] for name in SCORE_COMPONENTS]
+
+
+def _write(tmp_path, **config):
+    path = tmp_path / "score_weights.json"
+    path.write_text(json.dumps({"weights": {"cosine": 0.9, "skill_overlap": 0.1, "length_match": 0.0},
+                                **SETTINGS, **config}), encoding="utf-8")
+    return str(path)
+
+
+def test_weights_loaded_for_same_settings(tmp_path):
+    np.testing.assert_allclose(load_score_weights(_write(tmp_path), SETTINGS), [0.9, 0.1, 0.0])
+
+
+def test_other_settings_fall_back_to_defaults(tmp_path):
+    for key, value in (("model", "nomic-ai/nomic-embed-text-v1.5@onnx-int8"), ("dim", 128),
+                       ("storage", "int8"), ("skill_terms", "other")):
+        np.testing.assert_allclose(load_score_weights(_write(tmp_path, **{key: value}), SETTINGS), DEFAULTS)
+
+
+def test_missing_or_broken_file_falls_back_to_defaults(tmp_path):
+    np.testing.assert_allclose(load_score_weights(str(tmp_path / "missing.json"), SETTINGS), DEFAULTS)
+    path = tmp_path / "broken.json"
+    path.write_text('{"weights": {"cosine": -1}}', encoding="utf-8")
+    np.testing.assert_allclose(load_score_weights(str(path), SETTINGS), DEFAULTS)
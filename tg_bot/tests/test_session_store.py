@@ -0,0 +1,73 @@
+# ==========================================
+# File: test_session_store.py
+# Description: session expiry is measured from the last activity, not from the last update
+# ==========================================
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_store
+from session_store import SessionStore
+
+TTL = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_read_extends_stored_session(tmp_path, clock, shared):
+    path = str(tmp_path / "sessions.sqlite")
+    store = SessionStore("default", ttl=TTL, path=path)
+    if shared:
+        store.share(path)
+    store.update(42, mode="match", vacancy_id=7)
+
+    # только чтения, без смены режима: после половины срока и после исходного дедлайна
+    clock[0] += TTL * 0.6
+    store.get(42)
+    store.close()
+    clock[0] += TTL * 0.6
+
+    # новый процесс (перезапуск или другой воркер) видит сессию живой
+    restarted = SessionStore("default", ttl=TTL, path=path)
+    if shared:
+        restarted.share(path)
+    session = restarted.get(42)
+    assert (session.mode, session.vacancy_id) == ("match", 7)
+    restarted.close()
+
+
+def test_session_expires_without_activity(tmp_path, clock):
+    path = str(tmp_path / "sessions.sqlite")
+    store = SessionStore("default", ttl=TTL, path=path)
+    store.update(42, mode="match")
+    store.close()
+    clock[0] += TTL + 1
+
+    restarted = SessionStore("default", ttl=TTL, path=path)
+    assert restarted.get(42).mode == "default"
+    restarted.close()
+
+
+def test_shared_mode_counts_sessions_in_sqlite(tmp_path, clock):
+    path = str(tmp_path / "sessions.sqlite")
+    store = SessionStore("default", ttl=TTL, path=path)
+    store.share(path)
+    store.update(1, mode="match")
+    store.update(2, mode="match")
+    assert len(store) == 2
+
+    clock[0] += TTL + 1
+    store.update(3, mode="match")
+    assert len(store) == 1
+    assert store.get(1).mode == "default"
+    assert store.expired == 1
+    store.close()
@@ -0,0 +1,89 @@
+# ==========================================
+# File: test_skill_terms.py
+# Description: the dictionary matcher returns exactly what the old ten-regex extract_key_terms returned
+# ==========================================
+import csv
+import os
+import random
+import re
+import sys
+
+import pytest
+
+TG_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TG_BOT)
+
+from skill_terms import SkillTermMatcher
+
+# extract_key_terms до словаря skill_terms.txt
+OLD_PATTERNS = [
+    r'\b(python|java|c\+\+|c#|javascript|typescript|php|ruby|go|rust|kotlin)\b',
+    r'\b(sql|mysql|postgresql|oracle|mongodb|elasticsearch|redis)\b',
+    r'\b(react|angular|vue|django|flask|spring|asp\.net|express)\b',
+    r'\b(aws|azure|gcp|kubernetes|docker|jenkins|gitlab)\b',
+    r'\b(git|svn|tfs|mercurial)\b',
+    r'\b(agile|scrum|kanban|devops|ci/cd)\b',
+    r'\b(rest|api|graphql|soap|microservices)\b',
+    r'\b(linux|unix|windows|macos)\b',
+    r'\b(html|css|xml|json|yaml)\b',
+    r'\b(testing|unit test|integration test|qa|qc)\b',
+]
+
+
+def old_extract_key_terms(text):
+    terms = []
+    text_lower = text.lower()
+    for pattern in OLD_PATTERNS:
+        for match in re.finditer(pattern, text_lower):
+            term = match.group(1)
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SkillTermMatcher.from_file()
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Python, Java and JavaScript; TypeScript.",
+    "javascript java javascript",
+    "C++ developer, C#, c++11, C#.NET, c# and c++",
+    "(c++) [c#] c++/c# x++ c+ #c",
+    "Git and GitLab; gitlab git; github",
+    "MySQL vs SQL vs PostgreSQL; nosql; sql-server",
+    "ASP.NET Core, asp net, .net, express.js, expressjs",
+    "CI/CD pipelines, ci / cd, ci-cd",
+    "unit test, unit tests, unit testing, integration test, integration testing, QA/QC",
+    "REST API, RESTful APIs, api-first, rest.",
+    "GO go Go golang ago goal",
+    "Docker\nKubernetes\tAWS\r\nAzure GCP",
+    "Ruby on Rails, ruby-on-rails, rubyist",
+    "html5 css3 HTML/CSS json yaml xml",
+    "Разработчик Python (Django/Flask), опыт с SQL и Docker",
+    "pythonic javaee redisson vue.js react-native",
+])
+def test_same_terms_as_old_regexes(matcher, text):
+    assert matcher.terms(text) == old_extract_key_terms(text)
+
+
+def test_random_texts(matcher):
+    rng = random.Random(0)
+    words = [term for group in OLD_PATTERNS for term in re.findall(r'\((.*)\)', group)[0].replace('\\', '').split('|')]
+    words += ["net", "test", "tests", "script", "lab", "my", "post", "gres", "the", "и", "123", "x"]
+    separators = [" ", ", ", ".", "/", "-", "+", "#", "(", ")", "\n", "", "_"]
+    for _ in range(3000):
+        parts = []
+        for _ in range(rng.randint(1, 15)):
+            word = rng.choice(words)
+            parts.append((word.upper() if rng.random() < 0.2 else word) + rng.choice(separators))
+        text = "".join(parts)
+        assert matcher.terms(text) == old_extract_key_terms(text), text
+
+
+def test_vacancy_descriptions(matcher):
+    with open(os.path.join(TG_BOT, "5_vacancies.csv"), encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            assert matcher.terms(row["job_description"]) == old_extract_key_terms(row["job_description"])
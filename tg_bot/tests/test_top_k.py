@@ -0,0 +1,46 @@
+# ==========================================
+# File: test_top_k.py
+# Description: top-k of rank_vacancies keeps the stable-sort order of rank_vacancies_for_resume on ties
+# ==========================================
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cv_matcher import VacancyFeatures, VacancyResumeMatcher
+
+
+def _features(n):
+    vacancy_ids = list(range(100, 100 + n))
+    return VacancyFeatures(vacancy_ids, np.eye(n, 4, dtype=np.float32), [set() for _ in vacancy_ids], [10] * n)
+
+
+def _stable_top(scores, positions, features, top_k):
+    # как rank_vacancies_for_resume: устойчивая сортировка по убыванию в порядке загрузки
+    ranked = sorted(zip(positions.tolist(), scores.tolist()), key=lambda item: item[0])
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return [(int(features.vacancy_ids[p]), s) for p, s in ranked[:top_k]]
+
+
+def test_ties_at_cutoff_follow_load_order():
+    n = 300
+    features = _features(n)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        # позиции в порядке векторного индекса (не по возрастанию), много равных скоров
+        positions = rng.permutation(n)
+        scores = rng.choice([0.2, 0.5, 0.8], size=n)
+        for top_k in (1, 3, 50, 299):
+            assert VacancyResumeMatcher._top_k(scores, positions, features, top_k) == \
+                _stable_top(scores, positions, features, top_k)
+
+
+def test_all_vacancies_without_top_k():
+    features = _features(5)
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.5])
+    positions = np.arange(5)
+    assert VacancyResumeMatcher._top_k(scores, positions, features, None) == \
+        _stable_top(scores, positions, features, 5)
+    assert VacancyResumeMatcher._top_k(scores, positions, features, 0) == []
@@ -0,0 +1,132 @@
+# ==========================================
+# File: test_vacancy_columns.py
+# Description: the .vcol columnar file returns the same vacancies and batches as streaming the CSV
+# ==========================================
+import csv
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vacancy_columns import VacancyColumns, columns_path_for, convert_csv, open_columns, read_csv_batches
+
+ROWS = [
+    {"id": 8, "job_description": "Python, SQL, Docker", "job_title": "Backend", "uid": "a1", "extra": "x"},
+    {"id": 37, "job_description": "Разработчик Python — опыт от 3 лет", "job_title": "Программист", "uid": "б2",
+     "extra": ""},
+    {"id": 90, "job_description": "", "job_title": "", "uid": "", "extra": "y"},
+    {"id": -5, "job_description": "多字节 текст 🚀 emoji\nи перевод строки, \"кавычки\"", "job_title": "Ünïcödé",
+     "uid": "c3", "extra": "z"},
+    {"id": 207, "job_description": "a" * 70000, "job_title": "Long", "uid": "d4", "extra": ""},
+]
+
+
+def _write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "job_description", "job_title", "uid", "extra"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _expected(rows):
+    return {"id": [r["id"] for r in rows], "job_title": [r["job_title"] for r in rows],
+            "job_description": [r["job_description"] for r in rows], "uid": [r["uid"] for r in rows]}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "vacancies.csv")
+    _write_csv(path, ROWS)
+    return path
+
+
+def test_round_trip(csv_path, tmp_path):
+    out = str(tmp_path / "vacancies.vcol")
+    assert convert_csv(csv_path, out) == len(ROWS)
+    columns = VacancyColumns(out)
+    try:
+        assert len(columns) == len(ROWS)
+        assert columns.matches(csv_path)
+        expected = _expected(ROWS)
+        np.testing.assert_array_equal(columns.values("id"), expected["id"])
+        for name in ("job_title", "job_description", "uid"):
+            assert columns.texts(name) == expected[name]
+        assert columns.texts("job_description", 1, 3) == expected["job_description"][1:3]
+        assert columns.texts("uid", 4, 100) == expected["uid"][4:]
+        assert columns.texts("uid", 3, 3) == []
+    finally:
+        columns.close()
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 5, 7])
+def test_batches_equal_read_csv_batches(csv_path, tmp_path, batch_size):
+    out = str(tmp_path / "vacancies.vcol")
+    # батчи при записи и при чтении разного размера
+    convert_csv(csv_path, out, batch_size=2)
+    columns = VacancyColumns(out)
+    try:
+        assert list(columns.iter_batches(batch_size=batch_size)) == list(read_csv_batches(csv_path, batch_size=batch_size))
+    finally:
+        columns.close()
+
+
+def test_header_only_csv(tmp_path):
+    path = str(tmp_path / "empty.csv")
+    _write_csv(path, [])
+    out = str(tmp_path / "empty.vcol")
+    assert convert_csv(path, out) == 0
+    columns = VacancyColumns(out)
+    try:
+        assert len(columns) == 0
+        assert list(columns.iter_batches()) == []
+        assert columns.texts("uid") == []
+    finally:
+        columns.close()
+
+
+def test_rebuilt_when_csv_changes(csv_path):
+    first = open_columns(csv_path)
+    assert first.texts("uid") == _expected(ROWS)["uid"]
+    first.close()
+
+    changed = ROWS[:2] + [dict(ROWS[2], job_title="Новая", uid="e5")]
+    _write_csv(csv_path, changed)
+    stale = VacancyColumns(columns_path_for(csv_path))
+    assert not stale.matches(csv_path)
+    stale.close()
+
+    rebuilt = open_columns(csv_path)
+    try:
+        assert rebuilt.matches(csv_path)
+        assert rebuilt.texts("job_title") == _expected(changed)["job_title"]
+        np.testing.assert_array_equal(rebuilt.values("id"), _expected(changed)["id"])
+    finally:
+        rebuilt.close()
+
+
+def test_rebuilt_when_only_mtime_changes(csv_path):
+    open_columns(csv_path).close()
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    stale = VacancyColumns(columns_path_for(csv_path))
+    assert not stale.matches(csv_path)
+    stale.close()
+
+
+def test_short_row_reports_line(tmp_path):
+    path = str(tmp_path / "broken.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("id,job_description,job_title,uid\n1,text,title,u1\n2,text\n")
+    with pytest.raises(ValueError, match="строка 3"):
+        list(read_csv_batches(path))
+
+
+def test_missing_column(tmp_path):
+    path = str(tmp_path / "no_uid.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("id,job_description,job_title\n1,text,title\n")
+    with pytest.raises(ValueError, match="uid"):
+        list(read_csv_batches(path))
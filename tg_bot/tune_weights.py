@@ -0,0 +1,206 @@
+# ==========================================
+# File: tune_weights.py
+# Description: offline search of the combined score weights against HR annotations
+# ==========================================
+import argparse
+import ast
+import datetime
+import json
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sklearn.model_selection import KFold
+
+from cv_matcher import DEFAULT_SCORE_WEIGHTS, SCORE_COMPONENTS, VacancyFeatures, VacancyResumeMatcher
+
+# сколько скоров (веса x резюме x вакансии) считать за один шаг перебора
+CHUNK_SCORES = 1 << 22
+
+
+def load_ground_truth(path: str, vacancy_ids: List[int], annotator: int = 1) -> Dict[int, List[int]]:
+    """
+    Аннотации HR: строка i — резюме i+1, числа — позиции вакансий в CSV (1-5)
+    от наиболее к наименее подходящей. Повторы позиций (ошибки разметки) отбрасываются
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    rankings = ast.literal_eval(text.split(f"ANNOTATOR_{annotator}_RANKINGS")[1].split("\n")[0])
+
+    ground_truth = {}
+    for cv_id, positions in enumerate(rankings, start=1):
+        positions = list(dict.fromkeys(positions))
+        real_ids = [vacancy_ids[pos - 1] for pos in positions if 1 <= pos <= len(vacancy_ids)]
+        if real_ids:
+            ground_truth[cv_id] = real_ids
+    return ground_truth
+
+
+def component_matrices(matcher: VacancyResumeMatcher, resumes: Dict[int, str],
+                       vacancies: Dict[int, Dict]) -> Tuple[np.ndarray, VacancyFeatures, np.ndarray]:
+    """
+    Слагаемые скора для всех пар один раз: матрица 3 x резюме x вакансии
+    (порядок SCORE_COMPONENTS), а также признаки вакансий и эмбеддинги резюме
+    для проверки через rank_vacancies
+    """
+    vacancy_texts = [vacancy['description'] for vacancy in vacancies.values()]
+    features = matcher.precompute_vacancy_features(vacancies, matcher.encode_texts(vacancy_texts))
+    cv_ids = list(resumes)
+    resume_embeddings = matcher.encode_texts([resumes[cv_id] for cv_id in cv_ids])
+    components = np.stack([matcher.score_components(resumes[cv_id], embedding, features)
+                           for cv_id, embedding in zip(cv_ids, resume_embeddings)], axis=1)
+    return components, features, resume_embeddings
+
+
+def relevance_matrix(ground_truth: Dict[int, List[int]], cv_ids: List[int], vacancy_ids: List[int],
+                     k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Релевантность и IDCG как в calculate_ndcg: вакансия на позиции p ground truth
+    весит 1/(p+1), вакансий вне ground truth — 0
+    """
+    column = {vacancy_id: col for col, vacancy_id in enumerate(vacancy_ids)}
+    relevance = np.zeros((len(cv_ids), len(vacancy_ids)))
+    idcg = np.zeros(len(cv_ids))
+    for row, cv_id in enumerate(cv_ids):
+        ranking = ground_truth[cv_id]
+        for position, vacancy_id in enumerate(ranking):
+            if vacancy_id in column:
+                relevance[row, column[vacancy_id]] = 1.0 / (position + 1)
+        ideal = np.arange(min(k, len(ranking)))
+        idcg[row] = np.sum(1.0 / (ideal + 1) / np.log2(ideal + 2))
+    return relevance, idcg
+
+
+def mean_ndcg(weights: np.ndarray, components: np.ndarray, relevance: np.ndarray,
+              idcg: np.ndarray, k: int = 5) -> np.ndarray:
+    """
+    Средний по резюме NDCG@k для каждой строки weights сразу. Порядок вакансий — как у
+    rank_vacancies: по убыванию скора, при равенстве — по порядку загрузки
+    """
+    n_cv, n_vacancies = relevance.shape
+    k = min(k, n_vacancies)
+    discounts = 1.0 / np.log2(np.arange(k) + 2)
+    chunk = max(1, CHUNK_SCORES // (n_cv * n_vacancies))
+
+    result = np.empty(len(weights))
+    for start in range(0, len(weights), chunk):
+        scores = np.einsum('wc,crv->wrv', weights[start:start + chunk], components)
+        top = np.argsort(-scores, axis=2, kind='stable')[..., :k]
+        gains = np.take_along_axis(np.broadcast_to(relevance, scores.shape), top, axis=2)
+        ndcg = np.divide(gains @ discounts, idcg, out=np.zeros(scores.shape[:2]), where=idcg > 0)
+        result[start:start + chunk] = ndcg.mean(axis=1)
+    return result
+
+
+def candidate_weights(step: float, n_random: int, seed: int = 42) -> np.ndarray:
+    """
+    Сетка на симплексе (веса >= 0, сумма 1) с шагом step и n_random случайных точек.
+    Ранжирование не меняется при умножении весов на число, так что симплекса достаточно
+    """
+    n = int(round(1 / step))
+    grid = [(i, j, n - i - j) for i in range(n + 1) for j in range(n + 1 - i)]
+    grid = np.array(grid, dtype=np.float64) / n
+    random = np.random.default_rng(seed).dirichlet(np.ones(len(SCORE_COMPONENTS)), n_random)
+    return np.concatenate([grid, random])
+
+
+def tune(ndcg: np.ndarray, weights: np.ndarray, current: np.ndarray) -> int:
+    """
+    Индекс лучших весов. NDCG кусочно-постоянен, и максимум обычно дают целые области
+    весов: из них выбираются ближайшие к текущим, чтобы не менять скор без выигрыша
+    """
+    best = np.flatnonzero(ndcg >= ndcg.max() - 1e-12)
+    distance = np.abs(weights[best] - current / current.sum()).sum(axis=1)
+    return int(best[np.argmin(distance)])
+
+
+def cross_validate(weights: np.ndarray, components: np.ndarray, relevance: np.ndarray, idcg: np.ndarray,
+                   current: np.ndarray, k: int = 5, folds: int = 5, seed: int = 42) -> Tuple[float, float]:
+    """
+    K-fold по резюме: веса подбираются на обучающих резюме и оцениваются на отложенных.
+    Возвращает средний NDCG@k отложенных резюме для подобранных и для текущих весов
+    """
+    tuned, baseline = np.zeros(len(idcg)), np.zeros(len(idcg))
+    for train, test in KFold(n_splits=folds, shuffle=True, random_state=seed).split(idcg):
+        best = tune(mean_ndcg(weights, components[:, train], relevance[train], idcg[train], k), weights, current)
+        for out, w in ((tuned, weights[best]), (baseline, current)):
+            out[test] = mean_ndcg(w[None], components[:, test], relevance[test], idcg[test], k)[0]
+    # у фолдов разный размер: среднее по отложенным резюме, а не по фолдам
+    return float(tuned.mean()), float(baseline.mean())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the combined score weights on HR annotations")
+    parser.add_argument("--cv", default="./research_v2/data/CV")
+    parser.add_argument("--csv", default="./tg_bot/5_vacancies.csv")
+    parser.add_argument("--annotations", default="./research_v2/data/annotations-for-the-first-30-vacancies.txt")
+    parser.add_argument("--annotator", type=int, default=1, choices=(1, 2))
+    parser.add_argument("--step", type=float, default=0.01, help="grid step on the weight simplex")
+    parser.add_argument("--random", type=int, default=20000, help="random weight combinations on top of the grid")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--folds", type=int, default=5, help="k-fold check over resumes before writing weights")
+    parser.add_argument("--dim", type=int, default=0, help="as iconi_bot_embedding_dim")
+    parser.add_argument("--storage", default="float32", help="as iconi_bot_embedding_storage")
+    parser.add_argument("--force", action="store_true", help="write weights even if they lose on held-out resumes")
+    parser.add_argument("--out", default=str(DEFAULT_SCORE_WEIGHTS), help="weights file loaded by the matcher")
+    args = parser.parse_args()
+
+    matcher = VacancyResumeMatcher(dim=args.dim, storage=args.storage)
+    vacancies = matcher.load_vacancies(args.csv)
+    vacancy_ids = list(vacancies)
+    ground_truth = load_ground_truth(args.annotations, vacancy_ids, args.annotator)
+    all_resumes = matcher.load_resumes(args.cv)
+    resumes = {cv_id: all_resumes[cv_id] for cv_id in sorted(all_resumes) if cv_id in ground_truth}
+    cv_ids = list(resumes)
+    print(f"Размеченных резюме: {len(cv_ids)}")
+
+    start = time.perf_counter()
+    components, features, resume_embeddings = component_matrices(matcher, resumes, vacancies)
+    relevance, idcg = relevance_matrix(ground_truth, cv_ids, vacancy_ids, args.k)
+    print(f"Слагаемые скора: {len(cv_ids)} x {len(vacancy_ids)} за {time.perf_counter() - start:.1f} с")
+
+    start = time.perf_counter()
+    weights = candidate_weights(args.step, args.random, args.seed)
+    ndcg = mean_ndcg(weights, components, relevance, idcg, args.k)
+    current = matcher.weights
+    best = tune(ndcg, weights, current)
+    print(f"Перебор {len(weights)} вариантов весов за {time.perf_counter() - start:.2f} с")
+
+    current_ndcg = mean_ndcg(current[None], components, relevance, idcg, args.k)[0]
+    best_weights = weights[best]
+    print(f"Текущие веса {np.round(current, 3).tolist()}: NDCG@{args.k}={current_ndcg:.4f}")
+    print(f"Лучшие веса {np.round(best_weights, 3).tolist()}: NDCG@{args.k}={ndcg[best]:.4f}")
+
+    # проверка: те же веса через rank_vacancies и evaluate_on_ground_truth
+    matcher.weights = best_weights
+    predictions = {cv_id: matcher.rank_vacancies(resumes[cv_id], embedding, features)
+                   for cv_id, embedding in zip(cv_ids, resume_embeddings)}
+    check = matcher.evaluate_on_ground_truth(predictions, ground_truth, k=args.k)['avg_ndcg@5']
+    if abs(check - ndcg[best]) > 1e-9:
+        raise RuntimeError(f"NDCG перебора {ndcg[best]:.6f} не совпал с evaluate_on_ground_truth {check:.6f}")
+
+    # веса, выбранные по тем же 30 резюме, переоценены: решение о записи — по отложенным
+    cv_tuned, cv_current = cross_validate(weights, components, relevance, idcg, current,
+                                          args.k, args.folds, args.seed)
+    print(f"{args.folds}-fold, отложенные резюме: подобранные веса NDCG@{args.k}={cv_tuned:.4f}, "
+          f"текущие {cv_current:.4f}")
+    if cv_tuned <= cv_current and not args.force:
+        print(f"Подбор не улучшает NDCG на отложенных резюме, {args.out} не изменён (--force — записать)")
+        raise SystemExit(1)
+
+    config = {
+        'weights': {name: round(float(w), 6) for name, w in zip(SCORE_COMPONENTS, best_weights)},
+        f'ndcg@{args.k}': float(ndcg[best]),
+        f'previous_ndcg@{args.k}': float(current_ndcg),
+        f'cv_ndcg@{args.k}': cv_tuned,
+        f'cv_previous_ndcg@{args.k}': cv_current,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        **matcher.score_settings(),
+        'annotator': args.annotator,
+        'resumes': len(cv_ids),
+        'candidates': len(weights),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"Веса записаны в {args.out}")
@@ -0,0 +1,240 @@
+# ==========================================
+# File: vacancy_catalog.py
+# Description: hot-reloadable vacancy catalog with incremental re-embedding
+# ==========================================
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalog_artifact import open_artifact
+from cv_matcher import VacancyFeatures, VacancyResumeMatcher
+from extract_skills import extract_skills, model as skills_model
+from lexical_index import LexicalIndex
+from ranking import encode_phrases
+from vacancy_columns import BATCH_SIZE as ENCODE_BATCH
+from vector_store import EmbeddingMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogEntry:
+    """
+    Рассчитанные данные одной вакансии; переиспользуются, пока не изменилось описание.
+    Эмбеддинг — строка row общей матрицы vectors, а не отдельный массив.
+    skills — навыки KeyBERT и их эмбеддинги, считаются при первом запросе Show match
+    или берутся из артефакта каталога
+    """
+    __slots__ = ("digest", "vectors", "row", "terms", "word_count", "skills")
+
+    def __init__(self, digest: str, vectors: EmbeddingMatrix, row: int, terms: set, word_count: int,
+                 skills: Optional[Tuple[List[str], np.ndarray]] = None):
+        self.digest = digest
+        self.vectors = vectors
+        self.row = row
+        self.terms = terms
+        self.word_count = word_count
+        self.skills = skills
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога. Обработчик берёт снимок один раз в начале запроса
+    и работает с ним до конца, даже если в это время каталог перезагрузился
+    """
+
+    def __init__(self, vacancies: Dict[int, Dict], features: VacancyFeatures,
+                 entries: Dict[str, CatalogEntry]):
+        self.vacancies = vacancies
+        self.features = features
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.vacancies)
+
+    def vacancy_skills(self, vacancy_id: int) -> Optional[Tuple[List[str], np.ndarray]]:
+        """
+        Навыки вакансии и их нормированные эмбеддинги; None, если вакансии нет в снимке
+        """
+        vacancy = self.vacancies.get(vacancy_id)
+        if vacancy is None:
+            return None
+        entry = self.entries[vacancy['uid']]
+        if entry.skills is None:
+            skills = extract_skills(vacancy['description'])
+            index, embeddings = encode_phrases(skills)
+            entry.skills = (skills, embeddings[[index[p] for p in skills]])
+        return entry.skills
+
+
+class VacancyCatalog:
+    """
+    Каталог вакансий из CSV: при перезагрузке строки сравниваются по uid,
+    кодируются только новые и изменённые описания, удалённые вакансии выбрасываются,
+    а готовый снимок подменяется одним присваиванием.
+    При первой загрузке расчёты берутся из артефакта compile_catalog.py,
+    если он собран теми же моделями и словарём
+    """
+
+    def __init__(self, matcher: VacancyResumeMatcher, csv_path: str, index_kind: str = "auto",
+                 artifact_path: Optional[str] = None):
+        self.matcher = matcher
+        self.csv_path = csv_path
+        self.index_kind = index_kind
+        self.artifact_path = artifact_path
+        self.snapshot: Optional[CatalogSnapshot] = None
+        # BM25 по терминам вакансий с ключами uid: при перезагрузке меняются только новые,
+        # изменённые и удалённые вакансии. Запросы старого снимка видят уже обновлённый индекс,
+        # но скоры всё равно считаются по признакам своего снимка
+        self.lexical = LexicalIndex()
+        self._lexical_entries: Dict[str, CatalogEntry] = {}
+        self._reload_lock = threading.Lock()
+        self._mtime = None
+        self._pending_mtime = None
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def digest(vacancy: Dict) -> str:
+        return hashlib.sha1(vacancy['description'].encode("utf-8")).hexdigest()
+
+    def _artifact_entries(self) -> Dict[str, CatalogEntry]:
+        artifact = open_artifact(self.artifact_path)
+        if artifact is None:
+            return {}
+        expected = {
+            'model': self.matcher.model.cache_name,
+            'skills_model': skills_model.cache_name,
+            'skill_terms': self.matcher.skill_matcher.fingerprint,
+        }
+        stale = [key for key, value in expected.items() if artifact.meta.get(key) != value]
+        if stale:
+            print(f"Артефакт каталога {self.artifact_path} собран с другими настройками ({', '.join(stale)}), пропускаю")
+            return {}
+
+        # в артефакте полноразмерные float32; усечение и тип хранения — как у матчера
+        vectors = self.matcher.compact(self.matcher.truncate(artifact.embeddings))
+        entries = {}
+        for row, record in enumerate(artifact.vacancies):
+            entries[record['uid']] = CatalogEntry(record['digest'], vectors, row,
+                                                  set(record['terms']), int(artifact.word_counts[row]),
+                                                  artifact.skills(row))
+        print(f"Артефакт каталога {self.artifact_path}: {len(entries)} вакансий")
+        return entries
+
+    def reload(self) -> Dict[str, int]:
+        """
+        Перечитывает CSV и применяет изменения; возвращает число добавленных,
+        изменённых и удалённых вакансий
+        """
+        with self._reload_lock:
+            mtime = os.stat(self.csv_path).st_mtime_ns
+            vacancies = self.matcher.load_vacancies(self.csv_path)
+            old_entries = self.snapshot.entries if self.snapshot is not None else {}
+            # откуда брать готовые расчёты: прошлый снимок или, при старте, артефакт
+            reusable = old_entries if self.snapshot is not None else self._artifact_entries()
+
+            entries = {}
+            to_encode = []
+            added = changed = 0
+            for vacancy in vacancies.values():
+                uid = vacancy['uid']
+                digest = self.digest(vacancy)
+                old = old_entries.get(uid)
+                if old is None:
+                    added += 1
+                elif old.digest != digest:
+                    changed += 1
+                entry = reusable.get(uid)
+                if entry is not None and entry.digest == digest:
+                    entries[uid] = entry
+                else:
+                    to_encode.append((uid, digest, vacancy['description']))
+
+            # батчами: в памяти float32-векторы только одного батча, остальные уже сжаты
+            for start in range(0, len(to_encode), ENCODE_BATCH):
+                batch = to_encode[start:start + ENCODE_BATCH]
+                vectors = self.matcher.compact(self.matcher.encode_texts([text for _, _, text in batch]))
+                for row, (uid, digest, text) in enumerate(batch):
+                    entries[uid] = CatalogEntry(digest, vectors, row,
+                                                set(self.matcher.extract_key_terms(text)),
+                                                len(text.split()))
+            removed = sum(1 for uid in old_entries if uid not in entries)
+
+            for uid in [uid for uid in self._lexical_entries if uid not in entries]:
+                self.lexical.remove(uid)
+                del self._lexical_entries[uid]
+            for uid, entry in entries.items():
+                if self._lexical_entries.get(uid) is not entry:
+                    self.lexical.add(uid, entry.terms)
+                    self._lexical_entries[uid] = entry
+
+            vacancy_ids = list(vacancies.keys())
+            rows = [entries[vacancies[vid]['uid']] for vid in vacancy_ids]
+            vectors = EmbeddingMatrix.gather([(e.vectors, e.row) for e in rows], self.matcher.storage)
+            # записи ссылаются на новую матрицу, чтобы прежние (пакеты кодирования, артефакт) освобождались
+            for row, entry in enumerate(rows):
+                entry.vectors, entry.row = vectors, row
+            features = VacancyFeatures(
+                vacancy_ids,
+                vectors,
+                [e.terms for e in rows],
+                [e.word_count for e in rows],
+                lexical=self.lexical,
+                lexical_keys=[vacancies[vid]['uid'] for vid in vacancy_ids],
+            )
+            if rows:
+                self.matcher.build_vector_index(features, kind=self.index_kind)
+
+            # атомарная подмена: текущие запросы дорабатывают со старым снимком
+            self.snapshot = CatalogSnapshot(vacancies, features, entries)
+            self._mtime = mtime
+
+        stats = {'added': added, 'changed': changed, 'removed': removed}
+        print(f"Каталог вакансий перезагружен: {len(vacancy_ids)} вакансий, {stats}, "
+              f"заново закодировано {len(to_encode)}")
+        return stats
+
+    def reload_if_changed(self, settled: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Перезагрузка, если CSV изменился. При settled=True файл перечитывается
+        только когда его mtime не менялся с прошлой проверки, чтобы не поймать
+        недописанный файл
+        """
+        try:
+            mtime = os.stat(self.csv_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime:
+            return None
+        if settled and mtime != self._pending_mtime:
+            self._pending_mtime = mtime
+            return None
+        return self.reload()
+
+    def watch(self, interval: float = 60.0):
+        """
+        Фоновая проверка CSV раз в interval секунд
+        """
+        if self._watcher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_if_changed(settled=True)
+                except Exception as e:
+                    logger.error(f"Не удалось перезагрузить каталог: {e}")
+
+        self._watcher = threading.Thread(target=loop, name="vacancy-catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            # дожидаемся текущей перезагрузки: после stop() каталог можно копировать через fork
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,171 @@
+# ==========================================
+# File: vector_index.py
+# Description: exact and approximate vector indexes for vacancy retrieval
+# ==========================================
+import hashlib
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+
+from vector_store import EmbeddingMatrix
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu нужен только для больших каталогов
+    faiss = None
+
+# до этого размера каталога точный перебор быстрее и не теряет качество
+FLAT_INDEX_MAX_SIZE = 10000
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+
+
+def ids_fingerprint(ids) -> str:
+    """
+    Отпечаток списка id: позволяет проверить, что индекс с диска построен для того же каталога
+    """
+    return hashlib.sha1(np.asarray(ids, dtype=np.int64).tobytes()).hexdigest()
+
+
+class FlatIndex:
+    """
+    Точный поиск по скалярному произведению нормированных векторов.
+    EmbeddingMatrix признаков вакансий используется как есть, без копии
+    """
+    kind = "flat"
+
+    def __init__(self, embeddings):
+        if not isinstance(embeddings, EmbeddingMatrix):
+            embeddings = EmbeddingMatrix.from_vectors(embeddings)
+        self.embeddings = embeddings
+        self.storage = embeddings.storage
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает (скоры, позиции строк) k ближайших векторов по убыванию сходства
+        """
+        scores = self.embeddings.dot(_normalize(query))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.array([], dtype=np.float32), np.array([], dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scores[top], top
+
+    def save(self, path: str):
+        self.embeddings.save(path)
+
+    @classmethod
+    def load(cls, path: str, meta: dict) -> "FlatIndex":
+        return cls(EmbeddingMatrix.load(path, meta.get("storage", "float32")))
+
+
+class FaissIndex:
+    """
+    Приближённый поиск через FAISS: IVF (кластеризация) или HNSW (граф).
+    Для матриц float16/int8 векторы в индексе хранятся скалярным квантователем того же размера
+    """
+
+    def __init__(self, embeddings, kind: str = "hnsw",
+                 nlist: Optional[int] = None, nprobe: Optional[int] = None,
+                 hnsw_m: int = 32, ef_search: int = 128, storage: str = "float32"):
+        if faiss is None:
+            raise ImportError("Для индекса '%s' нужен пакет faiss-cpu" % kind)
+        self.kind = kind
+        self.storage = storage
+        self.index = None
+        if embeddings is None:
+            return
+
+        if isinstance(embeddings, EmbeddingMatrix):
+            self.storage = embeddings.storage
+            embeddings = embeddings.to_float32()
+        embeddings = _normalize(embeddings)
+        dim = embeddings.shape[1]
+        qtype = {"float16": faiss.ScalarQuantizer.QT_fp16,
+                 "int8": faiss.ScalarQuantizer.QT_8bit}.get(self.storage)
+        if kind == "ivf":
+            nlist = nlist or max(1, int(np.sqrt(len(embeddings))))
+            quantizer = faiss.IndexFlatIP(dim)
+            if qtype is None:
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            index.nprobe = nprobe or max(1, min(16, nlist // 4))
+        elif kind == "hnsw":
+            if qtype is None:
+                index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(dim, qtype, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                index.train(embeddings)
+            index.hnsw.efSearch = ef_search
+        else:
+            raise ValueError(f"Неизвестный тип индекса: {kind}")
+        index.add(embeddings)
+        self.index = index
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self))
+        scores, positions = self.index.search(_normalize(query).reshape(1, -1), k)
+        found = positions[0] >= 0
+        return scores[0][found], positions[0][found].astype(np.int64)
+
+    def save(self, path: str):
+        faiss.write_index(self.index, path + ".faiss")
+
+    @classmethod
+    def load(cls, path: str, meta: dict) -> "FaissIndex":
+        index = cls(None, kind=meta["kind"], storage=meta.get("storage", "float32"))
+        index.index = faiss.read_index(path + ".faiss")
+        return index
+
+
+def build_index(embeddings, kind: str = "auto", **params):
+    """
+    kind: 'flat', 'ivf', 'hnsw' или 'auto' (flat для небольших каталогов, иначе HNSW при наличии faiss).
+    embeddings — массив или EmbeddingMatrix
+    """
+    if kind == "auto":
+        if len(embeddings) <= FLAT_INDEX_MAX_SIZE or faiss is None:
+            kind = "flat"
+        else:
+            kind = "hnsw"
+    if kind == "flat":
+        return FlatIndex(embeddings)
+    return FaissIndex(embeddings, kind=kind, **params)
+
+
+def save_index(index, path: str, ids):
+    """
+    Сохраняет индекс и метаданные (тип, размер, отпечаток id) рядом с ним
+    """
+    index.save(path)
+    meta = {"kind": index.kind, "count": len(index), "ids_sha1": ids_fingerprint(ids),
+            "storage": index.storage}
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def load_index(path: str, ids):
+    """
+    Загружает индекс, сохранённый save_index, и проверяет, что он соответствует ids
+    """
+    with open(path + ".json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["count"] != len(ids) or meta["ids_sha1"] != ids_fingerprint(ids):
+        raise ValueError(f"Индекс {path} построен для другого набора вакансий")
+    if meta["kind"] == "flat":
+        return FlatIndex.load(path, meta)
+    return FaissIndex.load(path, meta)
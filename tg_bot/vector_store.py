@@ -0,0 +1,165 @@
+# ==========================================
+# File: vector_store.py
+# Description: contiguous matrix of normalized embeddings in float32, float16 or int8, Matryoshka truncation
+# ==========================================
+import warnings
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+# модели, обученные с Matryoshka-потерей, у которых перед усечением нужен layer norm
+MATRYOSHKA_LAYER_NORM = {"nomic-ai/nomic-embed-text-v1.5"}
+
+# строк на блок при распаковке float16/int8: блок помещается в кэш процессора
+_BLOCK = 1024
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def matryoshka_truncate(embeddings: np.ndarray, dim: Optional[int], layer_norm: bool = True) -> np.ndarray:
+    """
+    Первые dim координат эмбеддинга, заново нормированные. Для nomic-embed перед
+    усечением делается layer norm, как в инструкции к модели; он не зависит от
+    масштаба, поэтому годится и для уже нормированных векторов
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dim is None or dim >= embeddings.shape[-1]:
+        return embeddings
+    if layer_norm:
+        centered = embeddings - embeddings.mean(axis=-1, keepdims=True)
+        embeddings = centered / np.sqrt(centered.var(axis=-1, keepdims=True) + 1e-5)
+    return normalize_rows(embeddings[..., :dim])
+
+
+class EmbeddingMatrix:
+    """
+    Нормированные векторы одной непрерывной матрицей. float16 хранит половину,
+    int8 — четверть объёма float32 плюс масштаб на строку (max |x| / 127).
+    Скалярные произведения считаются блоками: блок распаковывается во float32
+    и умножается через BLAS, так что полная float32-копия не создаётся.
+    float16 распаковывает torch: в numpy это преобразование в несколько раз медленнее
+    """
+
+    def __init__(self, data: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.data = data
+        self.scale = scale
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, storage: str = "float32") -> "EmbeddingMatrix":
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Неизвестный тип хранения {storage!r}, допустимы: {', '.join(STORAGE_DTYPES)}")
+        vectors = normalize_rows(np.atleast_2d(vectors))
+        if storage == "float32":
+            return cls(np.ascontiguousarray(vectors))
+        if storage == "float16":
+            return cls(vectors.astype(np.float16))
+        scale = (np.abs(vectors).max(axis=1) / 127).astype(np.float32) if len(vectors) else \
+            np.zeros(0, dtype=np.float32)
+        safe = np.where(scale > 0, scale, 1)[:, None]
+        return cls(np.round(vectors / safe).astype(np.int8), scale)
+
+    @classmethod
+    def gather(cls, refs: List[Tuple["EmbeddingMatrix", int]], storage: str = "float32") -> "EmbeddingMatrix":
+        """
+        Новая матрица из строк (матрица, номер строки) без повторного квантования:
+        строки копируются в том виде, в котором хранятся
+        """
+        if not refs:
+            return cls.from_vectors(np.zeros((0, 0), dtype=np.float32), storage)
+        groups = {}
+        for position, (matrix, row) in enumerate(refs):
+            groups.setdefault(id(matrix), (matrix, [], []))
+            groups[id(matrix)][1].append(position)
+            groups[id(matrix)][2].append(row)
+        first = refs[0][0]
+        data = np.empty((len(refs), first.dim), dtype=first.data.dtype)
+        scale = np.empty(len(refs), dtype=np.float32) if first.scale is not None else None
+        for matrix, positions, rows in groups.values():
+            if matrix.storage != first.storage or matrix.dim != first.dim:
+                raise ValueError("Строки матриц с разной размерностью или типом хранения")
+            data[positions] = matrix.data[rows]
+            if scale is not None:
+                scale[positions] = matrix.scale[rows]
+        return cls(data, scale)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def dim(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def storage(self) -> str:
+        return "int8" if self.scale is not None else self.data.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def to_float32(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        data = self.data if positions is None else self.data[positions]
+        out = data.astype(np.float32)
+        if self.scale is not None:
+            out *= (self.scale if positions is None else self.scale[positions])[:, None]
+        return out
+
+    def dot(self, query: np.ndarray, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Скалярные произведения всех строк (или строк positions) с вектором query
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.scale is None and self.data.dtype == np.float32:
+            data = self.data if positions is None else self.data[positions]
+            return data @ query
+
+        if self.data.dtype == np.float16:
+            return self._dot_float16(query, positions)
+
+        count = len(self.data) if positions is None else len(positions)
+        out = np.empty(count, dtype=np.float32)
+        buffer = np.empty((min(_BLOCK, count), self.dim), dtype=np.float32)
+        for start, stop, block in self._blocks(positions):
+            np.copyto(buffer[:stop - start], block, casting="unsafe")
+            np.dot(buffer[:stop - start], query, out=out[start:stop])
+        if self.scale is not None:
+            out *= self.scale if positions is None else self.scale[positions]
+        return out
+
+    def _blocks(self, positions: Optional[np.ndarray]):
+        count = len(self.data) if positions is None else len(positions)
+        for start in range(0, count, _BLOCK):
+            stop = min(start + _BLOCK, count)
+            yield start, stop, self.data[start:stop] if positions is None else self.data[positions[start:stop]]
+
+    def _dot_float16(self, query: np.ndarray, positions: Optional[np.ndarray]) -> np.ndarray:
+        import torch
+
+        count = len(self.data) if positions is None else len(positions)
+        out = torch.empty(count, dtype=torch.float32)
+        buffer = torch.empty((min(_BLOCK, count), self.dim), dtype=torch.float32)
+        query = torch.from_numpy(query)
+        for start, stop, block in self._blocks(positions):
+            with warnings.catch_warnings():
+                # матрица из mmap только для чтения, torch её не изменяет
+                warnings.simplefilter("ignore", UserWarning)
+                block = torch.from_numpy(block)
+            buffer[:stop - start].copy_(block)
+            torch.mv(buffer[:stop - start], query, out=out[start:stop])
+        return out.numpy()
+
+    def save(self, path: str):
+        np.save(path + ".npy", self.data)
+        if self.scale is not None:
+            np.save(path + ".scale.npy", self.scale)
+
+    @classmethod
+    def load(cls, path: str, storage: str = "float32") -> "EmbeddingMatrix":
+        data = np.load(path + ".npy", mmap_mode="r")
+        scale = np.load(path + ".scale.npy") if storage == "int8" else None
+        return cls(data, scale)
@@ -0,0 +1,276 @@
+# ==========================================
+# File: webhook_server.py
+# Description: pre-fork webhook server: models and vacancy catalog are loaded once in the master and shared with workers copy-on-write
+# ==========================================
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Set
+
+import telebot
+from telebot.types import Update
+
+import bot_core
+import instrumentation
+from bot_core import VACANCIES_WATCH_INTERVAL, catalog, sessions
+from instrumentation import count_error
+
+logger = telebot.logger
+
+HOST = os.environ.get("iconi_bot_webhook_host", "0.0.0.0")
+PORT = int(os.environ.get("iconi_bot_webhook_port", 8443))
+PATH = os.environ.get("iconi_bot_webhook_path", "/webhook")
+# публичный адрес для setWebhook (https://домен[:порт]); пусто — webhook настроен заранее или локальный тест
+PUBLIC_URL = os.environ.get("iconi_bot_webhook_url", "").rstrip("/")
+# сверяется с заголовком X-Telegram-Bot-Api-Secret-Token; пусто — без проверки
+SECRET = os.environ.get("iconi_bot_webhook_secret", "")
+WORKERS = int(os.environ.get("iconi_bot_webhook_workers", os.cpu_count() or 1))
+# сколько обновлений воркер обрабатывает одновременно (пока одно ждёт Bot API или скачивания)
+THREADS = int(os.environ.get("iconi_bot_webhook_threads", 2))
+# сколько ждать, пока остановленный воркер доработает начатые обновления
+GRACEFUL_TIMEOUT = float(os.environ.get("iconi_bot_webhook_graceful_timeout", 30))
+# файл сессий, если iconi_bot_session_db не задан: воркеры видят сессии друг друга только через SQLite
+DEFAULT_SESSION_DB = ".cache/iconi_bot-sessions.sqlite"
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    # на чтение запроса; обработка обновления не ограничена
+    timeout = 30
+
+    def do_POST(self):
+        if self.path != PATH:
+            self.send_error(404)
+            return
+        if SECRET and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != SECRET:
+            self.send_error(403)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            update = Update.de_json(body.decode("utf-8"))
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        # Telegram получает ответ сразу, а обновление обрабатывается в этом же потоке:
+        # пока все потоки воркера заняты, он не принимает соединений и их забирают свободные воркеры
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.wfile.flush()
+        self.connection.shutdown(socket.SHUT_WR)
+        self.server.process(update)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _WorkerServer(HTTPServer):
+    """
+    HTTP-сервер воркера на слушающем сокете мастера. Потоки сами вызывают accept,
+    без потока-диспетчера: соединение достаётся процессу, у которого есть свободный поток
+    """
+
+    def __init__(self, sock: socket.socket, bot: telebot.TeleBot):
+        super().__init__(sock.getsockname()[:2], _WebhookHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.bot = bot
+
+    def process(self, update: Update):
+        try:
+            self.bot.process_new_updates([update])
+        except Exception as e:
+            count_error("webhook")
+            logger.error(f"Обновление {update.update_id}: {e}")
+
+    def serve(self, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                # у сокета таймаут: раз в секунду поток проверяет, не пора ли остановиться
+                request, client_address = self.get_request()
+            except OSError:
+                continue
+            try:
+                self.process_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+                self.shutdown_request(request)
+
+
+def _run_worker(index: int, sock: socket.socket, bot: telebot.TeleBot):
+    """
+    Воркер после fork: модели, каталог и индексы уже в памяти (общие с мастером страницы),
+    заново создаётся только то, что fork не переносит — потоки
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # OpenMP torch (libgomp) не переживает fork: после расчётов мастера многопоточный torch
+    # в воркере зависает. Один поток на воркер, параллельность — за счёт процессов
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(1)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+    # пул потоков TeleBot остался в мастере: обработчики выполняются в потоке запроса
+    bot.threaded = False
+    # у каждого воркера свои метрики: порт iconi_bot_metrics_port + номер воркера
+    metrics_port = instrumentation.METRICS_PORT + index if instrumentation.METRICS_PORT else 0
+    instrumentation.setup(metrics_port=metrics_port, profile_path=f"{instrumentation.PROFILE_PATH}.{index}")
+
+    # /reload в воркере: каталог здесь не перечитывается (это испортило бы общие с мастером страницы),
+    # мастер перечитывает его один раз и заменяет всех воркеров
+    master = os.getppid()
+    bot_core.reload_delegate = lambda: os.getppid() == master and os.kill(master, signal.SIGHUP)
+
+    server = _WorkerServer(sock, bot)
+    threads = [threading.Thread(target=server.serve, args=(stop,), name=f"webhook-{n}")
+               for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if instrumentation.profiler is not None:
+        instrumentation.profiler.dump()
+
+
+class PreforkServer:
+    """
+    Мастер webhook-сервера: держит слушающий сокет, модели и каталог вакансий и порождает
+    воркеров через fork. Веса моделей и матрицы эмбеддингов не копируются: воркеры читают
+    те же страницы памяти (copy-on-write), так что N воркеров занимают почти столько же
+    памяти, сколько один процесс. Соединения распределяет ядро между воркерами,
+    ждущими accept на общем сокете. Упавший воркер перезапускается. Если каталог изменился
+    (CSV или /reload), мастер перечитывает его и заменяет воркеров новыми, а старые
+    дорабатывают начатые обновления
+    """
+
+    def __init__(self, bot: telebot.TeleBot, host: str = HOST, port: int = PORT, workers: int = WORKERS):
+        self.bot = bot
+        self.workers = workers
+        self.sock = socket.create_server((host, port), backlog=max(64, workers * THREADS * 4))
+        self.sock.settimeout(1.0)
+        self._children: Dict[int, int] = {}
+        self._retiring: Set[int] = set()
+        self._stopping = False
+        self._reload = False
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(index, self.sock, self.bot)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = index
+
+    def _spawn_all(self):
+        # объекты, созданные до fork, не трогает сборщик мусора, иначе он пишет
+        # в их заголовки и страницы перестают быть общими
+        gc.freeze()
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self._retiring.discard(pid)
+            index = self._children.pop(pid, None)
+            if index is not None and not self._stopping:
+                logger.error(f"Воркер {index} (pid {pid}) завершился с кодом "
+                             f"{os.waitstatus_to_exitcode(status)}, перезапускаю")
+                self._spawn(index)
+
+    def _replace_workers(self):
+        old = list(self._children)
+        self._children = {}
+        self._spawn_all()
+        for pid in old:
+            self._retiring.add(pid)
+            os.kill(pid, signal.SIGTERM)
+
+    def _check_catalog(self, force: bool):
+        try:
+            stats = catalog.reload() if force else catalog.reload_if_changed(settled=True)
+        except Exception as e:
+            logger.error(f"Не удалось перезагрузить каталог: {e}")
+            return
+        if stats is not None:
+            self._replace_workers()
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload = True
+        else:
+            self._stopping = True
+
+    def _shutdown(self):
+        pids = set(self._children) | self._retiring
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while pids and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self._reap()
+            pids = set(self._children) | self._retiring
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+        self._children.clear()
+        self._retiring.clear()
+        self.sock.close()
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        self._spawn_all()
+        host, port = self.sock.getsockname()[:2]
+        print(f"Webhook: http://{host}:{port}{PATH}, воркеров {self.workers}, потоков в воркере {THREADS}")
+
+        next_check = time.monotonic() + VACANCIES_WATCH_INTERVAL
+        try:
+            while not self._stopping:
+                time.sleep(0.2)
+                self._reap()
+                if self._reload:
+                    self._reload = False
+                    self._check_catalog(force=True)
+                elif VACANCIES_WATCH_INTERVAL > 0 and time.monotonic() >= next_check:
+                    next_check = time.monotonic() + VACANCIES_WATCH_INTERVAL
+                    self._check_catalog(force=False)
+        finally:
+            self._shutdown()
+
+
+def serve(bot: telebot.TeleBot, workers: int = WORKERS):
+    """
+    Запуск бота в режиме webhook: iconi_bot_webhook=1 python main.py
+    """
+    # каталог проверяет мастер: поток наблюдения остановлен до fork, чтобы fork
+    # не застал перезагрузку посередине
+    catalog.stop()
+    sessions.share(DEFAULT_SESSION_DB)
+    if PUBLIC_URL:
+        bot.set_webhook(url=PUBLIC_URL + PATH, secret_token=SECRET or None,
+                        max_connections=min(100, max(1, workers * THREADS)))
+    PreforkServer(bot, workers=workers).run()